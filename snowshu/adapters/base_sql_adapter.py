@@ -1,6 +1,12 @@
+import time
+import threading
 import sqlalchemy
-from sqlalchemy.pool import NullPool
-from snowshu.logger import Logger
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+from snowshu.configs import DEFAULT_THREAD_COUNT, \
+POOL_TIMEOUT, \
+POOL_RECYCLE
+from snowshu.logger import Logger, duration
 from snowshu.core.models.credentials import Credentials, USER, PASSWORD, HOST, DATABASE
 from typing import Optional
 import copy
@@ -11,6 +17,9 @@ class BaseSQLAdapter:
 
     def __init__(self):
         self.CLASSNAME = self.__class__.__name__
+        self.pool_size=DEFAULT_THREAD_COUNT
+        self._engines=dict()
+        self._engine_lock=threading.Lock()
         for attr in ('REQUIRED_CREDENTIALS', 'ALLOWED_CREDENTIALS',
                      'MATERIALIZATION_MAPPINGS',):
             if not hasattr(self, attr):
@@ -39,10 +48,11 @@ class BaseSQLAdapter:
             self,
             database_override: Optional[str] = None,
             schema_override: Optional[str] = None) -> sqlalchemy.engine.base.Engine:
-        """Creates a connection engine without transactions.
+        """Returns the pooled connection engine without transactions.
 
         By default uses the instance credentials unless database or
-        schema override are provided.
+        schema override are provided. Each distinct connection string
+        (ie each database) gets one shared pool.
         """
         if not self._credentials:
             raise KeyError(
@@ -57,11 +67,55 @@ class BaseSQLAdapter:
                 database=database_override,
                 schema=schema_override).items() if v is not None)
 
-        engine = sqlalchemy.create_engine(self._build_conn_string(
-            overrides), poolclass=NullPool, isolation_level="AUTOCOMMIT")
+        engine = self._pooled_engine(self._build_conn_string(overrides),
+                                     isolation_level="AUTOCOMMIT")
         logger.debug(f'engine aquired. Conn string: {repr(engine.url)}')
         return engine
 
+    def _pooled_engine(self,
+                       conn_string:str,
+                       **kwargs) -> sqlalchemy.engine.base.Engine:
+        """Returns the shared engine for a connection string, creating it on first use.
+
+        Engines hold a pool of ``pool_size`` sessions that is shared by every thread
+        using the adapter. Sessions are health checked on checkout and recycled after
+        ``POOL_RECYCLE`` seconds.
+
+        Args:
+            conn_string: the sqlalchemy url to connect with.
+            kwargs: any extra arguments for ``sqlalchemy.create_engine``.
+        Returns:
+            the pooled engine.
+        """
+        with self._engine_lock:
+            if conn_string not in self._engines:
+                logger.debug(f'Creating {self.CLASSNAME} session pool of size {self.pool_size}...')
+                engine = sqlalchemy.create_engine(conn_string,
+                                                  poolclass=QueuePool,
+                                                  pool_size=self.pool_size,
+                                                  max_overflow=0,
+                                                  pool_timeout=POOL_TIMEOUT,
+                                                  pool_recycle=POOL_RECYCLE,
+                                                  pool_pre_ping=True,
+                                                  **kwargs)
+
+                @event.listens_for(engine, 'do_connect')
+                def timed_connect(dialect, conn_rec, cargs, cparams):
+                    start = time.time()
+                    connection = dialect.connect(*cargs, **cparams)
+                    logger.debug(f'{self.CLASSNAME} session connected and authenticated in {duration(start)}.')
+                    return connection
+
+                self._engines[conn_string] = engine
+            return self._engines[conn_string]
+
+    def dispose_connections(self) -> None:
+        """Closes every pooled session."""
+        with self._engine_lock:
+            for engine in self._engines.values():
+                engine.dispose()
+            self._engines = dict()
+
     def _build_conn_string(self, overrides: dict = {}) -> str:
         """This is the most basic implementation of a connection string
         possible and is intended to be extended.
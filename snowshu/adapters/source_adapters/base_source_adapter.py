@@ -1,10 +1,16 @@
 from snowshu.adapters import BaseSQLAdapter
 from snowshu.core.utils import correct_case
 import pandas as pd
-from typing import Tuple,Any
+import sqlalchemy
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple,Any,Optional,List
 from snowshu.core.models import Relation, DataType
-from snowshu.configs import MAX_ALLOWED_DATABASES, MAX_ALLOWED_ROWS
-from snowshu.logger import Logger
+from snowshu.configs import MAX_ALLOWED_DATABASES, \
+MAX_ALLOWED_ROWS, \
+DEFAULT_THREAD_COUNT, \
+DEFAULT_CATALOG_STRATEGY
+from snowshu.logger import Logger, duration
 import time
 logger = Logger().logger
 
@@ -16,9 +22,11 @@ class BaseSourceAdapter(BaseSQLAdapter):
     DEFAULT_CASE='lower'
     SUPPORTS_CROSS_DATABASE=False
     SUPPORTED_FUNCTIONS=set()
+    CATALOG_STRATEGIES=(DEFAULT_CATALOG_STRATEGY,)
 
     def __init__(self, preserve_case:bool=False):
         self.preserve_case=preserve_case
+        self.catalog_strategy=DEFAULT_CATALOG_STRATEGY
         super().__init__()
         for attr in ('DATA_TYPE_MAPPINGS', 'SUPPORTED_SAMPLE_METHODS',):
             if not hasattr(self, attr):
@@ -32,26 +40,63 @@ class BaseSourceAdapter(BaseSQLAdapter):
         logger.debug(f'Done. Found {len(databases)} databases.')
         return databases
 
+    def get_all_databases_last_altered(self, patterns: Optional[List[dict]] = None) -> dict:
+        """Returns each database name mapped to the time it was last altered.
+
+        Args:
+            patterns: optional pattern dicts (database,schema,name); when provided only
+                      databases matching at least one database pattern are returned.
+        """
+        logger.debug('Collecting databases and last altered times from source...')
+        frame = self._safe_query(self.get_all_databases_statement())
+        databases = dict(zip(frame['database_name'].tolist(),
+                             frame['last_altered'].astype(str).tolist()))
+        if patterns is not None:
+            databases = {db: last_altered for db, last_altered in databases.items() if
+                         any(re.fullmatch(pattern['database'], self._correct_case(db)) for pattern in patterns)}
+        logger.debug(f'Done. Found {len(databases)} databases.')
+        return databases
+
+    def get_relations_from_databases(self,
+                                     databases: dict,
+                                     threads: int = DEFAULT_THREAD_COUNT) -> dict:
+        """Collects the relations for many databases at once.
+
+        The default strategy reads each database with ``get_relations_from_database``
+        on a pool of ``threads`` threads.
+
+        Args:
+            databases: each database name mapped to its discovery patterns (or None for all relations).
+            threads: the number of threads to use.
+        Returns:
+            each database name mapped to a list of :class:`Relations <snowshu.core.models.relation.Relation>`.
+        """
+        def relations_from_database(database):
+            try:
+                return self.get_relations_from_database(database, databases[database])
+            except Exception as e:
+                logger.critical(e)
+                raise e
+
+        with ThreadPoolExecutor(max_workers=max(threads, 1)) as executor:
+            return dict(zip(databases, executor.map(relations_from_database, databases)))
+
     def all_releations_from_database(self) -> Tuple[Relation]:
         """this function is expected to get all the non-system relations as a
         tuple of relation objects for a given database."""
         raise NotImplementedError()
 
     def _safe_query(self, query_sql: str) -> pd.DataFrame:
-        """runs the query and closes the connection."""
+        """runs the query on a pooled session and returns the session to the pool."""
         logger.debug('Beginning query execution...')
         start = time.time()
-        try:
-            conn = self.get_connection()
-            cursor = conn.connect()
+        engine = self.get_connection()
+        with engine.connect() as conn:
+            logger.debug(f'Acquired pooled session in {time.time()-start} seconds.')
             # we make the STRONG assumption that all responses will be small enough to live in-memory (because sampling engine).
             # further safety added by the constraints in snowshu.configs
-            # this allows the connection to return to the pool
-            logger.debug(f'Executed query in {time.time()-start} seconds.')
             frame = pd.read_sql_query(query_sql, conn)
-        finally:
-            cursor.close()
-            conn.dispose()
+        logger.debug(f'Executed query in {time.time()-start} seconds.')
         return frame
 
     def _correct_case(self,val:str)->str:
@@ -59,10 +104,6 @@ class BaseSourceAdapter(BaseSQLAdapter):
         """
         return val if self.preserve_case else correct_case(val,self.DEFAULT_CASE=='upper') 
 
-    def _count_query(self) -> int:
-        """wraps any query in a COUNT statement, returns that integer."""
-        raise NotImplementedError()
-
     def check_count_and_query(self, query: str, max_count: int) -> tuple:
         """checks the count, if count passes returns results as a tuple."""
         raise NotImplementedError()
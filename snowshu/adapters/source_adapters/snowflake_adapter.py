@@ -1,8 +1,13 @@
+import re
 import time
+import importlib.util
+from itertools import groupby
 import pandas as pd
 import sqlalchemy
+from snowflake.connector.errors import NotSupportedError
+from sqlalchemy.exc import ProgrammingError
 from snowshu.exceptions import TooManyRecords
-from sqlalchemy.pool import NullPool
+from snowshu.core.utils import correct_case
 from typing import List, Union, Any, Optional
 from snowshu.core.models.attribute import Attribute
 from snowshu.core.models.relation import Relation
@@ -12,11 +17,18 @@ import snowshu.core.models.materializations as mz
 from snowshu.logger import Logger
 from snowshu.samplings.sample_methods import BernoulliSampleMethod
 from snowshu.core.models.credentials import USER, PASSWORD, ACCOUNT, DATABASE, SCHEMA, ROLE, WAREHOUSE
+from snowshu.configs import DEFAULT_THREAD_COUNT
 logger = Logger().logger
 
 
 class SnowflakeAdapter(BaseSourceAdapter):
     """The Snowflake Data Warehouse source adapter.
+
+    The catalog is read with one of two strategies, set with ``catalog_strategy``:
+    ``information_schema`` (default) queries each database's INFORMATION_SCHEMA in parallel,
+    ``account_usage`` reads every database in a single SNOWFLAKE.ACCOUNT_USAGE query. Account
+    usage views require IMPORTED PRIVILEGES on the SNOWFLAKE database and can lag behind
+    recent DDL; without access the adapter falls back to ``information_schema``.
     
     Args:
         preserve_case: By default the adapter folds case-insensitive strings to lowercase.
@@ -27,11 +39,15 @@ class SnowflakeAdapter(BaseSourceAdapter):
 
     name='snowflake'
     SUPPORTS_CROSS_DATABASE=True
-    SUPPORTED_FUNCTIONS=set(['ANY_VALUE','RLIKE'])
+    SUPPORTED_FUNCTIONS=set(['ANY_VALUE','BOOLAND_AGG','BOOLOR_AGG','CONTAINS','DIV0','ENDSWITH',
+                             'EQUAL_NULL','IFF','IFNULL','NULLIFZERO','NVL','REGEXP_LIKE','RLIKE',
+                             'SQUARE','STARTSWITH','TO_VARCHAR','ZEROIFNULL'])
     SUPPORTED_SAMPLE_METHODS = (BernoulliSampleMethod,)
     REQUIRED_CREDENTIALS = (USER, PASSWORD, ACCOUNT, DATABASE,)
     ALLOWED_CREDENTIALS = (SCHEMA, WAREHOUSE, ROLE,)
     DEFAULT_CASE='lower' ## snowflake in-db is UPPER, but connector is actually lower :(
+    FETCH_ARROW=True
+    CATALOG_STRATEGIES=('information_schema','account_usage',)
 
 
     DATA_TYPE_MAPPINGS={
@@ -69,10 +85,11 @@ class SnowflakeAdapter(BaseSourceAdapter):
 
 
     MATERIALIZATION_MAPPINGS = {"BASE TABLE": mz.TABLE,
+                                "EXTERNAL TABLE": mz.TABLE,
                                 "VIEW": mz.VIEW}
 
     def get_all_databases_statement(self)->str:
-        return """ SELECT DISTINCT database_name
+        return """ SELECT DISTINCT database_name, last_altered
 FROM "UTIL_DB"."INFORMATION_SCHEMA"."DATABASES"
 WHERE is_transient = 'NO'
 AND database_name <> 'UTIL_DB'
@@ -88,11 +105,26 @@ AND database_name <> 'UTIL_DB'
         """
         return f"SELECT COUNT(*) FROM {relation.quoted_dot_notation}"
 
+    def batched_population_count_statement(self, relations: List[Relation]) -> str:
+        """creates a single statement counting every relation in a batch
+
+        Args:
+            relations: the :class:`Relations <snowshu.core.models.relation.Relation>` to count.
+        Returns:
+            a query resulting in one row per relation, with columns ``relation`` (the relation dot notation)
+            and ``population_size``.
+        """
+        return '\nUNION ALL\n'.join([f"""SELECT '{relation.dot_notation.replace("'", "''")}' AS relation, COUNT(*) AS population_size FROM {relation.quoted_dot_notation}"""
+                                      for relation in relations])
+
     def view_creation_statement(self, relation: Relation) -> str:
         return f"""
-SELECT    
-SUBSTRING(GET_DDL('view','{relation.quoted_dot_notation}'),
-POSITION(' AS ' IN UPPER(GET_DDL('view','{relation.quoted_dot_notation}')))+3)
+WITH __SNOWSHU__VIEW__DDL AS (
+SELECT GET_DDL('view','{relation.quoted_dot_notation}') AS ddl
+)
+SELECT
+SUBSTRING(ddl, POSITION(' AS ' IN UPPER(ddl))+3)
+FROM __SNOWSHU__VIEW__DDL
 """
 
     def unsampled_statement(self, relation: Relation) -> str:
@@ -250,15 +282,31 @@ LIMIT {max_number_of_outliers})
         get_string = "?" + "&".join([arg for arg in get_args])
         return (''.join(conn_parts)) + get_string
 
-    def get_relations_from_database(self, database: str) -> List[Relation]:
+    def get_relations_from_database(self,
+                                    database: str,
+                                    patterns: Optional[List[dict]] = None) -> List[Relation]:
+        """Collects the relations in a database.
+
+        Args:
+            database: the name of the database in the source.
+            patterns: optional pattern dicts (database,schema,name). Schema and relation
+                      patterns are pushed down into the catalog query where Snowflake regex
+                      can express them; the result is a superset of the matching relations.
+        Returns:
+            a list of :class:`Relations <snowshu.core.models.relation.Relation>`.
+        """
+        pattern_predicate = self._patterns_predicate(patterns) if patterns else None
         relations_sql = f"""
                                  SELECT
                                     m.table_schema AS schema,
                                     m.table_name AS relation,
                                     m.table_type AS materialization,
+                                    m.row_count AS row_count,
+                                    m.bytes AS bytes,
                                     c.column_name AS attribute,
                                     c.ordinal_position AS ordinal,
-                                    c.data_type AS data_type
+                                    c.data_type AS data_type,
+                                    c.numeric_scale AS numeric_scale
                                  FROM
                                     {database}.INFORMATION_SCHEMA.TABLES m
                                  INNER JOIN
@@ -270,74 +318,266 @@ LIMIT {max_number_of_outliers})
                                  WHERE
                                     m.table_schema <> 'INFORMATION_SCHEMA'
                               """
+        if pattern_predicate:
+            relations_sql += f" AND ({pattern_predicate})"
 
         logger.debug(
             f'Collecting detailed relations from database {database}...')
         relations_frame = self._safe_query(relations_sql)
-        unique_relations = (
-            relations_frame['schema'] +
-            '.' +
-            relations_frame['relation']).unique().tolist()
+        relations = self._build_relations_from_frame(database, relations_frame)
+        if any(relation.is_view for relation in relations):
+            views_sql = f"""
+                                 SELECT
+                                    '{database}' AS database_name,
+                                    m.table_schema AS schema,
+                                    m.table_name AS relation,
+                                    m.view_definition AS view_definition
+                                 FROM
+                                    {database}.INFORMATION_SCHEMA.VIEWS m
+                                 WHERE
+                                    m.table_schema <> 'INFORMATION_SCHEMA'
+                              """
+            if pattern_predicate:
+                views_sql += f" AND ({pattern_predicate})"
+            self._attach_view_ddl(relations, self._safe_query(views_sql))
         logger.debug(
-            f'Done collecting relations. Found a total of {len(unique_relations)} unique relations in database {database}')
-        relations = list()
-        for relation in unique_relations:
-            logger.debug(f'Building relation { database + "." + relation }...')
-            attributes = list()
-
-            for attribute in relations_frame.loc[(
-                    relations_frame['schema'] + '.' + relations_frame['relation']) == relation].itertuples():
-                logger.debug(
-                    f'adding attribute {attribute.attribute} to relation..')
-                attributes.append(
-                    Attribute(
-                        self._correct_case(attribute.attribute),
-                        self._get_data_type(attribute.data_type)
-                    ))
+            f'Acquired {len(relations)} total relations from database {database}.')
+        return relations
+
+    def get_relations_from_databases(self,
+                                     databases: dict,
+                                     threads: int = DEFAULT_THREAD_COUNT) -> dict:
+        """Collects the relations for many databases at once.
 
+        With the ``account_usage`` strategy all databases are read in a single query; if the
+        role cannot read SNOWFLAKE.ACCOUNT_USAGE the adapter switches to ``information_schema``.
+        """
+        if self.catalog_strategy == 'account_usage':
+            try:
+                return self._get_relations_from_account_usage(databases)
+            except ProgrammingError as e:
+                logger.warning(f'Unable to read catalog from SNOWFLAKE.ACCOUNT_USAGE ({e.orig}), '
+                               'falling back to INFORMATION_SCHEMA.')
+                self.catalog_strategy = 'information_schema'
+        return super().get_relations_from_databases(databases, threads)
+
+    def _get_relations_from_account_usage(self, databases: dict) -> dict:
+        """Reads the relations for every database in one SNOWFLAKE.ACCOUNT_USAGE query."""
+        databases_predicate = self._account_usage_databases_predicate(databases)
+        relations_sql = f"""
+                                 SELECT
+                                    m.table_catalog AS database_name,
+                                    m.table_schema AS schema,
+                                    m.table_name AS relation,
+                                    m.table_type AS materialization,
+                                    m.row_count AS row_count,
+                                    m.bytes AS bytes,
+                                    c.column_name AS attribute,
+                                    c.ordinal_position AS ordinal,
+                                    c.data_type AS data_type,
+                                    c.numeric_scale AS numeric_scale
+                                 FROM
+                                    SNOWFLAKE.ACCOUNT_USAGE.TABLES m
+                                 INNER JOIN
+                                    SNOWFLAKE.ACCOUNT_USAGE.COLUMNS c
+                                 ON
+                                    c.table_id = m.table_id
+                                 WHERE
+                                    m.deleted IS NULL
+                                 AND
+                                    c.deleted IS NULL
+                                 AND
+                                    m.table_schema <> 'INFORMATION_SCHEMA'
+                                 AND
+                                    ({databases_predicate})
+                              """
+        logger.debug(f'Collecting detailed relations for {len(databases)} databases from account usage...')
+        relations_frame = self._safe_query(relations_sql)
+        relations = {database: list() for database in databases}
+        for database, database_frame in relations_frame.groupby('database_name'):
+            relations[database] = self._build_relations_from_frame(database, database_frame)
+        if any(relation.is_view for database in relations.values() for relation in database):
+            views_sql = f"""
+                                 SELECT
+                                    m.table_catalog AS database_name,
+                                    m.table_schema AS schema,
+                                    m.table_name AS relation,
+                                    m.view_definition AS view_definition
+                                 FROM
+                                    SNOWFLAKE.ACCOUNT_USAGE.VIEWS m
+                                 WHERE
+                                    m.deleted IS NULL
+                                 AND
+                                    ({databases_predicate})
+                              """
+            self._attach_view_ddl([relation for database in relations.values() for relation in database],
+                                  self._safe_query(views_sql))
+        logger.debug(f'Acquired {sum(len(val) for val in relations.values())} total relations from account usage.')
+        return relations
+
+    def _account_usage_databases_predicate(self, databases: dict) -> str:
+        """Builds the WHERE predicate limiting account usage views to databases and their patterns."""
+        database_predicates = list()
+        for database, patterns in databases.items():
+            predicate = f"m.table_catalog = '{database}'"
+            pattern_predicate = self._patterns_predicate(patterns) if patterns else None
+            if pattern_predicate:
+                predicate += f" AND ({pattern_predicate})"
+            database_predicates.append(f"({predicate})")
+        return ' OR '.join(database_predicates)
+
+    def _attach_view_ddl(self,
+                         relations: List[Relation],
+                         views_frame: pd.DataFrame) -> None:
+        """Sets ``view_ddl`` on view relations from a frame of view definitions.
+
+        Views whose definition is hidden from the role (such as secure views) keep
+        ``view_ddl`` as None and are resolved with GET_DDL at run time.
+        """
+        definitions = {tuple(self._correct_case(val) for val in row[:3]): row[3] for row in
+                       zip(*[views_frame[col].tolist() for col in ('database_name', 'schema', 'relation', 'view_definition',)])}
+        for relation in relations:
+            if relation.is_view:
+                relation.view_ddl = self._view_ddl_from_definition(
+                    definitions.get((relation.database, relation.schema, relation.name,)))
+
+    def _view_ddl_from_definition(self, definition: Optional[str]) -> Optional[str]:
+        """Strips the CREATE VIEW header from a view definition, leaving the SELECT."""
+        if not isinstance(definition, str):
+            return None
+        header = re.search(r'\sAS\s', definition, re.IGNORECASE)
+        return definition[header.end() - 1:] if header else None
+
+    def _build_relations_from_frame(self,
+                                    database: str,
+                                    relations_frame: pd.DataFrame) -> List[Relation]:
+        """Builds relations from a catalog frame with one row per attribute.
+
+        The frame is sorted once and walked in a single pass, so the cost is linear in
+        the number of attributes rather than relations x attributes.
+        """
+        relation_columns = ('schema', 'relation', 'materialization', 'row_count', 'bytes',)
+        relations_frame = relations_frame.sort_values(['schema', 'relation', 'ordinal'])
+        rows = zip(*[relations_frame[col].tolist() for col in relation_columns + ('attribute', 'data_type', 'numeric_scale',)])
+
+        relations = list()
+        for _, attribute_rows in groupby(rows, key=lambda row: row[:2]):
+            attribute_rows = list(attribute_rows)
+            schema, name, materialization, row_count, bytes = attribute_rows[0][:len(relation_columns)]
+            attributes = [Attribute(self._correct_case(row[-3]),
+                                    self._get_data_type(row[-2], row[-1])) for row in attribute_rows]
             relation = Relation(self._correct_case(database),
-                                self._correct_case(attribute.schema),
-                                self._correct_case(attribute.relation),
-                                self.MATERIALIZATION_MAPPINGS[attribute.materialization],
+                                self._correct_case(schema),
+                                self._correct_case(name),
+                                self.MATERIALIZATION_MAPPINGS[materialization],
                                 attributes)
-            logger.debug(f'Added relation {relation.dot_notation} to pool.')
+            # views and external tables have no metadata counts
+            relation.row_count, relation.bytes = [None if pd.isnull(val) else int(val)
+                                                  for val in (row_count, bytes,)]
             relations.append(relation)
-
-        logger.debug(
-            f'Acquired {len(relations)} total relations from database {database}.')
         return relations
 
-    def _count_query(self, query: str) -> int:
-        count_sql = f"WITH __SNOWSHU__COUNTABLE__QUERY as ({query}) SELECT COUNT(*) AS count FROM __SNOWSHU__COUNTABLE__QUERY"
-        count = int(self._safe_query(count_sql).iloc[0]['count'])
-        return count
+    def _get_data_type(self, source_type: str, numeric_scale: Optional[int] = None) -> dtypes.DataType:
+        """INFORMATION_SCHEMA reports every NUMBER as NUMBER, so scaled numbers (such as
+        NUMBER(12,2)) are told apart by their scale and kept as NUMERIC."""
+        data_type = super()._get_data_type(source_type)
+        if data_type is dtypes.BIGINT and not pd.isnull(numeric_scale) and int(numeric_scale) > 0:
+            return dtypes.NUMERIC
+        return data_type
+
+    def _patterns_predicate(self, patterns: List[dict]) -> Optional[str]:
+        """Builds a catalog WHERE predicate from schema and relation patterns.
+
+        Returns None when any pattern cannot be expressed at all, in which case
+        no relations can be safely excluded.
+        """
+        pattern_predicates = list()
+        for pattern in patterns:
+            predicates = [f"RLIKE({column}, {regex}, 'i')" for column, regex in (
+                ('m.table_schema', self._regex_literal(pattern['schema']),),
+                ('m.table_name', self._regex_literal(pattern['name']),),) if regex is not None]
+            if not predicates:
+                return None
+            pattern_predicates.append('(' + ' AND '.join(predicates) + ')')
+        return ' OR '.join(pattern_predicates)
+
+    def _regex_literal(self, pattern: str) -> Optional[str]:
+        """Converts a python regex into a case-insensitive Snowflake regex string literal.
+
+        Snowflake regex has no lookarounds, inline flags or backreferences, so patterns
+        using them return None and are not pushed down. Matching is case-insensitive
+        because catalog names are case corrected after they are read.
+        """
+        pattern = pattern[len('(?i)'):] if pattern.startswith('(?i)') else pattern
+        if '(?' in pattern or re.search(r'\\[1-9]', pattern):
+            return None
+        return "'" + pattern.replace('\\', '\\\\').replace("'", "\\'") + "'"
 
     def check_count_and_query(self, query: str,
                               max_count: int) -> pd.DataFrame:
-        """checks the count, if count passes returns results as a dataframe."""
-        try:
-            logger.debug('Checking count for query...')
-            start_time = time.time()
-            count = self._count_query(query)
-            assert count <= max_count
-            logger.debug(
-                f'Query count safe at {count} rows in {time.time()-start_time} seconds.')
-        except AssertionError:
-            message = f'failed to execute query, result would have returned {count} rows but the max allowed rows for this type of query is {max_count}.'
+        """executes the query once and returns the results as a dataframe.
+
+        The query is limited to ``max_count`` + 1 rows, so a single execution both
+        enforces the limit and fetches the data. Any overflow raises :class:`TooManyRecords <snowshu.exceptions.TooManyRecords>`.
+        """
+        logger.debug('Executing row-limited query...')
+        start_time = time.time()
+        limited_sql = f"WITH __SNOWSHU__LIMITED__QUERY AS ({query}) SELECT * FROM __SNOWSHU__LIMITED__QUERY LIMIT {max_count + 1}"
+        response = self._arrow_query(limited_sql) if self.FETCH_ARROW else self._safe_query(limited_sql)
+        if len(response) > max_count:
+            message = f'failed to execute query, result would have returned more than {max_count} rows, which is the max allowed rows for this type of query.'
             logger.error(message)
             logger.debug(f'failed sql: {query}')
             raise TooManyRecords(message)
-        response = self._safe_query(query)
+        logger.debug(
+            f'Query count safe at {len(response)} rows in {time.time()-start_time} seconds.')
         return response
 
+    def _arrow_query(self, query_sql: str) -> pd.DataFrame:
+        """runs the query and assembles the frame column-wise from the Arrow result.
+
+        Falls back to :meth:`_safe_query` when pyarrow is not installed. When the
+        connector cannot serve the result as Arrow, the rows are fetched from the
+        same cursor so the query is never run twice.
+        """
+        if importlib.util.find_spec('pyarrow') is None:
+            logger.debug('pyarrow is not installed, falling back to row fetch...')
+            return self._safe_query(query_sql)
+
+        logger.debug('Beginning arrow query execution...')
+        start = time.time()
+        conn = self.get_connection().raw_connection()
+        logger.debug(f'Acquired pooled session in {time.time()-start} seconds.')
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query_sql)
+            logger.debug(f'Executed query in {time.time()-start} seconds.')
+            columns = [correct_case(col[0], False) for col in cursor.description]
+            try:
+                frame = cursor.fetch_pandas_all()
+                fetch_method = 'arrow'
+            except (AttributeError, NotSupportedError):
+                logger.debug('Arrow result not available, fetching rows from the executed query...')
+                frame = pd.DataFrame(cursor.fetchall(), columns=columns)
+                fetch_method = 'rows'
+        finally:
+            conn.close()
+
+        if frame is None or len(frame.columns) != len(columns):
+            # empty arrow results can come back without a schema
+            frame = pd.DataFrame(columns=columns)
+        frame.columns = columns
+        logger.debug(f'Fetched {len(frame)} rows as {fetch_method} in {time.time()-start} seconds.')
+        return frame
+
     def get_connection(
             self,
             database_override: Optional[str] = None,
             schema_override: Optional[str] = None) -> sqlalchemy.engine.base.Engine:
-        """Creates a connection engine without transactions.
+        """Returns the pooled connection engine for the instance credentials.
 
-        By default uses the instance credentials unless database or
-        schema override are provided.
+        Sessions are kept alive server-side, so idle pooled sessions survive between
+        the catalog load and graph execution.
         """
         if not self._credentials:
             raise KeyError(
@@ -352,7 +592,7 @@ LIMIT {max_number_of_outliers})
                 database=database_override,
                 schema=schema_override).items() if v is not None)
 
-        engine = sqlalchemy.create_engine(
-            self._build_conn_string(overrides), poolclass=NullPool)
+        engine = self._pooled_engine(self._build_conn_string(overrides),
+                                     connect_args=dict(client_session_keep_alive=True))
         logger.debug(f'engine aquired. Conn string: {repr(engine.url)}')
         return engine
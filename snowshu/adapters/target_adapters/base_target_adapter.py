@@ -1,11 +1,16 @@
+import re
+import time
+import threading
 from time import sleep
 import os
-from snowshu.core.utils import key_for_value, case_insensitive_dict_value
-from typing import Optional,List,Iterable
+from snowshu.core.utils import case_insensitive_dict_value
+from typing import Optional,List,Iterable,Callable
+import sqlalchemy
 from snowshu.adapters import BaseSQLAdapter
 from snowshu.configs import DOCKER_TARGET_PORT,\
     DOCKER_TARGET_CONTAINER,\
     DEFAULT_INSERT_CHUNK_SIZE,\
+    DOCKER_READY_TIMEOUT,\
     IS_IN_DOCKER
 from snowshu.core.models.credentials import USER, PASSWORD, HOST, PORT, DATABASE
 from snowshu.core.configuration_parser import Configuration
@@ -13,29 +18,52 @@ from snowshu.core.models import Relation, Credentials, Attribute
 from snowshu.core.models import materializations as mz
 from snowshu.core.models import data_types as dt
 from snowshu.core.docker import SnowShuDocker
-from snowshu.logger import Logger
+from snowshu.logger import Logger, duration
 from datetime import datetime
 import pandas as pd
 logger = Logger().logger
 
 
 class BaseTargetAdapter(BaseSQLAdapter):
-    """All target adapters inherit from this one."""
+    """All target adapters inherit from this one.
+
+    Build profile attributes (set from the ``target`` section of the replica file):
+        fast_load: trade durability for speed while the replica is built, where supported.
+        build_on_tmpfs: keep the target data directory on tmpfs while the replica is built.
+        single_database: load every source database into one target database, as
+            ``<database>__<schema>`` schemas, instead of one target database per source database.
+
+    Set ``reuse_target`` to build in an existing target container (reset with ``reset_replica``)
+    and keep it running after the replica is finalized.
+
+    Targets with a ``DOCKER_BASE_IMAGE`` can pre-bake their setup into it with ``build_base_image``,
+    and start from it instead of ``DOCKER_IMAGE`` when it exists locally.
+    """
     REQUIRED_CREDENTIALS = [USER, PASSWORD, HOST, PORT, DATABASE]
     ALLOWED_CREDENTIALS = list()
     DOCKER_TARGET_PORT = DOCKER_TARGET_PORT
+    DOCKER_DATA_DIRECTORY: Optional[str] = None
+    DOCKER_BASE_IMAGE: Optional[str] = None
+    from_base_image: bool = False
+    fast_load: bool = False
+    build_on_tmpfs: bool = False
+    single_database: bool = False
+    reuse_target: bool = False
 
     def __init__(self):
         super().__init__()
         for attr in (
             'DOCKER_IMAGE',
             'DOCKER_SNOWSHU_ENVARS',
+            'DATA_TYPE_DDL',
         ):
             if not hasattr(self, attr):
                 raise NotImplementedError(
                     f'Target adapter requires attribute f{attr} but was not set.')
 
         self.credentials = self._generate_credentials()
+        self._created = set()
+        self._created_lock = threading.Lock()
 
     def enable_cross_database(self,relations:Iterable['Relation'])->None:
         """ Create x-database links, if available to the target.
@@ -51,6 +79,7 @@ class BaseTargetAdapter(BaseSQLAdapter):
 
         For many target images some bash cleanup is required, such as remounting data or 
         setting envars. This method returns the ordered commands to do this finalization.
+        The container is stopped after these run and before it is committed.
         
         Note: These commands will be run using `bin/bash -c` execution.
         
@@ -63,6 +92,66 @@ class BaseTargetAdapter(BaseSQLAdapter):
     def create_database_if_not_exists(self, database: str) -> str:
         raise NotImplementedError()
 
+    def reset_replica(self) -> None:
+        """Drops everything a previous build loaded into a reused target container."""
+        raise NotImplementedError()
+
+    def target_database(self, database: str) -> str:
+        """the target database a source database is loaded into."""
+        return self._credentials.database if self.single_database else database
+
+    def target_schema(self, database: str, schema: str) -> str:
+        """the target schema a source schema is loaded into.
+
+        In the single database layout schemas are prefixed with their source database,
+        except for those already in the single database (such as the snowshu meta schema).
+        """
+        if not self.single_database or database == self._credentials.database:
+            return schema
+        return f'{database}__{schema}'
+
+    def _relation_connection(self, relation: Relation) -> sqlalchemy.engine.base.Engine:
+        return self.get_connection(database_override=self.target_database(relation.database),
+                                   schema_override=self.target_schema(relation.database, relation.schema))
+
+    def rewrite_cross_database_names(self, ddl: str, relation: Relation) -> str:
+        """rewrites the relation names in a view's DDL for the single database layout.
+
+        ``<database>.<schema>.`` prefixes of every schema created in the replica are replaced
+        with the target schema. Two part ``<schema>.`` names (for the view's own database) are
+        only rewritten directly after ``FROM`` or ``JOIN``, so aliases and column qualifiers
+        that happen to share a schema's name are left alone.
+        """
+        if not self.single_database:
+            return ddl
+        schemas = [key for key in self._created if len(key) == 2]
+        # fully qualified names first, so a schema named like a database is not mistaken for one.
+        for database, schema in schemas:
+            ddl = re.sub(rf'(?<![\w."$])"?{re.escape(database)}"?\s*\.\s*"?{re.escape(schema)}"?\s*\.(?=\s*["\w])',
+                         f'{self.target_schema(database, schema)}.',
+                         ddl,
+                         flags=re.IGNORECASE)
+        for database, schema in schemas:
+            if database != relation.database:
+                continue
+            ddl = re.sub(rf'(\b(?:FROM|JOIN)\s+)"?{re.escape(schema)}"?\s*\.(?=\s*["\w])',
+                         lambda match, target=self.target_schema(database, schema): f'{match.group(1)}{target}.',
+                         ddl,
+                         flags=re.IGNORECASE)
+        return ddl
+
+    def _create_once(self, key: tuple, create: Callable[[], None]) -> None:
+        """Runs ``create`` the first time ``key`` is seen, thread safe.
+
+        Used to create each database and schema only once no matter how many
+        relations share them.
+        """
+        with self._created_lock:
+            if key in self._created:
+                return
+            create()
+            self._created.add(key)
+
     def create_schema_if_not_exists(self, database: str, schema: str) -> str:
         raise NotImplementedError()
 
@@ -82,12 +171,11 @@ class BaseTargetAdapter(BaseSQLAdapter):
     
         """
         ddl_statement = f"""CREATE OR REPLACE VIEW
-{relation.quoted_dot_notation}
+{self.quoted_table(relation)}
 AS
-{relation.view_ddl}
+{self.rewrite_cross_database_names(relation.view_ddl, relation)}
 """ 
-        engine = self.get_connection(database_override=relation.database,
-                                     schema_override=relation.schema)
+        engine = self._relation_connection(relation)
         try:
             engine.execute(ddl_statement)
         except Exception as e:
@@ -96,28 +184,49 @@ AS
             raise e
         logger.info(f'Created relation {relation.quoted_dot_notation}')
 
+    def create_table_statement(self, relation: Relation) -> str:
+        """builds the CREATE TABLE statement for a relation from its attributes."""
+        return f'CREATE TABLE {self.quoted_table(relation)} (\n{relation.typed_columns(self.DATA_TYPE_DDL)}\n)'
+
+    def quoted_table(self, relation: Relation) -> str:
+        return f'"{self.target_schema(relation.database, relation.schema)}"."{relation.name}"'
+
     def load_data_into_relation(self, relation: Relation) -> None:
-        engine = self.get_connection(database_override=relation.database,
-                                     schema_override=relation.schema)
+        """Creates the table for ``relation`` and loads ``relation.data`` into it.
+
+        The base load uses multi-row INSERT statements. Targets with a faster bulk path
+        (such as COPY) override this, and fall back to ``_insert_data_into_relation``.
+        """
+        engine = self._relation_connection(relation)
         logger.info(
             f'Loading data into relation {relation.quoted_dot_notation}...')
+        start = time.time()
         try:
-            attribute_type_map={attr.name:attr.data_type.sqlalchemy_type for attr in relation.attributes}
-            data_type_map={col:case_insensitive_dict_value(attribute_type_map,col) for col in relation.data.columns.to_list()}
-            relation.data.to_sql(relation.name,
-                                 engine,
-                                 schema=relation.schema,
-                                 if_exists='replace',
-                                 index=False,
-                                 dtype=data_type_map,
-                                 chunksize=DEFAULT_INSERT_CHUNK_SIZE,
-                                 method='multi')
+            engine.execute(self.create_table_statement(relation))
+            self._insert_data_into_relation(relation, engine)
         except Exception as e:
             logger.info(
                 f"Failed to load data into {relation.quoted_dot_notation}:{e}")
             raise e
+        self._record_load(relation, 'insert', start)
+
+    def _insert_data_into_relation(self, relation: Relation, engine) -> None:
+        """appends ``relation.data`` to the existing table with multi-row INSERT statements."""
+        relation.data.to_sql(relation.name,
+                             engine,
+                             schema=self.target_schema(relation.database, relation.schema),
+                             if_exists='append',
+                             index=False,
+                             chunksize=DEFAULT_INSERT_CHUNK_SIZE,
+                             method='multi')
+
+    def _record_load(self, relation: Relation, method: str, start: float) -> None:
+        """Sets the load method and throughput on a relation once its data is loaded."""
+        elapsed = time.time() - start
+        relation.load_method = method
+        relation.load_rows_per_second = len(relation.data) / elapsed if elapsed > 0 else None
         logger.info(
-            f'Data loaded into relation {relation.quoted_dot_notation}')
+            f'Data loaded into relation {relation.quoted_dot_notation} via {method} in {duration(start)}.')
 
     def initialize_replica(self,source_adapter_name:str) -> None:
         """shimming but will want to move _init_image public with this
@@ -128,22 +237,95 @@ AS
         """
         self._init_image(source_adapter_name)
 
+    def remove_container(self) -> None:
+        """Removes the target container, for builds that end before anything is loaded."""
+        if getattr(self, 'container', None) is not None:
+            SnowShuDocker().remove_container(self.container.name)
+
     def _init_image(self, source_adapter_name:str) -> None:
         shdocker = SnowShuDocker()
         logger.info('Initializing target container...')
         self.container = shdocker.startup(
-            self.DOCKER_IMAGE,
+            self._target_image(shdocker),
             self.DOCKER_START_COMMAND,
             self.DOCKER_TARGET_PORT,
             self.CLASSNAME,
             source_adapter_name,
             self._build_snowshu_envars(
-                self.DOCKER_SNOWSHU_ENVARS))
+                self.DOCKER_SNOWSHU_ENVARS),
+            tmpfs=self._build_tmpfs(),
+            reuse=self.reuse_target)
         logger.info('Container initialized.')
-        while not self.target_database_is_ready():
-            sleep(.5)
+        self._wait_until_ready()
+        if self.reuse_target:
+            self.reset_replica()
         self._initialize_snowshu_meta_database()
 
+    def _target_image(self, shdocker: SnowShuDocker) -> str:
+        """the base image if it has been built, otherwise the stock image.
+
+        tmpfs builds start with an empty data directory, so always use the stock image.
+        """
+        self.from_base_image = self.DOCKER_BASE_IMAGE is not None and not self.build_on_tmpfs \
+            and shdocker.image_exists(self.DOCKER_BASE_IMAGE)
+        if self.from_base_image:
+            logger.info(f'Starting target from base image {self.DOCKER_BASE_IMAGE}.')
+            return self.DOCKER_BASE_IMAGE
+        return self.DOCKER_IMAGE
+
+    def build_base_image(self) -> str:
+        """Builds the local base image for this target and returns its name.
+
+        A container is started from ``DOCKER_IMAGE``, set up with ``prepare_base_image``
+        and committed as ``DOCKER_BASE_IMAGE``, replacing any previous base image.
+        """
+        if self.DOCKER_BASE_IMAGE is None:
+            raise NotImplementedError(
+                f'Target adapter {self.CLASSNAME} does not support a base image.')
+        shdocker = SnowShuDocker()
+        logger.info(f'Building base image {self.DOCKER_BASE_IMAGE} from {self.DOCKER_IMAGE}...')
+        self.container = shdocker.startup(
+            self.DOCKER_IMAGE,
+            self.DOCKER_START_COMMAND,
+            self.DOCKER_TARGET_PORT,
+            self.CLASSNAME,
+            'base',
+            self._build_snowshu_envars(
+                self.DOCKER_SNOWSHU_ENVARS))
+        self._wait_until_ready()
+        self.prepare_base_image()
+        self.dispose_connections()
+        shdocker.commit_base_image(self.DOCKER_BASE_IMAGE,
+                                   self.container,
+                                   self.docker_commit_changes())
+        logger.info(f'Base image {self.DOCKER_BASE_IMAGE} built.')
+        return self.DOCKER_BASE_IMAGE
+
+    def prepare_base_image(self) -> None:
+        """sets up a freshly initialized target container to be committed as the base image."""
+        raise NotImplementedError()
+
+    def _wait_until_ready(self, timeout: int = DOCKER_READY_TIMEOUT) -> None:
+        """Waits for the target database to accept connections, backing off between checks."""
+        start = time.time()
+        interval = .1
+        while not self.target_database_is_ready():
+            if time.time() - start > timeout:
+                raise TimeoutError(
+                    f'Target database was not ready after {timeout} seconds.')
+            sleep(interval)
+            interval = min(interval * 2, 2)
+        logger.info(f'Target database ready in {duration(start)}.')
+
+    def _build_tmpfs(self) -> Optional[dict]:
+        """the tmpfs mounts for the build container, if the data directory should be on tmpfs."""
+        if not self.build_on_tmpfs:
+            return None
+        if self.DOCKER_DATA_DIRECTORY is None:
+            logger.warning(f'{self.CLASSNAME} does not support building on tmpfs, ignoring.')
+            return None
+        return {self.DOCKER_DATA_DIRECTORY: 'rw'}
+
     def target_database_is_ready(self) -> bool:
         return self.container.exec_run(
             self.DOCKER_READY_COMMAND).exit_code == 0
@@ -153,9 +335,11 @@ AS
         """
         shdocker = SnowShuDocker()
         logger.info('Finalizing target container into replica...')
+        self.dispose_connections()
         replica_image = shdocker.convert_container_to_replica(self.replica_meta['name'],
                                                               self.container,
-                                                              self)
+                                                              self,
+                                                              keep_container=self.reuse_target)
         logger.info(f'Finalized replica image {self.replica_meta["name"]}')
         return replica_image.tags[0]
 
@@ -215,15 +399,15 @@ AS
             function: The name of the function, must match the sql file name exactly.
             relations: An iterable of relations to apply the function to.
         """
+        if self.from_base_image and function in self.emulation_functions():
+            logger.info(f'Function {function} is already in base image {self.DOCKER_BASE_IMAGE}.')
+            return
         try:
-            functions_path=os.path.abspath(os.path.join(
-                                            os.path.dirname(__file__),
-                                            self.name + '_adapter',
-                                            'functions')) 
-            with open(os.path.join(functions_path, f'{function}.sql'),'r') as f:
+            with open(os.path.join(self._functions_path(), f'{function}.sql'),'r') as f:
                 function_sql=f.read()
 
-            unique_schemas = {(rel.database,rel.schema,) for rel in relations}
+            unique_schemas = {(self.target_database(rel.database),
+                               self.target_schema(rel.database,rel.schema),) for rel in relations}
             for db,schema in unique_schemas:
                 conn = self.get_connection(database_override=db,
                                            schema_override=schema)
@@ -233,3 +417,16 @@ AS
         except FileNotFoundError:
             logger.info(f'Function {function} is not implemented for target {self.CLASSNAME}.')
             return    
+
+    def _functions_path(self) -> str:
+        return os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                            self.name + '_adapter',
+                                            'functions'))
+
+    def emulation_functions(self) -> List[str]:
+        """the names of every source function emulation implemented for this target."""
+        try:
+            return sorted([os.path.splitext(file)[0] for file in os.listdir(self._functions_path())
+                           if file.endswith('.sql')])
+        except FileNotFoundError:
+            return list()
@@ -1,20 +1,24 @@
-/* Emulates as GREATEST (ie MAX value) */
+/* Returns the first non-null value of the group (Snowflake returns an arbitrary one).
+Parallel safe, partial aggregates are combined by keeping the first state. */
 
 
-create or replace function any_value_mock (anynonarray, anynonarray) returns anynonarray
+CREATE OR REPLACE FUNCTION any_value_sfunc (anyelement, anyelement) RETURNS anyelement
+    LANGUAGE SQL IMMUTABLE STRICT PARALLEL SAFE AS $$
 
-    language sql as $$
-
-select greatest($1,$2);
+SELECT $1;
 
 $$;
 
-CREATE or replace AGGREGATE any_value (anyelement)
+CREATE OR REPLACE AGGREGATE any_value (anyelement)
 
 (
 
-    sfunc = any_value_mock,
+    sfunc = any_value_sfunc,
+
+    stype = anyelement,
+
+    combinefunc = any_value_sfunc,
 
-    stype = anyelement
+    parallel = safe
 
 );
@@ -0,0 +1,15 @@
+/* Same native transition function as bool_and, parallel safe. */
+
+CREATE OR REPLACE AGGREGATE BOOLAND_AGG (boolean)
+
+(
+
+    sfunc = booland_statefunc,
+
+    stype = boolean,
+
+    combinefunc = booland_statefunc,
+
+    parallel = safe
+
+);
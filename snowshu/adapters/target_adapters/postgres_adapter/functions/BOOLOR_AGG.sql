@@ -0,0 +1,15 @@
+/* Same native transition function as bool_or, parallel safe. */
+
+CREATE OR REPLACE AGGREGATE BOOLOR_AGG (boolean)
+
+(
+
+    sfunc = boolor_statefunc,
+
+    stype = boolean,
+
+    combinefunc = boolor_statefunc,
+
+    parallel = safe
+
+);
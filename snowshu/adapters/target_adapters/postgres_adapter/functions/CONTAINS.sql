@@ -0,0 +1,8 @@
+/* Inlined as strpos(expr1, expr2) > 0. */
+
+CREATE OR REPLACE FUNCTION CONTAINS(expr1 text, expr2 text)
+RETURNS boolean AS
+$$
+SELECT strpos($1, $2) > 0
+$$
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
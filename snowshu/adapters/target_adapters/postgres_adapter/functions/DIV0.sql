@@ -0,0 +1,16 @@
+/* Inlined as division returning 0 when the divisor is 0. 
+Integers are divided as double precision, not truncated. */
+
+CREATE OR REPLACE FUNCTION DIV0(dividend numeric, divisor numeric)
+RETURNS numeric AS
+$$
+SELECT CASE WHEN $2 = 0 THEN 0 ELSE $1 / $2 END
+$$
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
+
+CREATE OR REPLACE FUNCTION DIV0(dividend double precision, divisor double precision)
+RETURNS double precision AS
+$$
+SELECT CASE WHEN $2 = 0 THEN 0 ELSE $1 / $2 END
+$$
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
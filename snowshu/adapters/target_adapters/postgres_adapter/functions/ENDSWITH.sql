@@ -0,0 +1,8 @@
+/* Inlined as right(expr1, length(expr2)) = expr2. */
+
+CREATE OR REPLACE FUNCTION ENDSWITH(expr1 text, expr2 text)
+RETURNS boolean AS
+$$
+SELECT right($1, length($2)) = $2
+$$
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
@@ -0,0 +1,46 @@
+/* Inlined as expr1 IS NOT DISTINCT FROM expr2. */
+
+CREATE OR REPLACE FUNCTION EQUAL_NULL(expr1 anyelement, expr2 anyelement)
+RETURNS boolean AS
+$$
+SELECT $1 IS NOT DISTINCT FROM $2
+$$
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
+
+-- mixed numeric arguments (such as a numeric column and an integer literal) cannot
+-- be typed as a single anyelement, so postgres picks the overload that needs the fewest casts
+CREATE OR REPLACE FUNCTION EQUAL_NULL(expr1 integer, expr2 integer)
+RETURNS boolean AS
+$$
+SELECT $1 IS NOT DISTINCT FROM $2
+$$
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
+
+CREATE OR REPLACE FUNCTION EQUAL_NULL(expr1 bigint, expr2 bigint)
+RETURNS boolean AS
+$$
+SELECT $1 IS NOT DISTINCT FROM $2
+$$
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
+
+CREATE OR REPLACE FUNCTION EQUAL_NULL(expr1 numeric, expr2 numeric)
+RETURNS boolean AS
+$$
+SELECT $1 IS NOT DISTINCT FROM $2
+$$
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
+
+CREATE OR REPLACE FUNCTION EQUAL_NULL(expr1 double precision, expr2 double precision)
+RETURNS boolean AS
+$$
+SELECT $1 IS NOT DISTINCT FROM $2
+$$
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
+
+-- resolves string literals, which cannot be typed as anyelement
+CREATE OR REPLACE FUNCTION EQUAL_NULL(expr1 text, expr2 text)
+RETURNS boolean AS
+$$
+SELECT $1 IS NOT DISTINCT FROM $2
+$$
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
@@ -0,0 +1,46 @@
+/* Inlined as CASE WHEN condition THEN expr1 ELSE expr2 END. */
+
+CREATE OR REPLACE FUNCTION IFF(condition boolean, expr1 anyelement, expr2 anyelement)
+RETURNS anyelement AS
+$$
+SELECT CASE WHEN $1 THEN $2 ELSE $3 END
+$$
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
+
+-- mixed numeric arguments (such as a numeric column and an integer literal) cannot
+-- be typed as a single anyelement, so postgres picks the overload that needs the fewest casts
+CREATE OR REPLACE FUNCTION IFF(condition boolean, expr1 integer, expr2 integer)
+RETURNS integer AS
+$$
+SELECT CASE WHEN $1 THEN $2 ELSE $3 END
+$$
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
+
+CREATE OR REPLACE FUNCTION IFF(condition boolean, expr1 bigint, expr2 bigint)
+RETURNS bigint AS
+$$
+SELECT CASE WHEN $1 THEN $2 ELSE $3 END
+$$
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
+
+CREATE OR REPLACE FUNCTION IFF(condition boolean, expr1 numeric, expr2 numeric)
+RETURNS numeric AS
+$$
+SELECT CASE WHEN $1 THEN $2 ELSE $3 END
+$$
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
+
+CREATE OR REPLACE FUNCTION IFF(condition boolean, expr1 double precision, expr2 double precision)
+RETURNS double precision AS
+$$
+SELECT CASE WHEN $1 THEN $2 ELSE $3 END
+$$
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
+
+-- resolves string literals, which cannot be typed as anyelement
+CREATE OR REPLACE FUNCTION IFF(condition boolean, expr1 text, expr2 text)
+RETURNS text AS
+$$
+SELECT CASE WHEN $1 THEN $2 ELSE $3 END
+$$
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
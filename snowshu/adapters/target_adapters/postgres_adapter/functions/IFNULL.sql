@@ -0,0 +1,46 @@
+/* Inlined as COALESCE(expr1, expr2). */
+
+CREATE OR REPLACE FUNCTION IFNULL(expr1 anyelement, expr2 anyelement)
+RETURNS anyelement AS
+$$
+SELECT COALESCE($1, $2)
+$$
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
+
+-- mixed numeric arguments (such as a numeric column and an integer literal) cannot
+-- be typed as a single anyelement, so postgres picks the overload that needs the fewest casts
+CREATE OR REPLACE FUNCTION IFNULL(expr1 integer, expr2 integer)
+RETURNS integer AS
+$$
+SELECT COALESCE($1, $2)
+$$
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
+
+CREATE OR REPLACE FUNCTION IFNULL(expr1 bigint, expr2 bigint)
+RETURNS bigint AS
+$$
+SELECT COALESCE($1, $2)
+$$
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
+
+CREATE OR REPLACE FUNCTION IFNULL(expr1 numeric, expr2 numeric)
+RETURNS numeric AS
+$$
+SELECT COALESCE($1, $2)
+$$
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
+
+CREATE OR REPLACE FUNCTION IFNULL(expr1 double precision, expr2 double precision)
+RETURNS double precision AS
+$$
+SELECT COALESCE($1, $2)
+$$
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
+
+-- resolves string literals, which cannot be typed as anyelement
+CREATE OR REPLACE FUNCTION IFNULL(expr1 text, expr2 text)
+RETURNS text AS
+$$
+SELECT COALESCE($1, $2)
+$$
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
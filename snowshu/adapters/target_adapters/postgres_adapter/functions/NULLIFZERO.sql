@@ -0,0 +1,8 @@
+/* Inlined as NULLIF(expr, 0), for numeric types. */
+
+CREATE OR REPLACE FUNCTION NULLIFZERO(expr anyelement)
+RETURNS anyelement AS
+$$
+SELECT NULLIF($1, 0)
+$$
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
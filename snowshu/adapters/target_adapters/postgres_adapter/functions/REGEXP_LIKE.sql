@@ -0,0 +1,13 @@
+/* Alias of RLIKE. supports only the 'i' (case insensitive) flag at this time.
+The pattern is anchored at both ends, as in Snowflake. */
+
+CREATE OR REPLACE FUNCTION REGEXP_LIKE(subject text, pattern text, args text DEFAULT '')
+RETURNS BOOLEAN AS 
+$$
+SELECT
+	CASE 
+		WHEN $3 = 'i' THEN $1 ~* ('^(?:' || $2 || ')$')
+		ELSE $1 ~ ('^(?:' || $2 || ')$')
+	END
+$$
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
@@ -1,13 +1,14 @@
 /* supports only 1st syntax ie RLIKE(subject,pattern,args). 
-Only supports the 'i' (case insensitive) flag at this time.*/
+Only supports the 'i' (case insensitive) flag at this time.
+The pattern is anchored at both ends, as in Snowflake. */
 
 CREATE OR REPLACE FUNCTION RLIKE(subject text, pattern text, args text DEFAULT '')
 RETURNS BOOLEAN AS 
 $$
 SELECT
 	CASE 
-		WHEN $3 = 'i' THEN $1 ~* $2
-		ELSE $1 ~ $2
-	end;
+		WHEN $3 = 'i' THEN $1 ~* ('^(?:' || $2 || ')$')
+		ELSE $1 ~ ('^(?:' || $2 || ')$')
+	END
 $$
-LANGUAGE SQL;
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
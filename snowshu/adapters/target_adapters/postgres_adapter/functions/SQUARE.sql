@@ -0,0 +1,15 @@
+/* Inlined as expr * expr. */
+
+CREATE OR REPLACE FUNCTION SQUARE(expr numeric)
+RETURNS numeric AS
+$$
+SELECT $1 * $1
+$$
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
+
+CREATE OR REPLACE FUNCTION SQUARE(expr double precision)
+RETURNS double precision AS
+$$
+SELECT $1 * $1
+$$
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
@@ -0,0 +1,8 @@
+/* Inlined as the native starts_with(expr1, expr2). */
+
+CREATE OR REPLACE FUNCTION STARTSWITH(expr1 text, expr2 text)
+RETURNS boolean AS
+$$
+SELECT starts_with($1, $2)
+$$
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
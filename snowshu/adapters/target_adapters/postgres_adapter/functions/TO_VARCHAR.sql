@@ -0,0 +1,9 @@
+/* supports only the 1st syntax ie TO_VARCHAR(expr), inlined as a cast to text.
+STABLE, as casting dates and timestamps depends on the DateStyle and TimeZone settings. */
+
+CREATE OR REPLACE FUNCTION TO_VARCHAR(expr anyelement)
+RETURNS text AS
+$$
+SELECT $1::text
+$$
+LANGUAGE SQL STABLE PARALLEL SAFE;
@@ -0,0 +1,8 @@
+/* Inlined as COALESCE(expr, 0), for numeric types. */
+
+CREATE OR REPLACE FUNCTION ZEROIFNULL(expr anyelement)
+RETURNS anyelement AS
+$$
+SELECT COALESCE($1, 0)
+$$
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
@@ -1,19 +1,62 @@
+import io
+import os
+import csv
+import json
+import time
+import struct
 import sqlalchemy
+from sqlalchemy.dialects import postgresql
+import pandas as pd
 from typing import List,Iterable
 from snowshu.configs import DOCKER_REMOUNT_DIRECTORY
+from snowshu.core.models import Relation
+from snowshu.core.utils import case_insensitive_dict_value
 from snowshu.core.models import materializations as mz
 from snowshu.core.models import data_types as dt
 from snowshu.adapters.target_adapters import BaseTargetAdapter
 from snowshu.logger import Logger
 logger = Logger().logger
 
+PG_EPOCH = pd.Timestamp('2000-01-01')
+BINARY_COPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('!ii', 0, 0)
+BINARY_COPY_TRAILER = struct.pack('!h', -1)
+
+
+def _binary_int(fmt:str):
+    def encode(val) -> bytes:
+        if int(val) != val:
+            raise ValueError(f'{val} is not an integer')
+        return struct.pack(fmt, int(val))
+    return encode
+
+# COPY BINARY encoders for each data type, keyed by DataType name.
+BINARY_COPY_ENCODERS = dict(
+    bigint=_binary_int('!q'),
+    integer=_binary_int('!i'),
+    float=lambda val: struct.pack('!d', float(val)),
+    boolean=lambda val: struct.pack('!?', bool(val)),
+    varchar=lambda val: str(val).encode('utf-8'),
+    char=lambda val: str(val).encode('utf-8'),
+    binary=bytes,
+    date=lambda val: struct.pack('!i', (pd.Timestamp(val).normalize() - PG_EPOCH).days),
+    timestamp_ntz=lambda val: struct.pack('!q', (pd.Timestamp(val) - PG_EPOCH).value // 1000))
+
 
 class PostgresAdapter(BaseTargetAdapter):
     name = 'postgres'
     dialect = 'postgres'
     DOCKER_IMAGE = 'postgres:12'
+    DOCKER_BASE_IMAGE = 'snowshu_base_postgres:12'
     MATERIALIZATION_MAPPINGS = dict(TABLE=mz.TABLE, VIEW=mz.VIEW)
     DOCKER_REMOUNT_DIRECTORY = DOCKER_REMOUNT_DIRECTORY
+    DATA_TYPE_DDL = {data_type.name: data_type.sqlalchemy_type.compile(dialect=postgresql.dialect())
+                     for data_type in dt.DATA_TYPES}
+    # postgres has no DATETIME, sqlalchemy renders the generic type name as-is
+    DATA_TYPE_DDL['datetime'] = 'TIMESTAMP WITHOUT TIME ZONE'
+    # the generic CHAR is CHAR(1) in postgres, source CHAR columns can be any length
+    DATA_TYPE_DDL['char'] = 'VARCHAR'
+    # 'csv' or 'binary'. Binary falls back to csv for relations with types it cannot encode.
+    COPY_FORMAT = 'csv'
 
     # NOTE: either start container with db listening on port 9999,
     # or override with DOCKER_TARGET_PORT
@@ -21,61 +64,301 @@ class PostgresAdapter(BaseTargetAdapter):
     DOCKER_SNOWSHU_ENVARS = ['POSTGRES_PASSWORD',
                              'POSTGRES_USER',
                              'POSTGRES_DB']
+    # the image declares its default data directory a volume, which is left out of commits.
+    # Replicas are built in a plain directory instead so the container can be committed as-is.
+    DOCKER_DATA_DIRECTORY = '/var/lib/postgresql/data'
+    DOCKER_REPLICA_DATA_DIRECTORY = f'/{DOCKER_REMOUNT_DIRECTORY}'
+    # durability settings that are safe to drop while a replica is built; the data is
+    # made durable (SET LOGGED + CHECKPOINT) before the container is committed.
+    FAST_LOAD_SETTINGS = ('fsync=off',
+                          'synchronous_commit=off',
+                          'full_page_writes=off',)
+    fast_load = True
+    # baked into the base image with ALTER SYSTEM. Fewer checkpoints while loading, and
+    # minimal WAL for tables created and loaded in the same build.
+    BASE_IMAGE_SETTINGS = ("max_wal_size = '4GB'",
+                           "checkpoint_timeout = '30min'",
+                           "maintenance_work_mem = '512MB'",
+                           "wal_level = 'minimal'",
+                           "max_wal_senders = 0",)
 
     def __init__(self):
         super().__init__()
 
-        self.DOCKER_START_COMMAND = f'postgres -p {self._credentials.port}'
         self.DOCKER_READY_COMMAND = f'pg_isready -p {self._credentials.port} -h {self._credentials.host} -U {self._credentials.user} -d {self._credentials.database}'
 
+    @property
+    def DOCKER_START_COMMAND(self) -> str:
+        command = f'postgres -p {self._credentials.port}'
+        if self.fast_load:
+            command += ''.join([f' -c {setting}' for setting in self.FAST_LOAD_SETTINGS])
+        return command
+
+    @property
+    def pgdata(self) -> str:
+        """the data directory of the build container.
+
+        tmpfs mounts are not committed either, so a tmpfs build uses the default data
+        directory and is copied into the replica data directory when finalized.
+        """
+        return self.DOCKER_DATA_DIRECTORY if self.build_on_tmpfs else self.DOCKER_REPLICA_DATA_DIRECTORY
+
+    def _build_snowshu_envars(self, snowshu_envars: list) -> list:
+        return super()._build_snowshu_envars(snowshu_envars) + [f'PGDATA={self.pgdata}']
+
+    def create_table_statement(self, relation: Relation) -> str:
+        """tables are UNLOGGED during a fast load, and set LOGGED before the replica is finalized."""
+        statement = super().create_table_statement(relation)
+        return statement.replace('CREATE TABLE', 'CREATE UNLOGGED TABLE', 1) if self.fast_load else statement
+
+    def finalize_replica(self) -> str:
+        if self.fast_load:
+            self._make_replica_durable()
+        return super().finalize_replica()
+
+    def _make_replica_durable(self) -> None:
+        """Sets every unlogged table LOGGED.
+
+        Unlogged tables are emptied when postgres recovers from an unclean stop. The
+        container is stopped cleanly (with a shutdown checkpoint) before it is committed,
+        and the fast load settings only live on the build container command.
+        """
+        logger.info('Making replica tables durable...')
+        databases = [row[0] for row in self.get_connection().execute(
+            "SELECT datname FROM pg_database WHERE datallowconn AND NOT datistemplate").fetchall()]
+        for database in databases:
+            self.get_connection(database_override=database).execute("""
+DO $$
+DECLARE r record;
+BEGIN
+    FOR r IN SELECT n.nspname, c.relname FROM pg_class c
+             JOIN pg_namespace n ON n.oid = c.relnamespace
+             WHERE c.relpersistence = 'u' AND c.relkind = 'r'
+    LOOP
+        EXECUTE format('ALTER TABLE %I.%I SET LOGGED', r.nspname, r.relname);
+    END LOOP;
+END $$""")
+        logger.info('Replica tables are durable.')
+
+    def prepare_base_image(self) -> None:
+        """Tunes the server and installs postgres_fdw and every emulation function.
+
+        Extensions and functions go into template1, so every database created from the base
+        image has them, and into the default database which initdb created before them.
+        """
+        conn = self.get_connection()
+        for setting in self.BASE_IMAGE_SETTINGS:
+            conn.execute(f'ALTER SYSTEM SET {setting}')
+        self.create_schema_if_not_exists(self._credentials.database, 'snowshu')
+        for database in ('template1', self._credentials.database,):
+            conn = self.get_connection(database_override=database)
+            logger.info(f'Installing extensions and functions in {database}...')
+            conn.execute('CREATE EXTENSION IF NOT EXISTS postgres_fdw')
+            for function in self.emulation_functions():
+                with open(os.path.join(self._functions_path(), f'{function}.sql'), 'r') as f:
+                    conn.execute(f.read())
+
+    def reset_replica(self) -> None:
+        """Drops everything a previous build loaded into a reused target.
+
+        Every database but postgres, the templates and the credentials database is dropped.
+        The credentials database is kept, since every other database is created from a
+        connection to it, and is emptied of the schemas (including ``replica_meta``), foreign
+        servers and search path a build adds.
+        """
+        conn = self.get_connection(database_override='postgres')
+        databases = [row[0] for row in conn.execute(
+            f"""SELECT datname FROM pg_database
+WHERE NOT datistemplate AND datname NOT IN ('postgres', '{self._credentials.database}')""").fetchall()]
+        for database in databases:
+            logger.info(f'Dropping database {database} from reused target...')
+            conn.execute(f"""SELECT pg_terminate_backend(pid) FROM pg_stat_activity
+WHERE datname = '{database}' AND pid <> pg_backend_pid()""")
+            conn.execute(f'DROP DATABASE IF EXISTS "{database}"')
+
+        conn = self.get_connection()
+        for server in [row[0] for row in conn.execute('SELECT srvname FROM pg_foreign_server').fetchall()]:
+            conn.execute(f'DROP SERVER IF EXISTS "{server}" CASCADE')
+        schemas = [row[0] for row in conn.execute(
+            """SELECT nspname FROM pg_namespace
+WHERE nspname NOT IN ('public', 'information_schema') AND nspname !~ '^pg_'""").fetchall()]
+        for schema in schemas:
+            logger.info(f'Dropping schema {schema} from reused target...')
+            conn.execute(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE')
+        conn.execute(f'ALTER DATABASE {self._credentials.database} RESET search_path')
+
     def _create_snowshu_schema_statement(self) -> str:
         return 'CREATE SCHEMA IF NOT EXISTS snowshu;'
 
     def create_database_if_not_exists(self, database: str) -> str:
         """Postgres doesn't have great CINE support.
 
-        So ask for forgiveness instead.
+        So ask for forgiveness instead. Each database is only attempted once per build.
         """
-        conn = self.get_connection()
-        statement = f'CREATE DATABASE {database}'
-        try:
-            conn.execute(statement)
-        except (sqlalchemy.exc.ProgrammingError, sqlalchemy.exc.IntegrityError) as e:
-            if (f'database "{database}" already exists' in str(e)) or (
-                    'duplicate key value violates unique constraint ' in str(e)):
-                logger.debug(
-                    f'Database {database} already exists, skipping.')
-                pass
-            else:
-                raise e
+        database = self.target_database(database)
+
+        def create():
+            conn = self.get_connection()
+            statement = f'CREATE DATABASE {database}'
+            try:
+                conn.execute(statement)
+            except (sqlalchemy.exc.ProgrammingError, sqlalchemy.exc.IntegrityError) as e:
+                if (f'database "{database}" already exists' in str(e)) or (
+                        'duplicate key value violates unique constraint ' in str(e)):
+                    logger.debug(
+                        f'Database {database} already exists, skipping.')
+                    pass
+                else:
+                    raise e
+        self._create_once((database,), create)
         return database
 
     def create_schema_if_not_exists(self, database: str, schema: str) -> None:
-        conn = self.get_connection(database_override=database)
-        statement = f'CREATE SCHEMA IF NOT EXISTS {schema}'
+        def create():
+            conn = self.get_connection(database_override=self.target_database(database))
+            target_schema = self.target_schema(database, schema)
+            statement = f'CREATE SCHEMA IF NOT EXISTS {target_schema}'
+            try:
+                conn.execute(statement)
+            except (sqlalchemy.exc.ProgrammingError, sqlalchemy.exc.IntegrityError) as e:
+                if (f'Key (nspname)=({target_schema}) already exists' in str(e)) or (
+                        'duplicate key value violates unique constraint ' in str(e)):
+                    logger.debug(
+                        f'Schema {self.target_database(database)}.{target_schema} already exists, skipping.')
+                    pass
+                else:
+                    raise e
+        self._create_once((database, schema,), create)
+
+    def load_data_into_relation(self, relation: Relation) -> None:
+        """Creates the table for ``relation`` and loads ``relation.data`` with ``COPY ... FROM STDIN``.
+
+        The data is streamed in from an in-memory buffer as binary (when ``COPY_FORMAT`` is binary
+        and every column type can be encoded) or csv. If COPY fails the load falls back to
+        multi-row INSERTs.
+        """
+        engine = self._relation_connection(relation)
+        logger.info(
+            f'Loading data into relation {relation.quoted_dot_notation} with COPY...')
+        start = time.time()
+        try:
+            engine.execute(self.create_table_statement(relation))
+        except Exception as e:
+            logger.info(
+                f"Failed to create table {relation.quoted_dot_notation}:{e}")
+            raise e
+
         try:
-            conn.execute(statement)
-        except (sqlalchemy.exc.ProgrammingError, sqlalchemy.exc.IntegrityError) as e:
-            if (f'Key (nspname)=({schema}) already exists' in str(e)) or (
-                    'duplicate key value violates unique constraint ' in str(e)):
-                logger.debug(
-                    f'Schema {database}.{schema} already exists, skipping.')
-                pass
-            else:
+            attribute_type_map = {attr.name:attr.data_type for attr in relation.attributes}
+            data_types = [case_insensitive_dict_value(attribute_type_map, col) for col in relation.data.columns.to_list()]
+            binary = self.COPY_FORMAT == 'binary' and all(
+                data_type.name in BINARY_COPY_ENCODERS for data_type in data_types)
+            buffer = self._binary_copy_buffer(relation.data, data_types) if binary else \
+                self._csv_copy_buffer(relation.data, data_types)
+            columns = ','.join([f'"{col}"' for col in relation.data.columns.to_list()])
+            options = "FORMAT binary" if binary else "FORMAT csv, NULL '\\N'"
+            connection = engine.raw_connection()
+            try:
+                with connection.cursor() as cursor:
+                    cursor.copy_expert(f'COPY {self.quoted_table(relation)} ({columns}) FROM STDIN WITH ({options})',
+                                       buffer)
+                connection.commit()
+            finally:
+                connection.close()
+        except Exception as e:
+            logger.warning(
+                f'COPY into {relation.quoted_dot_notation} failed, falling back to INSERT: {e}')
+            try:
+                self._insert_data_into_relation(relation, engine)
+            except Exception as e:
+                logger.info(
+                    f"Failed to load data into {relation.quoted_dot_notation}:{e}")
                 raise e
+            return self._record_load(relation, 'insert', start)
+        self._record_load(relation, 'copy binary' if binary else 'copy csv', start)
 
+    def _csv_copy_buffer(self, frame:pd.DataFrame, data_types:list) -> io.StringIO:
+        """Renders a frame as COPY csv, with integer and binary columns in postgres input format.
+
+        Values are never changed to fit a column; non-integer values in an integer column
+        raise, so the load falls back to INSERT.
+        """
+        frame = frame.copy(deep=False)
+        for col, data_type in zip(frame.columns.to_list(), data_types):
+            if data_type.name in ('bigint','integer',):
+                values = pd.to_numeric(frame[col])
+                if not (values.dropna() % 1 == 0).all():
+                    raise ValueError(f'Column {col} has non-integer values')
+                frame[col] = values.astype('Int64')
+            elif data_type.name == 'json':
+                frame[col] = frame[col].map(lambda val: json.dumps(val) if isinstance(val, (dict, list,)) else val)
+            elif data_type.name == 'binary':
+                frame[col] = frame[col].map(lambda val: '\\x' + bytes(val).hex() if isinstance(val, (bytes, bytearray, memoryview,)) else val)
+        buffer = io.StringIO()
+        frame.to_csv(buffer, index=False, header=False, na_rep='\\N', quoting=csv.QUOTE_MINIMAL)
+        buffer.seek(0)
+        return buffer
+
+    def _binary_copy_buffer(self, frame:pd.DataFrame, data_types:list) -> io.BytesIO:
+        """Renders a frame in the postgres COPY binary format."""
+        null = struct.pack('!i', -1)
+
+        def encoded_column(values, data_type):
+            encoder = BINARY_COPY_ENCODERS[data_type.name]
+            encoded = list()
+            for val in values:
+                if val is None or (not isinstance(val, (bytes, bytearray, memoryview,)) and pd.isnull(val)):
+                    encoded.append(null)
+                else:
+                    field = encoder(val)
+                    encoded.append(struct.pack('!i', len(field)) + field)
+            return encoded
+
+        field_count = struct.pack('!h', len(frame.columns))
+        columns = [encoded_column(frame[col].tolist(), data_type) for col, data_type in
+                   zip(frame.columns.to_list(), data_types)]
+        buffer = io.BytesIO()
+        buffer.write(BINARY_COPY_HEADER)
+        for row in zip(*columns):
+            buffer.write(field_count + b''.join(row))
+        buffer.write(BINARY_COPY_TRAILER)
+        buffer.seek(0)
+        return buffer
 
     def image_finalize_bash_commands(self)->List[str]:
+        """Replicas are built in the replica data directory, so only tmpfs builds need copying.
+
+        Postgres is the container's main process, so it cannot be stopped before the copy
+        without stopping the container (and losing the tmpfs). The copy is taken as an
+        online backup instead: ``pg_start_backup`` forces full page writes and writes a
+        backup_label, so the replica replays the WAL up to ``pg_stop_backup`` on its first
+        start and never runs on torn pages. tmpfs builds always start from the stock image,
+        whose wal_level allows online backups.
+        """
         commands=list()
-        commands.append(f'mkdir /{DOCKER_REMOUNT_DIRECTORY}'),
-        commands.append(f'cp -a /var/lib/postgresql/data/* /{DOCKER_REMOUNT_DIRECTORY}')
+        if self.pgdata != self.DOCKER_REPLICA_DATA_DIRECTORY:
+            psql = f'psql -v ON_ERROR_STOP=1 -p {self._credentials.port} -U {self._credentials.user} -d {self._credentials.database}'
+            commands.append(f'{psql} -c "SELECT pg_start_backup($$snowshu_replica$$, true)"')
+            commands.append(f'mkdir -p {self.DOCKER_REPLICA_DATA_DIRECTORY}')
+            commands.append(f'cp -a {self.pgdata}/. {self.DOCKER_REPLICA_DATA_DIRECTORY}')
+            commands.append(f'{psql} -c "SELECT pg_stop_backup()"')
+            # the copy is only consistent with the WAL written up to pg_stop_backup
+            commands.append(f'cp -a {self.pgdata}/pg_wal/. {self.DOCKER_REPLICA_DATA_DIRECTORY}/pg_wal')
+            commands.append(f'rm -f {self.DOCKER_REPLICA_DATA_DIRECTORY}/postmaster.pid')
         return commands
     
-    def docker_commit_changes(self)->str:
-        """To finalize the image we need to set envars for the container."""
-        return f"ENV PGDATA /{DOCKER_REMOUNT_DIRECTORY}"
+    def docker_commit_changes(self)->List[str]:
+        """To finalize the image we need to set envars for the container.
+
+        The command is reset so replicas never start with the fast load settings.
+        """
+        return [f"ENV PGDATA {self.DOCKER_REPLICA_DATA_DIRECTORY}",
+                f'CMD ["postgres", "-p", "{self._credentials.port}"]']
 
     def enable_cross_database(self,relations:Iterable['Relation'])->None:
+        if self.single_database:
+            return self._set_single_database_search_path(relations)
+
         unique_schemas = {(rel.database,rel.schema,) for rel in relations}
         unique_databases = {rel.database for rel in relations}
         unique_databases.add('snowshu')
@@ -88,7 +371,7 @@ class PostgresAdapter(BaseTargetAdapter):
         
         for db in unique_databases:
             conn = self.get_connection(database_override=db)
-            statement_runner('CREATE EXTENSION postgres_fdw')
+            statement_runner('CREATE EXTENSION IF NOT EXISTS postgres_fdw')
             for remote_database in filter((lambda x : x!=db), unique_databases):
                 statement_runner(f"""CREATE SERVER {remote_database}
 FOREIGN DATA WRAPPER postgres_fdw
@@ -105,3 +388,13 @@ OPTIONS (user 'snowshu', password 'snowshu')""")
                     statement_runner(f"""IMPORT FOREIGN SCHEMA {schema}
     FROM SERVER {schema_database} INTO {schema_database}__{schema} """)
 
+    def _set_single_database_search_path(self,relations:Iterable['Relation'])->None:
+        """In the single database layout every relation is already local, so no foreign
+        data wrappers are needed. The search path of the replica database is set to every
+        loaded schema so unqualified names resolve as they would in a single schema."""
+        schemas = sorted({self.target_schema(rel.database,rel.schema) for rel in relations})
+        search_path = ', '.join(['"$user"', 'public'] + [f'"{schema}"' for schema in schemas])
+        statement = f'ALTER DATABASE {self._credentials.database} SET search_path TO {search_path}'
+        logger.info(f'executing statement `{statement}...`')
+        self.get_connection().execute(statement)
+        logger.info('Executed.')
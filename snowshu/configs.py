@@ -9,10 +9,22 @@ DEFAULT_MAX_NUMBER_OF_OUTLIERS=100
 DEFAULT_PRESERVE_CASE=False
 DEFAULT_INSERT_CHUNK_SIZE=50000
 DEFAULT_THREAD_COUNT=4
+POOL_TIMEOUT=600
+POOL_RECYCLE=3600
+DEFAULT_CATALOG_CACHE_TTL=3600
+POPULATION_COUNT_BATCH_SIZE=100
+LOAD_QUEUE_SIZE=8
+COST_SECONDS_PER_RELATION=0.5
+COST_SECONDS_PER_MEGABYTE=0.5
+COST_DEFAULT_BYTES_PER_ATTRIBUTE=16
+DEFAULT_CATALOG_STRATEGY='information_schema'
+CATALOG_CACHE_DIRECTORY=os.path.join(os.path.expanduser('~'),'.snowshu','catalog_cache')
 DOCKER_NETWORK='snowshu'
 DOCKER_TARGET_CONTAINER='snowshu_target'
 DOCKER_REMOUNT_DIRECTORY='snowshu_replica_data'
 DOCKER_TARGET_PORT=9999
+DOCKER_STOP_TIMEOUT=600
+DOCKER_READY_TIMEOUT=300
 
 
 
@@ -1,7 +1,9 @@
-from typing import Type
+import re
+from typing import Type, Optional, List
 from snowshu.adapters.source_adapters import BaseSourceAdapter
-from concurrent.futures import ThreadPoolExecutor
 import time
+from snowshu.configs import DEFAULT_CATALOG_CACHE_TTL
+from snowshu.core.catalog_cache import CatalogCache
 from snowshu.logger import Logger, duration
 logger = Logger().logger
 
@@ -10,21 +12,59 @@ class Catalog:
 
     @staticmethod
     def load_full_catalog(adapter:Type['BaseSourceAdapter'],
-                          threads:int = 4) -> None:
-        catalog = list()
-        def accumulate_relations(db, accumulator):
-            try:
-                accumulator += adapter.get_relations_from_database(db)
-            except Exception as e:
-                logger.critical(e)
-                raise e
+                          threads:int = 4,
+                          cache_ttl:int = DEFAULT_CATALOG_CACHE_TTL,
+                          refresh:bool = False,
+                          patterns:Optional[List[dict]] = None) -> tuple:
+        """Collects every relation the source adapter can see.
+
+        Catalogs are cached locally. A cache younger than ``cache_ttl`` seconds is used as-is;
+        an older cache is refreshed incrementally by re-reading only the databases whose
+        ``last_altered`` value changed.
+
+        Args:
+            adapter: the source adapter to read the catalog with.
+            threads: the number of threads to use.
+            cache_ttl: seconds a cached catalog is trusted without checking the source. 0 disables the cache.
+            refresh: if True the cache is ignored and the full catalog is re-read.
+            patterns: optional discovery pattern dicts (database,schema,name). Databases that match
+                      no pattern are skipped, and the rest are only read for matching relations.
+        Returns:
+            a tuple of :class:`Relations <snowshu.core.models.relation.Relation>`.
+        """
+        def database_patterns(db):
+            if patterns is None:
+                return None
+            return [pattern for pattern in patterns if
+                    re.fullmatch(pattern['database'], adapter._correct_case(db))]
 
-        catalog = list()
         logger.info('Assessing full catalog...')
         start_timer = time.time()
-        with ThreadPoolExecutor(max_workers=20) as executor:
-            {executor.submit(accumulate_relations, database, catalog)
-             for database in adapter.get_all_databases()}
+        use_cache = cache_ttl > 0
+        cache = CatalogCache(adapter, patterns)
+        if use_cache and not refresh and cache.load() and cache.is_fresh(cache_ttl):
+            catalog = cache.relations()
+            logger.info(
+                f'Done assessing catalog. Found a total of {len(catalog)} relations in the catalog cache in {duration(start_timer)}.')
+            return tuple(catalog)
+
+        databases = adapter.get_all_databases_last_altered(patterns)
+        stale_databases = [db for db, last_altered in databases.items() if
+                           refresh or not use_cache or cache.last_altered(db) != last_altered]
+        logger.info(f'Reading catalog for {len(stale_databases)} of {len(databases)} databases from source...')
+
+        fresh = adapter.get_relations_from_databases({db: database_patterns(db) for db in stale_databases},
+                                                     threads) if stale_databases else dict()
+
+        catalog = list()
+        for db in databases:
+            catalog += fresh[db] if db in fresh else cache.get_database(db)
+
+        if use_cache:
+            cache.databases = {db: cache.databases[db] for db in databases if db in cache.databases}
+            for db, relations in fresh.items():
+                cache.set_database(db, databases[db], relations)
+            cache.save()
 
         logger.info(
             f'Done assessing catalog. Found a total of {len(catalog)} relations from the source in {duration(start_timer)}.')
@@ -0,0 +1,115 @@
+import os
+import gzip
+import json
+import time
+import zlib
+import hashlib
+import tempfile
+from typing import Type, Optional, List
+from snowshu.configs import CATALOG_CACHE_DIRECTORY
+from snowshu.core.models import Relation, Attribute
+from snowshu.core.models import data_types as dt
+from snowshu.core.models import materializations as mz
+from snowshu.logger import Logger
+logger = Logger().logger
+
+
+class CatalogCache:
+    """A local, compressed copy of the source catalog.
+
+    Caches are keyed by the source account, database and role so that different
+    credentials never share a catalog. Each database in the cache keeps the
+    ``last_altered`` value it was read at, which allows stale caches to be refreshed
+    one database at a time.
+
+    Args:
+        adapter: the source adapter the catalog is read with.
+        patterns: the discovery patterns the catalog is filtered with, if any.
+        directory: where cache files are kept. Defaults to ``CATALOG_CACHE_DIRECTORY``.
+    """
+    VERSION = 3
+
+    def __init__(self,
+                 adapter: Type['BaseSourceAdapter'],
+                 patterns: Optional[List[dict]] = None,
+                 directory: str = CATALOG_CACHE_DIRECTORY):
+        credentials = adapter.credentials
+        key = '|'.join([str(getattr(credentials, attr, None)) for attr in ('account', 'database', 'role',)] +
+                       [json.dumps(patterns, sort_keys=True)])
+        self.path = os.path.join(directory,
+                                 f'{adapter.name}_{hashlib.sha1(key.encode()).hexdigest()}.json.gz')
+        self.created_at: Optional[float] = None
+        self.databases = dict()
+
+    def load(self) -> bool:
+        """Reads the cache file, returns False if there is no usable cache."""
+        try:
+            with gzip.open(self.path, 'rt') as f:
+                cached = json.load(f)
+            if cached.get('version') != self.VERSION:
+                raise ValueError(f"cache version {cached.get('version')} is not {self.VERSION}")
+            self.created_at = cached['created_at']
+            self.databases = cached['databases']
+            logger.debug(f'Loaded catalog cache {self.path}.')
+            return True
+        except (OSError, EOFError, zlib.error, ValueError, KeyError) as e:
+            logger.debug(f'No usable catalog cache at {self.path}: {e}')
+            return False
+
+    def save(self) -> None:
+        """Writes the cache to a temporary file and moves it over the cache file,
+        so an interrupted or concurrent save never leaves a partial cache behind."""
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        self.created_at = time.time()
+        descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as raw, gzip.open(raw, 'wt') as f:
+                json.dump(dict(version=self.VERSION,
+                               created_at=self.created_at,
+                               databases=self.databases), f, separators=(',', ':',))
+            os.replace(temporary_path, self.path)
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+        logger.debug(f'Saved catalog cache {self.path}.')
+
+    def is_fresh(self, ttl: int) -> bool:
+        """True when the cache was written less than ``ttl`` seconds ago."""
+        return self.created_at is not None and (time.time() - self.created_at) < ttl
+
+    def last_altered(self, database: str) -> Optional[str]:
+        return self.databases.get(database, dict()).get('last_altered')
+
+    def set_database(self,
+                     database: str,
+                     last_altered: str,
+                     relations: List[Relation]) -> None:
+        self.databases[database] = dict(last_altered=last_altered,
+                                        relations=[self._serialize(relation) for relation in relations])
+
+    def get_database(self, database: str) -> List[Relation]:
+        return [self._deserialize(relation) for relation in self.databases[database]['relations']]
+
+    def relations(self) -> List[Relation]:
+        return [relation for database in self.databases for relation in self.get_database(database)]
+
+    def _serialize(self, relation: Relation) -> list:
+        return [relation.database,
+                relation.schema,
+                relation.name,
+                relation.materialization.name,
+                relation.row_count,
+                relation.bytes,
+                [[attr.name, attr.data_type.name] for attr in relation.attributes],
+                relation.view_ddl]
+
+    def _deserialize(self, serialized: list) -> Relation:
+        database, schema, name, materialization, row_count, bytes, attributes, view_ddl = serialized
+        relation = Relation(database,
+                            schema,
+                            name,
+                            getattr(mz, materialization),
+                            [Attribute(attr, getattr(dt, data_type.upper())) for attr, data_type in attributes])
+        relation.row_count, relation.bytes, relation.view_ddl = row_count, bytes, view_ddl
+        return relation
@@ -18,8 +18,7 @@ class RuntimeSourceCompiler:
         dag."""
         query = str()
         if relation.is_view:
-            relation.core_query, relation.compiled_query = [
-                source_adapter.view_creation_statement(relation) for _ in range(2)]
+            relation.core_query = relation.compiled_query = source_adapter.view_creation_statement(relation)
             return relation
         if relation.unsampled:
             query=source_adapter.unsampled_statement(relation)
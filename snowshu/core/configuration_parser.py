@@ -1,17 +1,27 @@
+import re
 from pathlib import Path
 from snowshu.core.utils import fetch_adapter,correct_case
 import yaml
-from typing import Union, TextIO, List, Optional,Type,Any
+from typing import Union, TextIO, List, Optional,Type,Any,Pattern
 from snowshu.logger import Logger
 from snowshu.configs import DEFAULT_THREAD_COUNT, \
 DEFAULT_MAX_NUMBER_OF_OUTLIERS, \
-DEFAULT_PRESERVE_CASE
-from dataclasses import dataclass
+DEFAULT_PRESERVE_CASE, \
+DEFAULT_CATALOG_CACHE_TTL
+from dataclasses import dataclass, field
 from snowshu.core.samplings.utils import get_sampling_from_partial
 from snowshu.core.models import Credentials
 logger = Logger().logger
 
 
+@dataclass
+class CompiledPattern:
+    """A database, schema and relation pattern, compiled once when the configuration is parsed."""
+    database: Pattern
+    schema: Pattern
+    relation: Pattern
+
+
 @dataclass
 class MatchPattern:
 
@@ -55,6 +65,7 @@ class SpecifiedMatchPattern():
     sampling:Union['BaseSampling',None]
     include_outliers:Union[bool,None]
     relationships: Relationships
+    compiled:Optional[CompiledPattern]=field(default=None,repr=False,compare=False)
 
 @dataclass
 class AdapterProfile:
@@ -77,6 +88,8 @@ class Configuration:
     max_number_of_outliers:int
     general_relations: List[MatchPattern]   
     specified_relations:List[SpecifiedMatchPattern]
+    catalog_cache_ttl:int=DEFAULT_CATALOG_CACHE_TTL
+    general_patterns:List[CompiledPattern]=field(default_factory=list,repr=False)
 
 
 class ConfigurationParser:
@@ -145,10 +158,16 @@ class ConfigurationParser:
         ## set defaults
         [self._set_default(loaded,attr) for attr in ('short_description','long_description',)]
         self._set_default(loaded,'threads',DEFAULT_THREAD_COUNT)
+        source_adapter_profile.adapter.pool_size=loaded['threads']
         self._set_default(loaded['source'],'include_outliers',False)
         self._set_default(loaded['source'],'max_number_of_outliers',DEFAULT_MAX_NUMBER_OF_OUTLIERS)
+        self._set_default(loaded['source'],'catalog_cache_ttl',DEFAULT_CATALOG_CACHE_TTL)
+        if loaded['source'].get('catalog_strategy') is not None:
+            self._set_catalog_strategy(source_adapter_profile.adapter,loaded['source']['catalog_strategy'])
 
         try:
+            target_adapter_profile = self._build_target(loaded)
+            target_adapter_profile.adapter.pool_size=loaded['threads']
             replica_base = (loaded['name'],
                             loaded['version'],
                             loaded['credpath'],
@@ -157,7 +176,7 @@ class ConfigurationParser:
                             loaded['threads'],
                             self.preserve_case,
                             source_adapter_profile,
-                            self._build_target(loaded),
+                            target_adapter_profile,
                             loaded['source']['include_outliers'],
                             get_sampling_from_partial(loaded['source']['sampling']),
                             loaded['source']['max_number_of_outliers'])
@@ -172,7 +191,9 @@ class ConfigurationParser:
 
             return Configuration(*replica_base,
                                  general_relations,
-                                 specified_relations)
+                                 specified_relations,
+                                 catalog_cache_ttl=loaded['source']['catalog_cache_ttl'],
+                                 general_patterns=self._compile_general_patterns(general_relations))
         except KeyError as e:
             message = f"Configuration missing required section: {e}."
             logger.critical(message)
@@ -180,6 +201,31 @@ class ConfigurationParser:
 
         
     
+    def _compile_pattern(self,
+                         database:str,
+                         schema:str,
+                         relation:str)->Optional[CompiledPattern]:
+        """compiles a full pattern, or returns None if any part is empty (and so can never match)."""
+        if not all((database,schema,relation,)):
+            return None
+        return CompiledPattern(*[re.compile(pattern) for pattern in (database,schema,relation,)])
+
+    def _compile_general_patterns(self,general_relations:MatchPattern)->List[CompiledPattern]:
+        compiled=[self._compile_pattern(database.database_pattern,
+                                        schema.schema_pattern,
+                                        relation.relation_pattern) for database in general_relations.databases
+                                                                   for schema in database.schemas
+                                                                   for relation in schema.relations]
+        return [pattern for pattern in compiled if pattern is not None]
+
+    def _set_catalog_strategy(self,adapter:Type['BaseSourceAdapter'],strategy:str)->None:
+        if strategy not in adapter.CATALOG_STRATEGIES:
+            message = (f"Catalog strategy {strategy} is not supported by {adapter.CLASSNAME}. "
+                       f"Options are {', '.join(adapter.CATALOG_STRATEGIES)}.")
+            logger.critical(message)
+            raise ValueError(message)
+        adapter.catalog_strategy=strategy
+
     def _build_relationships(self,specified_pattern:dict)->SpecifiedMatchPattern.Relationships:
         
         def build_relationship(sub)->SpecifiedMatchPattern.RelationshipPattern:
@@ -205,13 +251,18 @@ class ConfigurationParser:
             if rel.get('sampling'):
                 return get_sampling_from_partial(rel['sampling'])
             
-        return [SpecifiedMatchPattern( self.case(rel['database']),
-                    self.case(rel['schema']),
-                    self.case(rel['relation']),
+        def build_specified(rel)->SpecifiedMatchPattern:
+            database,schema,relation=[self.case(rel[attr]) for attr in ('database','schema','relation',)]
+            return SpecifiedMatchPattern(database,
+                    schema,
+                    relation,
                     rel.get('unsampled',False),
                     sampling_or_none(rel),
                     rel.get('include_outliers',None),
-                    self._build_relationships(rel)) for rel in specified_relations]
+                    self._build_relationships(rel),
+                    compiled=self._compile_pattern(database,schema,relation))
+
+        return [build_specified(rel) for rel in specified_relations]
     
     def _build_adapter_profile(self,section:str,
                                full_configs:Union[str,'StringIO',dict])->AdapterProfile:
@@ -247,6 +298,9 @@ class ConfigurationParser:
     def _build_target(self,full_creds:dict)->AdapterProfile:
         adapter=fetch_adapter(full_creds['target']['adapter'],'target')()
         adapter.replica_meta={attr:full_creds[attr] for attr in ('name','short_description','long_description',)}
+        for option in ('fast_load','build_on_tmpfs','single_database',):
+            if full_creds['target'].get(option) is not None:
+                setattr(adapter,option,bool(full_creds['target'][option]))
         return AdapterProfile(full_creds['target']['adapter'],
                               adapter)
 
@@ -0,0 +1,46 @@
+import networkx as nx
+from snowshu.configs import COST_SECONDS_PER_RELATION,\
+    COST_SECONDS_PER_MEGABYTE,\
+    COST_DEFAULT_BYTES_PER_ATTRIBUTE
+
+
+def estimated_rows(relation: 'Relation') -> int:
+    """the number of records expected to be sampled from the relation."""
+    population = relation.row_count if relation.row_count is not None else relation.population_size
+    if population is None or isinstance(population, str) or relation.is_view:
+        return 0
+    if relation.unsampled:
+        return int(population)
+    return min(int(population), relation.sampling.estimate_size(int(population)))
+
+
+def estimate_relation_cost(relation: 'Relation', analyze: bool = False) -> float:
+    """estimates the seconds to extract and load a relation.
+
+    Each relation pays a fixed round trip cost, plus the megabytes of sample moved
+    from the source into the target. Row width comes from the catalog bytes when
+    known. Analyze moves no data, so only the round trip is counted.
+    """
+    if analyze:
+        return COST_SECONDS_PER_RELATION
+    if relation.bytes and relation.row_count:
+        width = relation.bytes / relation.row_count
+    else:
+        width = len(relation.attributes) * COST_DEFAULT_BYTES_PER_ATTRIBUTE
+    return COST_SECONDS_PER_RELATION + \
+        estimated_rows(relation) * width / 1024 ** 2 * COST_SECONDS_PER_MEGABYTE
+
+
+def critical_path_costs(graph: nx.DiGraph, analyze: bool = False) -> dict:
+    """finds the cost of the longest path from each relation to the end of its graph.
+
+    Also sets ``estimated_cost`` on each relation. Scheduling the relations with the
+    longest remaining path first keeps large dependent chains from stretching the
+    tail of the run, while small isolates fill the gaps.
+    """
+    costs = dict()
+    for relation in reversed(list(nx.topological_sort(graph))):
+        relation.estimated_cost = estimate_relation_cost(relation, analyze)
+        costs[relation] = relation.estimated_cost + \
+            max([costs[successor] for successor in graph.successors(relation)], default=0)
+    return costs
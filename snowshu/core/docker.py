@@ -2,8 +2,11 @@ from __future__ import annotations
 from typing import Type, Optional,List
 import docker
 import re
+import json
+import hashlib
 from snowshu.configs import DOCKER_NETWORK,\
-    DOCKER_TARGET_CONTAINER
+    DOCKER_TARGET_CONTAINER,\
+    DOCKER_STOP_TIMEOUT
 from snowshu.logger import Logger
 logger = Logger().logger
 
@@ -17,12 +20,17 @@ class SnowShuDocker:
             self,
             replica_name: str,
             container: docker.models.containers.Container,
-            target_adapter: Type['BaseTargetAdapter']) -> docker.models.images.Image:
+            target_adapter: Type['BaseTargetAdapter'],
+            keep_container: bool = False) -> docker.models.images.Image:
         """coerces a live container into a replica image and returns the image.
 
         replica_name: the name of the new replica
+        keep_container: restart the container after the commit instead of removing it,
+            so it can be reused by the next build.
         """
         self._remount_replica_data(container, target_adapter)
+        logger.info(f'Stopping container {container.name}...')
+        container.stop(timeout=DOCKER_STOP_TIMEOUT)
         replica_name = self.sanitize_replica_name(replica_name)
         logger.info(f'Creating new replica image with name {replica_name}...')
         try:
@@ -33,10 +41,43 @@ class SnowShuDocker:
             repository=self.sanitize_replica_name(replica_name),
             changes=target_adapter.docker_commit_changes()
             )
-        logger.info(f'Replica image {replica.tags[0]} created. Cleaning up...')
-        self.remove_container(container.name)
+        if keep_container:
+            logger.info(f'Replica image {replica.tags[0]} created. Restarting container {container.name} for reuse...')
+            container.start()
+        else:
+            logger.info(f'Replica image {replica.tags[0]} created. Cleaning up...')
+            self.remove_container(container.name)
 
         return replica
+    def commit_base_image(
+            self,
+            image_name: str,
+            container: docker.models.containers.Container,
+            changes: List[str]) -> docker.models.images.Image:
+        """stops a prepared target container, commits it as a base image and removes it.
+
+        Base images are not replicas, so the replica label is switched off.
+        """
+        logger.info(f'Stopping container {container.name}...')
+        container.stop(timeout=DOCKER_STOP_TIMEOUT)
+        try:
+            self.client.images.remove(image_name, force=True)
+        except docker.errors.ImageNotFound:
+            pass
+        repository, tag = image_name.split(':') if ':' in image_name else (image_name, None,)
+        image = container.commit(repository=repository,
+                                 tag=tag,
+                                 changes=changes + ['LABEL snowshu_replica=false'])
+        self.remove_container(container.name)
+        return image
+
+    def image_exists(self, name: str) -> bool:
+        try:
+            self.client.images.get(name)
+            return True
+        except docker.errors.ImageNotFound:
+            return False
+
     ## TODO: this is all holdover from storages, and can be greatly simplified.
     def get_stopped_container(
             self,
@@ -46,7 +87,8 @@ class SnowShuDocker:
             port: int,
             name: Optional[str] = None,
             labels: dict = dict(),
-            protocol: str = "tcp") -> docker.models.containers.Container:
+            protocol: str = "tcp",
+            tmpfs: Optional[dict] = None) -> docker.models.containers.Container:
         name = name if name else self.replica_image_name_to_common_name(image)
         logger.info(f'Finding base image {image}...')
         try:
@@ -63,6 +105,7 @@ class SnowShuDocker:
         self.remove_container(name)
         network = self._get_or_create_network(DOCKER_NETWORK)
         logger.info(f"Creating stopped container {name}...")
+        optional_kwargs = dict(tmpfs=tmpfs) if tmpfs else dict()
         container = self.client.containers.create(image,
                                                   start_command,
                                                   network=network.name,
@@ -71,7 +114,8 @@ class SnowShuDocker:
                                                   ports=port_dict,
                                                   environment=envars,
                                                   labels=labels,
-                                                  detach=True)
+                                                  detach=True,
+                                                  **optional_kwargs)
         logger.info(f"Created stopped container {container.name}.")
         return container
 
@@ -82,7 +126,23 @@ class SnowShuDocker:
                 target_adapter: str,
                 source_adapter: str,
                 envars: list,
-                protocol: str = "tcp") -> docker.models.containers.Container:
+                protocol: str = "tcp",
+                tmpfs: Optional[dict] = None,
+                reuse: bool = False) -> docker.models.containers.Container:
+        """starts the target container.
+
+        With ``reuse`` a running target container built with the same image, command,
+        envars and mounts is returned as-is instead of being replaced.
+        """
+        labels = dict(
+            snowshu_replica='true',
+            target_adapter=target_adapter,
+            source_adapter=source_adapter,
+            snowshu_target_config=self._target_config(image, start_command, envars, tmpfs))
+        if reuse:
+            container = self._get_reusable_container(DOCKER_TARGET_CONTAINER, labels)
+            if container is not None:
+                return container
 
         container = self.get_stopped_container(
             image,
@@ -90,10 +150,8 @@ class SnowShuDocker:
             envars,
             port,
             name=DOCKER_TARGET_CONTAINER,
-            labels=dict(
-                snowshu_replica='true',
-                target_adapter=target_adapter,
-                source_adapter=source_adapter))
+            labels=labels,
+            tmpfs=tmpfs)
         logger.info(
             f'Connecting {DOCKER_TARGET_CONTAINER} to bridge network..')
         self._connect_to_bridge_network(container)
@@ -103,6 +161,30 @@ class SnowShuDocker:
         logger.info(f'Container {DOCKER_TARGET_CONTAINER} started.')
         return container
 
+    @staticmethod
+    def _target_config(image: str, start_command: str, envars: list, tmpfs: Optional[dict]) -> str:
+        """fingerprints the settings a target container was created with."""
+        config = json.dumps([image, start_command, sorted(envars), tmpfs], sort_keys=True)
+        return hashlib.sha256(config.encode()).hexdigest()
+
+    def _get_reusable_container(
+            self,
+            name: str,
+            labels: dict) -> Optional[docker.models.containers.Container]:
+        try:
+            container = self.client.containers.get(name)
+        except docker.errors.NotFound:
+            logger.info(f'No container {name} to reuse, creating one.')
+            return None
+        if any(container.labels.get(key) != value for key, value in labels.items()):
+            logger.info(f'Container {name} was built with different settings, replacing it.')
+            return None
+        if container.status != 'running':
+            logger.info(f'Starting stopped container {name}...')
+            container.start()
+        logger.info(f'Reusing container {name}.')
+        return container
+
     def remove_container(self, container: str) -> None:
         logger.info(f'Removing existing target container {container}...')
         try:
@@ -169,8 +251,11 @@ class SnowShuDocker:
             self,
             container: docker.models.containers.Container,
             target_adapter: Type['BaseTargetAdapter']) -> None:
+        commands = target_adapter.image_finalize_bash_commands()
+        if not commands:
+            return
         logger.info('Remounting data inside target...')
-        for command in target_adapter.image_finalize_bash_commands():
+        for command in commands:
             response = container.exec_run(f"/bin/bash -c '{command}'", tty=True)
             if response[0] > 0:
                 raise OSError(response[1])
@@ -1,13 +1,12 @@
+import re
 import networkx
 from snowshu.exceptions import InvalidRelationshipException
 from snowshu.core.models.relation import Relation
-from snowshu.core.configuration_parser import Configuration
-from typing import Tuple, Set, List
+from snowshu.core.configuration_parser import Configuration, CompiledPattern
+from typing import Tuple, Set, List, Union
 from snowshu.logger import Logger
 from snowshu.core.samplings.utils import get_sampling_from_partial
-from snowshu.core.models.relation import at_least_one_full_pattern_match,\
-    lookup_single_relation,\
-    single_full_pattern_match
+from snowshu.core.models.relation import RelationIndex
 
 logger = Logger().logger
 
@@ -31,17 +30,19 @@ class SnowShuGraph:
         """
         logger.debug('Building graphs from config...')
 
+        catalog_index = RelationIndex(full_catalog)
+
         ## set defaults for all relations in the catalog
         [self._set_globals_for_node(relation,configs) for relation in full_catalog]
-        [self._set_overriding_params_for_node(relation,configs) for relation in full_catalog]
+        self._set_overriding_params(catalog_index,configs)
 
         included_relations = self._filter_relations(
-            full_catalog, self._build_sum_patterns_from_configs(configs))
+            catalog_index, self._build_compiled_patterns_from_configs(configs))
 
         # build graph and add edges
         graph = networkx.DiGraph()
         graph.add_nodes_from(included_relations)
-        self.graph=self._apply_specifications(configs,graph, full_catalog)
+        self.graph=self._apply_specifications(configs,graph, catalog_index)
 
         
         logger.info(f'Identified a total of {len(self.graph)} relations to sample based on the specified configurations.')
@@ -63,43 +64,41 @@ class SnowShuGraph:
         Returns:
             The :class:`Relation <snowshu.core.models.relation.Relation>` with all updated params applied.
         """
-        for pattern in configs.specified_relations:
-            if single_full_pattern_match(relation,
-                                         pattern):
+        self._set_overriding_params(RelationIndex([relation]),configs)
+        return relation
+
+    def _set_overriding_params(self,
+                               catalog_index:RelationIndex,
+                               configs:Configuration)->None:
+        """Applies specific params from config to every matching relation in the index.
+
+        Specified relations are applied in order, so later matches override earlier ones.
+        """
+        specified = [pattern for pattern in configs.specified_relations if pattern.compiled is not None]
+        matches = catalog_index.match([pattern.compiled for pattern in specified])
+        for pattern, relations in zip(specified, matches):
+            for relation in relations:
                 for attr in ('unsampled','include_outliers',):
                     pattern_val=getattr(pattern,attr,None)
                     relation.__dict__[attr]=pattern_val if pattern_val is not None else relation.__dict__[attr]
                 
                 if getattr(pattern,'sampling',None) is not None:
                     relation.sampling=pattern.sampling
-        return relation            
-
-        approved_specified_patterns = [
-            dict(
-                database=r.database_pattern,
-                schema=r.schema_pattern,
-                name=r.relation_pattern) for r in config.specified_relations]
 
     def _apply_specifications(
             self,
             configs: Configuration,
             graph: networkx.DiGraph,
-            available_nodes: Set[Relation]) -> networkx.DiGraph:
-        """takes a configuration file, a graph and a collection of available
+            available_nodes: Union[RelationIndex, Set[Relation]]) -> networkx.DiGraph:
+        """takes a configuration file, a graph and a collection (or index) of available
         nodes, applies configs as edges and returns the graph."""
-        for relation in configs.specified_relations:
-            relation_dict = dict(
-                name=relation.relation_pattern,
-                database=relation.database_pattern,
-                schema=relation.schema_pattern)
+        if not isinstance(available_nodes, RelationIndex):
+            available_nodes = RelationIndex(available_nodes)
+        specified = [relation for relation in configs.specified_relations if relation.compiled is not None]
+        matches = available_nodes.match([relation.compiled for relation in specified])
+        for relation, matched_relations in zip(specified, matches):
             if relation.unsampled:
-                unsampled_relations = set(
-                    filter(
-                        lambda x: single_full_pattern_match(
-                            x,
-                            relation_dict),
-                        available_nodes))
-                for rel in unsampled_relations:
+                for rel in matched_relations:
                     rel.unsampled = True
                     graph.add_node(rel)
                 continue
@@ -116,19 +115,13 @@ class SnowShuGraph:
                         local_attribute=val.local_attribute) for val in relation.relationships.__dict__[direction]]
 
             for edge in edges:
-                downstream_relations = set(
-                    filter(
-                        lambda x: single_full_pattern_match(
-                            x,
-                            relation_dict),
-                        available_nodes))
-                for rel in downstream_relations:
+                for rel in matched_relations:
                     # populate any string wildcard upstreams
                     for attr in ('database', 'schema',):
                         edge[attr] = edge[attr] if edge[attr] is not None else getattr(
                             rel, attr)
-                    upstream_relation = lookup_single_relation(
-                        edge, available_nodes)
+                    upstream_relation = available_nodes.get(
+                        edge['database'], edge['schema'], edge['relation'])
                     if upstream_relation is None:
                         raise ValueError(
                             f'It looks like the wildcard relation {edge["database"]}.{edge["schema"]}.{edge["relation"]} was specified as a dependency, but it does not exist.')
@@ -155,10 +148,9 @@ class SnowShuGraph:
         # get isolates first
         isodags = [i for i in networkx.isolates(self.graph)]
         logger.debug(f'created {len(isodags)} isolate dags.')
-        # assemble undirected graphs
-        ugraph = self.graph.to_undirected()
-        ugraph.remove_nodes_from(isodags)
-        node_collections=self._split_dag_for_parallel(ugraph)
+        isolates = set(isodags)
+        node_collections = [collection for collection in self._split_dag_for_parallel(self.graph)
+                            if not (len(collection) == 1 and collection[0] in isolates)]
 
         dags = [networkx.DiGraph() for _ in range(len(isodags))]
         [g.add_node(n) for g, n in zip(dags, isodags)]
@@ -175,10 +167,14 @@ class SnowShuGraph:
 
         return tuple(dags)
 
-    def _split_dag_for_parallel(self,dag:networkx.DiGraph)->list:
-        ugraph = dag.to_undirected()
-        all_paths=set([frozenset(networkx.shortest_path(ugraph, node).keys()) for node in ugraph])
-        return list(tuple(node) for node in all_paths)
+    def _split_dag_for_parallel(self,dag:networkx.Graph)->list:
+        """splits a graph into the node collections of its connected components.
+
+        Directed graphs are split by weak connectivity, in a single linear time pass.
+        """
+        components = networkx.weakly_connected_components(dag) if dag.is_directed() \
+            else networkx.connected_components(dag)
+        return [tuple(component) for component in components]
 
 
     def _build_sum_patterns_from_configs(
@@ -202,13 +198,35 @@ class SnowShuGraph:
         logger.debug(f'All config primary patterns: {all_patterns}')
         return all_patterns
 
-    def _filter_relations(self, full_catalog: iter,
-                          patterns: dict) -> Set[Relation]:
-        """applies patterns to the full catalog to build the filtered relation
-        set."""
+    def discovery_patterns(self, config: Configuration) -> List[dict]:
+        """creates the pattern dictionaries that can appear in the graph.
 
-        return set([filtered_relation for filtered_relation in \
-            set(filter(lambda rel : at_least_one_full_pattern_match(rel,patterns), full_catalog))])
+        Covers the sum patterns plus every relationship target, so catalog discovery
+        can be narrowed to these patterns without losing upstream relations.
+        """
+        patterns = self._build_sum_patterns_from_configs(config)
+        for relation in config.specified_relations:
+            for direction in ('bidirectional', 'directional',):
+                for val in relation.relationships.__dict__[direction]:
+                    patterns.append(dict(
+                        database=val.database_pattern if val.database_pattern is not None else relation.database_pattern,
+                        schema=val.schema_pattern if val.schema_pattern is not None else relation.schema_pattern,
+                        name=re.escape(val.relation_pattern)))
+        return [pattern for pattern in patterns if all(
+            pattern[attr] for attr in ('database', 'schema', 'name',))]
+
+    def _build_compiled_patterns_from_configs(
+            self, config: Configuration) -> List[CompiledPattern]:
+        """collects the compiled general and specified patterns that build the total
+        filtered catalog."""
+        return config.general_patterns + [relation.compiled for relation in config.specified_relations
+                                          if relation.compiled is not None]
+
+    def _filter_relations(self, catalog_index: RelationIndex,
+                          patterns: List[CompiledPattern]) -> Set[Relation]:
+        """applies patterns to the indexed catalog to build the filtered relation
+        set."""
+        return set([relation for matched in catalog_index.match(patterns) for relation in matched])
     
     def _set_globals_for_node(self,relation:Relation,configs:Configuration)->Relation:
         """Sets the initial (default) node values from the config
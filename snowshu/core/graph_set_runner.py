@@ -1,15 +1,21 @@
 import os
+import re
+import copy
 import shutil
 import gc
-from typing import List
-from snowshu.configs import MAX_ALLOWED_ROWS
+import heapq
+from itertools import count
+from typing import List, Set
+from snowshu.configs import MAX_ALLOWED_ROWS, POPULATION_COUNT_BATCH_SIZE, LOAD_QUEUE_SIZE
 from snowshu.core.compile import RuntimeSourceCompiler
+from snowshu.core.cost_model import critical_path_costs
 from snowshu.adapters.target_adapters.base_target_adapter import BaseTargetAdapter
 from snowshu.adapters.source_adapters.base_source_adapter import BaseSourceAdapter
 import networkx as nx
 from snowshu.logger import Logger, duration
 import time
 from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
 from dataclasses import dataclass
 
 logger = Logger().logger
@@ -38,112 +44,319 @@ class GraphSetRunner:
             shutil.rmtree(self.barf_output, ignore_errors=True)
             os.makedirs(self.barf_output)
 
-        view_graph_set = [graph for graph in graph_set if graph.contains_views]
-        table_graph_set = list(set(graph_set) - set(view_graph_set))
-
-        def make_executables(graphs) -> List[GraphExecutable]:
-            return [GraphExecutable(graph,
-                                    source_adapter,
-                                    target_adapter,
-                                    analyze) for graph in graphs]
+        executables = [GraphExecutable(graph,
+                                       source_adapter,
+                                       target_adapter,
+                                       analyze) for graph in graph_set]
 
         start_time = time.time()
 
-        # Tables need to come first to prevent deps deadlocks with views
-        for graphs in [table_graph_set, view_graph_set]:
-            with ThreadPoolExecutor(max_workers=threads) as executor:
-                for executable in make_executables(graphs):
-                    executor.submit(self._traverse_and_execute,
-                                    executable, start_time)
+        # count live populations for each graph (and the isolates together) in as few queries as possible
+        isolates = [relation for graph in graph_set if len(graph) == 1 for relation in graph.nodes]
+        batches = [list(graph.nodes) for graph in graph_set if len(graph) > 1] + [isolates]
+        batches = [batch[i:i + POPULATION_COUNT_BATCH_SIZE] for batch in batches
+                   for i in range(0, len(batch), POPULATION_COUNT_BATCH_SIZE)]
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            for batch in batches:
+                executor.submit(self._count_populations, batch, source_adapter)
+
+        self._execute_relations(executables, threads, start_time)
+
+    @staticmethod
+    def _references(view: 'Relation', relation: 'Relation') -> bool:
+        """True if the view's DDL names the relation.
+
+        Names are resolved as the source would: unqualified and ``<schema>.`` qualified
+        names are in the view's own database and schema.
+        """
+        if view.view_ddl is None or relation is view:
+            return False
+        pattern = rf'(?<![\w$."])(?:("?[\w$]+"?)\s*\.\s*)?(?:("?[\w$]+"?)\s*\.\s*)?"?{re.escape(relation.name)}"?(?![\w$"])'
+        for match in re.finditer(pattern, view.view_ddl, re.IGNORECASE):
+            qualifiers = [qualifier.strip('"') for qualifier in match.groups() if qualifier]
+            database, schema = [view.database, view.schema][:2 - len(qualifiers)] + qualifiers
+            if (database.lower(), schema.lower(),) == (relation.database.lower(), relation.schema.lower(),):
+                return True
+        return False
+
+    def _view_dependencies(self,
+                           view: 'Relation',
+                           relations: List['Relation']) -> Set['Relation']:
+        """finds the tables and other views a view's DDL references, which must be loaded before the view.
+
+        A view never waits on a view that references it back. If the DDL is not known
+        the view conservatively waits on every table.
+        """
+        if view.view_ddl is None:
+            return {relation for relation in relations if not relation.is_view}
+        return {relation for relation in relations
+                if self._references(view, relation)
+                and not (relation.is_view and self._references(relation, view))}
+
+    def _execute_relations(self,
+                           executables: List[GraphExecutable],
+                           threads: int,
+                           start_time: int) -> None:
+        """Extracts and loads every relation as soon as its dependencies allow.
+
+        Ready relations are extracted longest critical path first (see
+        :func:`critical_path_costs <snowshu.core.cost_model.critical_path_costs>`).
+        Extraction and loading run in separate worker pools joined by a bounded queue,
+        so the source and target work at the same time and extracted samples waiting
+        to load are capped at ``LOAD_QUEUE_SIZE``. A relation is extracted once its
+        graph predecessors (which constrain its sample) are extracted; a view is loaded
+        once its graph predecessors and the relations its DDL references are loaded. A relation that fails is logged
+        and the relations depending on it are skipped. Sampled data is released once the
+        relation is loaded and every graph successor has been extracted.
+        """
+        executable_for = {relation: executable for executable in executables
+                          for relation in executable.graph.nodes}
+        priority = dict()
+        for executable in executables:
+            priority.update(critical_path_costs(executable.graph, executable.analyze))
+        logger.info(f'Estimated cost of {len(priority)} relations is {sum(relation.estimated_cost for relation in priority):.1f}s, '
+                    f'with a critical path of {max(priority.values(), default=0):.1f}s.')
+        ready, tiebreak = list(), count()
+        waiting_on = {relation: executable.graph.in_degree(relation)
+                      for relation, executable in executable_for.items()}
+        holds = {relation: executable.graph.out_degree(relation) + (0 if executable.analyze else 1)
+                 for relation, executable in executable_for.items()}
+        views_waiting = dict()
+        finished, failed = set(), set()
+        events = Queue()
+        load_queue = Queue(maxsize=LOAD_QUEUE_SIZE)
+
+        def extract(relation) -> None:
+            executable = executable_for[relation]
+            started = time.time()
+            try:
+                self._extract_relation(executable, relation, start_time)
+            except Exception as e:
+                events.put(('extracted', relation, e,))
+                return
+            finally:
+                relation.actual_cost = time.time() - started
+            events.put(('extracted', relation, None,))
+            # blocks while the queue is full, holding back further extraction
+            if not (executable.analyze or relation.is_view):
+                load_queue.put(relation)
+            # the worker is only free for another extraction once the sample is handed off
+            events.put(('queued', relation, None,))
+
+        def load_worker() -> None:
+            for relation in iter(load_queue.get, None):
+                started = time.time()
+                try:
+                    self._load_relation(executable_for[relation], relation, start_time)
+                    error = None
+                except Exception as e:
+                    error = e
+                relation.actual_cost += time.time() - started
+                events.put(('loaded', relation, error,))
+
+        def release(relation) -> None:
+            holds[relation] -= 1
+            if holds[relation] == 0:
+                del relation.data
+
+        with ThreadPoolExecutor(max_workers=threads) as extractors, \
+                ThreadPoolExecutor(max_workers=threads) as loaders:
+            for _ in range(threads):
+                loaders.submit(load_worker)
+            # relations being extracted or loaded
+            in_flight = extracting = 0
+
+            def make_ready(relation) -> None:
+                heapq.heappush(ready, (-priority[relation], next(tiebreak), relation,))
+
+            def dispatch() -> None:
+                # extractions are only handed to the pool as workers free up, so the
+                # most expensive ready relation is always the next one picked up
+                nonlocal in_flight, extracting
+                while ready and extracting < threads:
+                    in_flight += 1
+                    extracting += 1
+                    extractors.submit(extract, heapq.heappop(ready)[-1])
+
+            for relation in [relation for relation, remaining in waiting_on.items() if remaining == 0]:
+                make_ready(relation)
+
+            try:
+                while in_flight or ready:
+                    dispatch()
+                    stage, relation, error = events.get()
+                    if stage == 'queued':
+                        extracting -= 1
+                        continue
+                    if error is not None:
+                        failed.add(relation)
+                        in_flight -= 1
+                        if stage == 'extracted':
+                            # a failed extraction is never queued, so frees its worker here
+                            extracting -= 1
+                            del relation.data
+                        else:
+                            # successors may still be compiling predicates from the data
+                            release(relation)
+                        continue
+                    if stage == 'extracted':
+                        executable = executable_for[relation]
+                        for predecessor in executable.graph.predecessors(relation):
+                            release(predecessor)
+                        for successor in executable.graph.successors(relation):
+                            waiting_on[successor] -= 1
+                            if waiting_on[successor] == 0:
+                                make_ready(successor)
+                        if executable.analyze:
+                            finished.add(relation)
+                            in_flight -= 1
+                        elif relation.is_view:
+                            dependencies = (self._view_dependencies(relation, list(executable_for))
+                                            | set(executable.graph.predecessors(relation))) - finished
+                            if dependencies:
+                                views_waiting[relation] = dependencies
+                                in_flight -= 1
+                            else:
+                                load_queue.put(relation)
+                    else:
+                        finished.add(relation)
+                        in_flight -= 1
+                        release(relation)
+                        for view, dependencies in list(views_waiting.items()):
+                            dependencies.discard(relation)
+                            if not dependencies:
+                                del views_waiting[view]
+                                in_flight += 1
+                                load_queue.put(view)
+            finally:
+                for _ in range(threads):
+                    load_queue.put(None)
+
+        for relation in executable_for:
+            del relation.data
+            if relation in views_waiting:
+                logger.error(f'Skipping view {relation.dot_notation}, it references relations that were never loaded: '
+                             f'{", ".join(sorted(dependency.dot_notation for dependency in views_waiting[relation]))}.')
+            elif relation not in finished and relation not in failed:
+                logger.error(f'Skipping relation {relation.dot_notation}, an upstream relation failed.')
+        gc.collect()
+
+    def _count_populations(self,
+                           relations: List['Relation'],
+                           source_adapter: BaseSourceAdapter) -> None:
+        """counts the populations of relations without catalog row counts in a single query.
 
-    def _traverse_and_execute(
-            self, executable: GraphExecutable, start_time: int) -> None:
+        If the batched query fails the relations are left uncounted, and are counted
+        one at a time when executed.
+        """
+        relations = [relation for relation in relations if relation.row_count is None]
+        if not relations:
+            return
+        logger.debug(f'Counting population for {len(relations)} relations in source...')
         try:
-            logger.debug(
-                f"Executing graph with {len(executable.graph)} relations in it...")
-            for i, relation in enumerate(
-                    nx.algorithms.dag.topological_sort(executable.graph)):
+            counts = source_adapter.check_count_and_query(
+                source_adapter.batched_population_count_statement(relations), len(relations))
+        except Exception as e:
+            logger.warning(f'Batched population count failed, relations will be counted individually: {e}')
+            return
+        counts = dict(zip(counts['relation'], counts['population_size']))
+        for relation in relations:
+            if relation.dot_notation in counts:
+                relation.population_size = int(counts[relation.dot_notation])
+
+    def _extract_relation(
+            self, executable: GraphExecutable, relation: 'Relation', start_time: int) -> None:
+        """samples the relation from the source (or retrieves a view's DDL)."""
+        try:
+            if relation.row_count is not None:
+                relation.population_size=relation.row_count
+            elif relation.population_size is None:
+                logger.debug(f'No catalog row count for {relation.dot_notation}, counting population in source...')
                 relation.population_size=executable.source_adapter.scalar_query(
                                          executable.source_adapter.population_count_statement(relation))
-                logger.info(
-                    f'Executing graph {i+1} of {len(executable.graph)} source query for relation {relation.dot_notation}...')
-
-                relation.sampling.prepare(relation,
-                                          executable.source_adapter)
-                relation = RuntimeSourceCompiler.compile_queries_for_relation(
-                    relation, executable.graph, executable.source_adapter, executable.analyze)
-
-                if executable.analyze:
-                    if relation.is_view:
-                        relation.population_size = "N/A"
-                        relation.sample_size = "N/A"
-                        logger.info(
-                            f'Relation {relation.dot_notation} is a view, skipping.')
-                    else:
-                        result = [
-                            row for row in executable.source_adapter.check_count_and_query(
-                                relation.compiled_query,
-                                MAX_ALLOWED_ROWS).itertuples()][0]
-                        relation.population_size = result.population_size
-                        relation.sample_size = result.sample_size
-                        logger.info(
-                            f'Analysis of relation {relation.dot_notation} completed in {duration(start_time)}.')
-                else:
-                    executable.target_adapter.create_database_if_not_exists(
-                        relation.quoted(relation.database))
-                    executable.target_adapter.create_schema_if_not_exists(
-                        relation.quoted(relation.database), 
-                        relation.quoted(relation.schema))
-                    if relation.is_view:
-                        logger.info(
-                            f'Retrieving DDL statement for view {relation.dot_notation} in source...')
-                        relation.population_size = "N/A"
-                        relation.sample_size = "N/A"
-                        try:
-                            relation.view_ddl = executable.source_adapter.scalar_query(relation.compiled_query)
-                        except Exception:
-                            raise SystemError(
-                                f'Failed to extract DDL statement: {relation.compiled_query}')
-                        logger.info(
-                            f'Successfully extracted DDL statement for view {relation.quoted_dot_notation}')
-                    else:
-                        logger.info(
-                            f'Retrieving records from source {relation.dot_notation}...')
-                        try:
-                            relation.data = executable.source_adapter.check_count_and_query(
-                                relation.compiled_query, MAX_ALLOWED_ROWS)
-                        except Exception as e:
-                            raise SystemError(
-                                f'Failed execution of extraction sql statement: {relation.compiled_query} {e}')
-
-                        relation.sample_size = len(relation.data)
-                        logger.info(
-                            f'{relation.sample_size} records retrieved for relation {relation.dot_notation}.')
+            logger.info(
+                f'Executing source query for relation {relation.dot_notation}...')
+
+            # relations share their configured sampling and prepare stores the sample
+            # method on it, so each relation prepares its own copy
+            relation.sampling = copy.copy(relation.sampling)
+            relation.sampling.prepare(relation,
+                                      executable.source_adapter)
+            relation = RuntimeSourceCompiler.compile_queries_for_relation(
+                relation, executable.graph, executable.source_adapter, executable.analyze)
 
+            if executable.analyze:
+                if relation.is_view:
+                    relation.population_size = "N/A"
+                    relation.sample_size = "N/A"
+                    logger.info(
+                        f'Relation {relation.dot_notation} is a view, skipping.')
+                else:
+                    result = [
+                        row for row in executable.source_adapter.check_count_and_query(
+                            relation.compiled_query,
+                            MAX_ALLOWED_ROWS).itertuples()][0]
+                    relation.population_size = result.population_size
+                    relation.sample_size = result.sample_size
                     logger.info(
-                        f'Inserting relation {relation.quoted_dot_notation} into target...')
+                        f'Analysis of relation {relation.dot_notation} completed in {duration(start_time)}.')
+            elif relation.is_view:
+                relation.population_size = "N/A"
+                relation.sample_size = "N/A"
+                if relation.view_ddl is None:
+                    logger.info(
+                        f'Retrieving DDL statement for view {relation.dot_notation} in source...')
                     try:
-                        executable.target_adapter.create_and_load_relation(
-                            relation)
-                    except Exception as e:
+                        relation.view_ddl = executable.source_adapter.scalar_query(relation.compiled_query)
+                    except Exception:
                         raise SystemError(
-                            f'Failed to load relation {relation.quoted_dot_notation} into target: {e}')
-
+                            f'Failed to extract DDL statement: {relation.compiled_query}')
                     logger.info(
-                        f'Done replication of relation {relation.dot_notation} in {duration(start_time)}.')
-                    relation.target_loaded = True
-                relation.source_extracted = True
+                        f'Successfully extracted DDL statement for view {relation.quoted_dot_notation}')
+            else:
                 logger.info(
-                    f'population:{relation.population_size}, sample:{relation.sample_size}')
-                if self.barf:
-                   with open(os.path.join(self.barf_output,f'{relation.dot_notation}.sql'),'w') as f:
-                        f.write(relation.compiled_query) 
+                    f'Retrieving records from source {relation.dot_notation}...')
+                try:
+                    relation.data = executable.source_adapter.check_count_and_query(
+                        relation.compiled_query, MAX_ALLOWED_ROWS)
+                except Exception as e:
+                    raise SystemError(
+                        f'Failed execution of extraction sql statement: {relation.compiled_query} {e}')
+
+                relation.sample_size = len(relation.data)
+                logger.info(
+                    f'{relation.sample_size} records retrieved for relation {relation.dot_notation}.')
+            relation.source_extracted = True
+            logger.info(
+                f'population:{relation.population_size}, sample:{relation.sample_size}')
+            if self.barf:
+               with open(os.path.join(self.barf_output,f'{relation.dot_notation}.sql'),'w') as f:
+                    f.write(relation.compiled_query) 
+        except Exception as e:
+            logger.error(f'failed with error of type {type(e)}: {str(e)}')
+            raise e
+
+    def _load_relation(
+            self, executable: GraphExecutable, relation: 'Relation', start_time: int) -> None:
+        """creates the extracted relation in the target."""
+        try:
+            executable.target_adapter.create_database_if_not_exists(
+                relation.quoted(relation.database))
+            executable.target_adapter.create_schema_if_not_exists(
+                relation.quoted(relation.database), 
+                relation.quoted(relation.schema))
+            logger.info(
+                f'Inserting relation {relation.quoted_dot_notation} into target...')
             try:
-                for relation in executable.graph.nodes:
-                    del relation.data
-            except AttributeError:
-                pass
-            gc.collect()
+                executable.target_adapter.create_and_load_relation(
+                    relation)
+            except Exception as e:
+                raise SystemError(
+                    f'Failed to load relation {relation.quoted_dot_notation} into target: {e}')
+
+            logger.info(
+                f'Done replication of relation {relation.dot_notation} in {duration(start_time)}.')
+            relation.target_loaded = True
         except Exception as e:
             logger.error(f'failed with error of type {type(e)}: {str(e)}')
             raise e
@@ -10,6 +10,7 @@ from snowshu.configs import IS_IN_DOCKER, DOCKER_TARGET_PORT
 from datetime import datetime
 from snowshu.core.replica.replica_factory import ReplicaFactory
 from snowshu.core.replica.replica_manager import ReplicaManager
+from snowshu.core.utils import fetch_adapter
 
 
 # Always check for docker
@@ -86,14 +87,22 @@ def init(path: click.Path) -> None:
     '--barf',
     is_flag=True,
     help="outputs the source query sql to a local folder snowshu_barf_output")
+@click.option('--refresh-catalog',
+    is_flag=True,
+    help="ignores the local catalog cache and re-reads the full source catalog")
+@click.option('--reuse-target',
+    is_flag=True,
+    help="builds in the running target container from a previous build (after dropping its databases) and keeps it running afterwards")
 def create(replica_file: click.Path,
         name:str,
-        barf:bool):
+        barf:bool,
+        refresh_catalog:bool,
+        reuse_target:bool):
     """Generate a new replica from a replica.yml file.
     """
     replica = ReplicaFactory()
     replica.load_config(replica_file)
-    click.echo(replica.create(name,barf))
+    click.echo(replica.create(name,barf,refresh_catalog,reuse_target))
 
 
 @cli.command()
@@ -106,12 +115,24 @@ def create(replica_file: click.Path,
 @click.option('--barf','-b',
     is_flag=True,
     help="outputs the source query sql to a local folder snowshu_barf_output")
-def analyze(replica_file: click.Path,barf:bool):
+@click.option('--refresh-catalog',
+    is_flag=True,
+    help="ignores the local catalog cache and re-reads the full source catalog")
+def analyze(replica_file: click.Path,barf:bool,refresh_catalog:bool):
     """Perform a "dry run" of the replica creation without actually executing, and return the expected results."""
 
     replica = ReplicaFactory()
     replica.load_config(replica_file)
-    click.echo(replica.analyze(barf))
+    click.echo(replica.analyze(barf,refresh_catalog))
+
+@cli.command()
+@click.option('--target',
+    default='postgres',
+    help="the target adapter to build the base image for, default is postgres")
+def build_base(target:str):
+    """Build the local base image replicas are created from, to speed up every create."""
+    adapter = fetch_adapter(target, 'target')()
+    click.echo(f'Base image {adapter.build_base_image()} built.')
 
 @cli.command()
 def list():
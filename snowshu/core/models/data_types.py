@@ -57,3 +57,5 @@ for dtype,sqlalchemy_type in quoted_types:
     build_typeclass(dtype,sqlalchemy_type,True)
 for dtype,sqlalchemy_type in unquoted_types:
     build_typeclass(dtype,sqlalchemy_type,False)
+
+DATA_TYPES = tuple(globals()[dtype] for dtype, _ in quoted_types + unquoted_types)
@@ -1,5 +1,5 @@
-from typing import List, Union, Optional
-from snowshu.core.utils import key_for_value,correct_case
+from typing import List, Union, Optional, Iterable
+from snowshu.core.utils import correct_case
 from snowshu.configs import DEFAULT_MAX_NUMBER_OF_OUTLIERS
 from snowshu.core.models import materializations as mz
 from snowshu.core.models.attribute import Attribute
@@ -13,8 +13,15 @@ class Relation:
     _data:pd.DataFrame
     compiled_query:str
     core_query:str
-    population_size:int
+    population_size:Optional[int]=None
     sample_size:int
+    row_count:Optional[int]=None
+    bytes:Optional[int]=None
+    view_ddl:Optional[str]=None
+    load_method:Optional[str]=None
+    load_rows_per_second:Optional[float]=None
+    estimated_cost:Optional[float]=None
+    actual_cost:Optional[float]=None
     source_extracted:bool=False
     target_loaded:bool=False
     sampling:Optional['BaseSampling']
@@ -52,6 +59,11 @@ class Relation:
         val.columns=[attrs[lowered_attrs.index(col)] for col in lowered_columns]
         self._data=val      
 
+    @data.deleter
+    def data(self)->None:
+        """Releases the sampled data once it is no longer needed."""
+        self.__dict__.pop('_data',None)
+
 
     @property
     def dot_notation(self) -> str:
@@ -90,11 +102,12 @@ class Relation:
  
     def typed_columns(self, data_type_mappings: dict) -> str:
         """generates the column section of a create statement in format <attr>
-        <datatype>"""
-        attr_string = str()
-        for attr in self.attributes:
-            attr_string += f',{self.quoted(attr.name)} {key_for_value(data_type_mappings, attr.data_type)}\n'
-        return attr_string[1:]
+        <datatype>
+
+        Args:
+            data_type_mappings: a reverse type map of each :class:`DataType <snowshu.core.models.data_types.DataType>` name to the type it is created as.
+        """
+        return ',\n'.join([f'"{attr.name}" {data_type_mappings[attr.data_type.name]}' for attr in self.attributes])
 
     def lookup_attribute(self, attr: str) -> Union[Attribute, None]:
         """finds the attribute by name or returns None."""
@@ -173,3 +186,63 @@ def at_least_one_full_pattern_match(rel: Relation, patterns: iter) -> bool:
         p[attr] for attr in ('database', 'schema', 'name',)), patterns))
     return any([single_full_pattern_match(rel, pattern)
                 for pattern in patterns])
+
+
+class RelationIndex:
+    """An index of relations keyed by (database, schema, name).
+
+    Relations are bucketed a level at a time (databases, then the schemas in each
+    database, then the names in each schema) so compiled patterns can be matched
+    level by level: a literal level is a single lookup, and a regex level is only
+    tested against the keys of the buckets that matched the level above.
+
+    Args:
+        relations: the :class:`Relations <snowshu.core.models.relation.Relation>` to index.
+    """
+    LEVELS = ('database', 'schema', 'relation',)
+
+    def __init__(self, relations: Iterable[Relation]):
+        self._tree = dict()
+        for relation in relations:
+            self._tree.setdefault(relation.database, dict()).setdefault(relation.schema, dict())[relation.name] = relation
+
+    def get(self, database: str, schema: str, name: str) -> Optional[Relation]:
+        """finds the relation with exactly this database, schema and name, or None."""
+        return self._tree.get(database, dict()).get(schema, dict()).get(name)
+
+    def match(self, patterns: List['CompiledPattern']) -> List[List[Relation]]:
+        """finds the relations fully matching each of the compiled patterns.
+
+        All the patterns are matched together in a single walk of the index.
+
+        Args:
+            patterns: :class:`CompiledPatterns <snowshu.core.configuration_parser.CompiledPattern>` to match.
+        Returns:
+            the list of matching relations for each pattern, in the order of the patterns.
+        """
+        candidates = [(self._tree, list(range(len(patterns))),)]
+        for level in self.LEVELS:
+            matched = list()
+            for bucket, indexes in candidates:
+                keys, regexes = dict(), list()
+                for index in indexes:
+                    regex = getattr(patterns[index], level)
+                    if re.escape(regex.pattern) == regex.pattern:
+                        if regex.pattern in bucket:
+                            keys.setdefault(regex.pattern, list()).append(index)
+                    else:
+                        regexes.append(index)
+                if regexes:
+                    for key in bucket:
+                        for index in regexes:
+                            if getattr(patterns[index], level).fullmatch(key):
+                                keys.setdefault(key, list()).append(index)
+                matched += [(bucket[key], key_indexes,) for key, key_indexes in keys.items()]
+            candidates = matched
+
+        found = [list() for _ in patterns]
+        for relation, indexes in candidates:
+            for index in indexes:
+                found[index].append(relation)
+        return found
+
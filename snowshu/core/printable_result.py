@@ -1,11 +1,15 @@
 from tabulate import tabulate
 import networkx as nx
 from dataclasses import dataclass
-from typing import Any, List, Union
+from typing import Any, List, Optional, Union
 from snowshu.logger import Logger
 logger = Logger().logger
 
 
+def _seconds(cost: Optional[float]) -> str:
+    return " " if cost is None else f"{cost:,.1f}"
+
+
 @dataclass
 class ReportRow:
     dot_notation: str
@@ -15,6 +19,9 @@ class ReportRow:
     count_of_dependencies: str
     percent_to_target: Any
     percent_is_acceptable: bool
+    estimated_cost: Optional[float] = None
+    actual_cost: Optional[float] = None
+    load_rate: str = " "
 
     def to_tuple(self) -> list:
         return (self.dot_notation,
@@ -23,6 +30,9 @@ class ReportRow:
                 self.final_sample_size,
                 self.count_of_dependencies,
                 self.percent_to_target,
+                _seconds(self.estimated_cost),
+                _seconds(self.actual_cost),
+                self.load_rate,
                 )
 
 
@@ -46,6 +56,8 @@ def graph_to_result_list(graphs: nx.Graph) -> list:
                         100.0 * (relation.sample_size / target_sample_size)))
 
                 percent_is_acceptable = True if isinstance(percent, str) else abs(percent-100) <= 5
+                load_rate = " " if relation.load_rows_per_second is None else \
+                    f"{int(relation.load_rows_per_second):,} ({relation.load_method})"
                 report.append(ReportRow(
                     relation.dot_notation,
                     relation.population_size,
@@ -53,7 +65,10 @@ def graph_to_result_list(graphs: nx.Graph) -> list:
                     relation.sample_size,
                     deps,
                     percent,
-                    percent_is_acceptable))
+                    percent_is_acceptable,
+                    relation.estimated_cost,
+                    relation.actual_cost,
+                    load_rate))
         except Exception as e:
             message = f"failure in building row for relation {relation.dot_notation} : {e}"
             logger.critical(message)
@@ -73,12 +88,28 @@ def printable_result(report: List[ReportRow], analyze: str) -> str:
 
     headers = ('relation', 'population size', 'target sample size',
                'final sample size',
-               'dependencies', 'aproximate % to target',)
-    column_alignment = ('left', 'right', 'right', 'right', 'center', 'right',)
+               'dependencies', 'aproximate % to target',
+               'estimated seconds', 'actual seconds', 'load rows/sec',)
+    column_alignment = ('left', 'right', 'right', 'right', 'center', 'right', 'right', 'right', 'right',)
+    if analyze:
+        # nothing is loaded during analyze
+        printable = [row[:-1] for row in printable]
+        headers, column_alignment = headers[:-1], column_alignment[:-1]
     title = 'ANALYZE' if analyze else 'RUN'
     message_top = f"\n\n{title} RESULTS:\n\n"
     return message_top + \
-        tabulate(printable, headers, colalign=column_alignment) + "\n"
+        tabulate(printable, headers, colalign=column_alignment) + "\n" + \
+        _cost_summary(report)
+
+
+def _cost_summary(report: List[ReportRow]) -> str:
+    """totals the estimated and actual seconds spent on relations, so the cost model can be tuned."""
+    costed = [row for row in report if row.estimated_cost is not None and row.actual_cost is not None]
+    if not costed:
+        return str()
+    estimated = sum(row.estimated_cost for row in costed)
+    actual = sum(row.actual_cost for row in costed)
+    return f"\nEstimated {estimated:,.1f}s of relation work, actual {actual:,.1f}s.\n"
 
 
 def format_set_of_available_images(imageset:iter)->str:
@@ -1,4 +1,5 @@
 import time
+from concurrent.futures import ThreadPoolExecutor, Future
 from typing import TextIO, List, Union
 import networkx
 from snowshu.core.graph import SnowShuGraph
@@ -17,28 +18,55 @@ class ReplicaFactory:
 
     def create(self, 
                name:Union[str,None], 
-               barf: bool) -> None:
+               barf: bool,
+               refresh_catalog: bool = False,
+               reuse_target: bool = False) -> None:
         self.ANALYZE = False
-        return self._execute(name=name,barf=barf)
+        self.config.target_profile.adapter.reuse_target = reuse_target
+        return self._execute(name=name,barf=barf,refresh_catalog=refresh_catalog)
 
-    def analyze(self,barf:bool) -> None:
+    def analyze(self,barf:bool,refresh_catalog:bool=False) -> None:
         self.ANALYZE = True
-        return self._execute(barf=barf)
+        return self._execute(barf=barf,refresh_catalog=refresh_catalog)
 
-    def _execute(self,barf:bool=False, name:Union[str,None]=None) -> None:
+    def _execute(self,
+                 barf:bool=False,
+                 name:Union[str,None]=None,
+                 refresh_catalog:bool=False) -> None:
         graph = SnowShuGraph()
         if name is not None:
             self.config.name = name
 
-        graph.build_graph(self.config,
-                          Catalog.load_full_catalog(
-                                    self.config.source_profile.adapter, 
-                                    self.config.threads))
-        graphs = graph.get_graphs()    
+        target_adapter = self.config.target_profile.adapter
+        # the target container starts up while the catalog is loaded and the graph is built.
+        # A reused target is reset as it starts, so it is only started once there is something to load.
+        bootstrap = None
+        if not (self.ANALYZE or target_adapter.reuse_target):
+            executor = ThreadPoolExecutor(max_workers=1)
+            bootstrap = executor.submit(target_adapter.initialize_replica,
+                                        self.config.source_profile.name)
+            executor.shutdown(wait=False)
+        try:
+            graph.build_graph(self.config,
+                              Catalog.load_full_catalog(
+                                        self.config.source_profile.adapter, 
+                                        self.config.threads,
+                                        self.config.catalog_cache_ttl,
+                                        refresh_catalog,
+                                        graph.discovery_patterns(self.config)))
+            graphs = graph.get_graphs()    
+        except BaseException:
+            self._discard_bootstrap(bootstrap, target_adapter)
+            raise
         if len(graphs) < 1:
+            self._discard_bootstrap(bootstrap, target_adapter)
             return "No relations found per provided replica configuration, exiting."
 
-        self.config.target_profile.adapter.initialize_replica(self.config.source_profile.name)
+        if bootstrap is not None:
+            logger.info('Waiting for target container to be ready...')
+            bootstrap.result()
+        elif not self.ANALYZE:
+            target_adapter.initialize_replica(self.config.source_profile.name)
         runner = GraphSetRunner()
         runner.execute_graph_set(graphs,
                                  self.config.source_profile.adapter,
@@ -46,6 +74,7 @@ class ReplicaFactory:
                                  threads=self.config.threads,
                                  analyze=self.ANALYZE,
                                  barf=barf)
+        self.config.source_profile.adapter.dispose_connections()
         if not self.ANALYZE:
             relations=[relation for graph in graphs for relation in graph.nodes]
             if self.config.source_profile.adapter.SUPPORTS_CROSS_DATABASE:
@@ -63,6 +92,25 @@ class ReplicaFactory:
                 graph_to_result_list(graphs),
                 self.ANALYZE)
 
+    @staticmethod
+    def _discard_bootstrap(bootstrap: Union[Future, None], target_adapter: 'BaseTargetAdapter') -> None:
+        """Removes the target container of a bootstrap that is no longer needed.
+
+        Does not wait for the bootstrap, the container is removed once it finishes.
+        """
+        if bootstrap is None or bootstrap.cancel():
+            return
+
+        def discard(bootstrap: Future) -> None:
+            exception = bootstrap.exception()
+            if exception is not None:
+                logger.warning(f'Target container bootstrap failed: {exception}')
+            try:
+                target_adapter.remove_container()
+            except Exception as e:
+                logger.warning(f'Unable to remove unused target container: {e}')
+        bootstrap.add_done_callback(discard)
+
     def load_config(self, config: Union['Path', str, TextIO]):
         """does all the initial work to make the resulting ReplicaFactory
         object usable."""
@@ -21,3 +21,13 @@ class BaseSampling:
             source_adapter: The :class:`source adapter <snowshu.adapters.source_adapters.base_source_adapter.BaseSourceAdapter>` instance to use for executing prepare queries. 
         """
         raise NotImplementedError()
+
+    def estimate_size(self,population:int)->int:
+        """Estimates the sample size for a population before the relation is prepared.
+
+        Used to cost relations when scheduling, defaults to the whole population.
+
+        Args:
+            population: The count of records in the full population.
+        """
+        return population
@@ -28,9 +28,11 @@ class BruteForceSampling(BaseSampling):
             relation: The :class:`Relation <snowshu.core.models.relation.Relation>` object to prepare.
             source_adapter: The :class:`source adapter <snowshu.adapters.source_adapters.base_source_adapter.BaseSourceAdapter>` instance to use for executing prepare queries. 
         """
-        self.size=max(self.sample_size_method.size(
-                relation.population_size),
-                self.min_sample_size)
+        self.size=self.estimate_size(relation.population_size)
         self.sample_method=BernoulliSampleMethod(self.size,
                                                  units='rows')
 
+    def estimate_size(self,population:int)->int:
+        """the number of records prepare will sample from a population of this size."""
+        return max(self.sample_size_method.size(population),
+                   self.min_sample_size)
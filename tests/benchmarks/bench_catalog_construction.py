@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Times SnowflakeAdapter catalog construction against synthetic INFORMATION_SCHEMA
+frames to show how it scales with the number of columns in a database.
+
+No credentials required, run from the repo root with
+    python -m tests.benchmarks.bench_catalog_construction
+"""
+import time
+import mock
+import pandas as pd
+from snowshu.adapters.source_adapters import SnowflakeAdapter
+
+COLUMNS_PER_RELATION = 20
+TOTAL_COLUMNS = (1000, 10000, 40000, 100000,)
+DATA_TYPES = ('NUMBER', 'VARCHAR', 'TIMESTAMP_NTZ', 'BOOLEAN', 'VARIANT',)
+
+
+def synthetic_catalog(total_columns: int) -> pd.DataFrame:
+    rows = list()
+    for i in range(total_columns):
+        relation = i // COLUMNS_PER_RELATION
+        is_view = relation % 10 == 0
+        rows.append(dict(schema=f'SCHEMA_{relation % 25}',
+                         relation=f'RELATION_{relation}',
+                         materialization='VIEW' if is_view else 'BASE TABLE',
+                         row_count=None if is_view else relation * 1000,
+                         bytes=None if is_view else relation * 64000,
+                         attribute=f'COLUMN_{i % COLUMNS_PER_RELATION}',
+                         ordinal=i % COLUMNS_PER_RELATION + 1,
+                         data_type=DATA_TYPES[i % len(DATA_TYPES)]))
+    return pd.DataFrame(rows)
+
+
+def main():
+    adapter = SnowflakeAdapter()
+    print(f"{'columns':>10}{'relations':>12}{'seconds':>10}{'us/column':>12}")
+    for total_columns in TOTAL_COLUMNS:
+        frame = synthetic_catalog(total_columns)
+        with mock.patch.object(adapter, '_safe_query', return_value=frame):
+            start = time.time()
+            relations = adapter.get_relations_from_database('BENCHMARK_DATABASE')
+            elapsed = time.time() - start
+        print(f"{total_columns:>10}{len(relations):>12}{elapsed:>10.2f}{1e6 * elapsed / total_columns:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Compares each postgres emulation of a Snowflake function against the native
+postgres expression it stands in for, on a generated table.
+
+Requires docker, starts (and removes) a postgres target container. Run from the repo root with
+    python -m tests.benchmarks.bench_function_emulation
+"""
+import os
+import time
+from snowshu.adapters.target_adapters import PostgresAdapter
+from snowshu.core.docker import SnowShuDocker
+
+ROWS = 2000000
+RUNS = 3
+TABLE = 'bench_functions'
+
+# (function, emulated query, native query)
+COMPARISONS = (
+    ('ANY_VALUE', 'SELECT g, ANY_VALUE(i) FROM {table} GROUP BY g', 'SELECT g, MIN(i) FROM {table} GROUP BY g'),
+    ('BOOLAND_AGG', 'SELECT g, BOOLAND_AGG(b) FROM {table} GROUP BY g', 'SELECT g, bool_and(b) FROM {table} GROUP BY g'),
+    ('RLIKE', "SELECT COUNT(*) FROM {table} WHERE RLIKE(s, 'a.*1')", "SELECT COUNT(*) FROM {table} WHERE s ~ '^(?:a.*1)$'"),
+    ('IFF', 'SELECT SUM(IFF(b, i, 0)) FROM {table}', 'SELECT SUM(CASE WHEN b THEN i ELSE 0 END) FROM {table}'),
+    ('NVL', 'SELECT SUM(NVL(n, i)) FROM {table}', 'SELECT SUM(COALESCE(n, i)) FROM {table}'),
+    ('ZEROIFNULL', 'SELECT SUM(ZEROIFNULL(n)) FROM {table}', 'SELECT SUM(COALESCE(n, 0)) FROM {table}'),
+    ('DIV0', 'SELECT SUM(DIV0(i, g)) FROM {table}', 'SELECT SUM(CASE WHEN g = 0 THEN 0 ELSE i::float / g END) FROM {table}'),
+    ('CONTAINS', "SELECT COUNT(*) FROM {table} WHERE CONTAINS(s, 'b1')", "SELECT COUNT(*) FROM {table} WHERE strpos(s, 'b1') > 0"),
+    ('EQUAL_NULL', 'SELECT COUNT(*) FROM {table} WHERE EQUAL_NULL(n, i)', 'SELECT COUNT(*) FROM {table} WHERE n IS NOT DISTINCT FROM i'),
+    # mixed argument types resolve through the numeric overloads
+    ('NVL', 'SELECT SUM(NVL(x, 0)) FROM {table}', 'SELECT SUM(COALESCE(x, 0)) FROM {table}'),
+    ('IFF', 'SELECT SUM(IFF(b, x, 0)) FROM {table}', 'SELECT SUM(CASE WHEN b THEN x ELSE 0 END) FROM {table}'),
+    ('EQUAL_NULL', 'SELECT COUNT(*) FROM {table} WHERE EQUAL_NULL(n, i::bigint)', 'SELECT COUNT(*) FROM {table} WHERE n IS NOT DISTINCT FROM i::bigint'),
+)
+
+
+def time_query(conn, sql: str) -> float:
+    timings = list()
+    for _ in range(RUNS):
+        start = time.time()
+        conn.execute(sql).fetchall()
+        timings.append(time.time() - start)
+    return min(timings)
+
+
+def main():
+    adapter = PostgresAdapter()
+    adapter.replica_meta = dict(name='function-benchmark', short_description='', long_description='')
+    adapter.initialize_replica('benchmark')
+    try:
+        conn = adapter.get_connection()
+        for function in adapter.emulation_functions():
+            with open(os.path.join(adapter._functions_path(), f'{function}.sql'), 'r') as f:
+                conn.execute(f.read())
+        conn.execute(f"""CREATE TABLE {TABLE} AS
+SELECT i, i % 1000 AS g, i % 7 = 0 AS b, md5(i::text) AS s,
+       CASE WHEN i % 3 = 0 THEN NULL ELSE i END AS n,
+       CASE WHEN i % 5 = 0 THEN NULL ELSE i / 7.0 END AS x
+FROM generate_series(1, {ROWS}) AS i""")
+        conn.execute(f'ANALYZE {TABLE}')
+        print(f"{'function':<14}{'emulated (s)':>14}{'native (s)':>12}{'overhead':>10}")
+        for function, emulated, native in COMPARISONS:
+            emulated_time = time_query(conn, emulated.format(table=TABLE))
+            native_time = time_query(conn, native.format(table=TABLE))
+            print(f"{function:<14}{emulated_time:>14.3f}{native_time:>12.3f}{emulated_time/native_time:>9.2f}x")
+    finally:
+        adapter.dispose_connections()
+        SnowShuDocker().remove_container(adapter.container.name)
+
+
+if __name__ == '__main__':
+    main()
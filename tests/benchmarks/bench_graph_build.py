@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Times SnowShuGraph.build_graph with many specified relations against a large
+synthetic catalog, to show how pattern matching scales with catalog and config size.
+
+No credentials required, run from the repo root with
+    python -m tests.benchmarks.bench_graph_build
+"""
+import time
+import mock
+from snowshu.core.configuration_parser import ConfigurationParser, Configuration, MatchPattern
+from snowshu.core.graph import SnowShuGraph
+from snowshu.core.models import materializations as mz
+from snowshu.core.models.relation import Relation
+from snowshu.samplings.samplings import DefaultSampling
+
+SCHEMAS = 50
+SIZES = ((1000, 20,), (10000, 200,), (50000, 1000,),)
+
+
+def synthetic_catalog(relations: int) -> list:
+    return [Relation('BENCHMARK_DATABASE', f'SCHEMA_{i % SCHEMAS}', f'RELATION_{i}', mz.TABLE, list())
+            for i in range(relations)]
+
+
+def synthetic_config(relations: int, specified: int) -> Configuration:
+    """specifies every nth relation, each constrained by the relation before it."""
+    parser = ConfigurationParser()
+    parser.preserve_case = True
+    step = relations // specified
+    specified_relations = parser._build_specified_relations(dict(specified_relations=[
+        dict(database='BENCHMARK_DATABASE',
+             schema=f'SCHEMA_{i % SCHEMAS}',
+             relation=f'RELATION_{i}',
+             relationships=dict(directional=[dict(local_attribute='ID',
+                                                  database='',
+                                                  schema=f'SCHEMA_{(i - 1) % SCHEMAS}',
+                                                  relation=f'RELATION_{i - 1}',
+                                                  remote_attribute='ID')]))
+        for i in range(1, relations, step)]))
+    general_relations = MatchPattern([MatchPattern.DatabasePattern('BENCHMARK_DATABASE', [
+        MatchPattern.SchemaPattern(f'SCHEMA_{i}', [MatchPattern.RelationPattern('RELATION_1.*')])
+        for i in range(0, SCHEMAS, 5)])])
+    return Configuration('benchmark', '1', None, '', '', 4, True,
+                         mock.MagicMock(), mock.MagicMock(),
+                         False, DefaultSampling(), 100,
+                         general_relations,
+                         specified_relations,
+                         general_patterns=parser._compile_general_patterns(general_relations))
+
+
+def main():
+    print(f"{'relations':>10}{'specified':>11}{'graph nodes':>13}{'seconds':>10}")
+    for relations, specified in SIZES:
+        catalog = synthetic_catalog(relations)
+        config = synthetic_config(relations, specified)
+        shgraph = SnowShuGraph()
+        start = time.time()
+        shgraph.build_graph(config, catalog)
+        elapsed = time.time() - start
+        print(f"{relations:>10}{specified:>11}{len(shgraph.graph):>13}{elapsed:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Times SnowShuGraph.get_graphs against synthetic relationship graphs to show how
+splitting the graph into independent DAGs scales with the number of relations.
+The all pairs shortest path split it replaced is timed alongside, for the sizes
+where it finishes in reasonable time.
+
+No credentials required, run from the repo root with
+    python -m tests.benchmarks.bench_graph_split
+"""
+import random
+import time
+import networkx as nx
+from snowshu.core.graph import SnowShuGraph
+from snowshu.core.models import materializations as mz
+from snowshu.core.models.relation import Relation
+
+NODES = (100, 1000, 5000, 10000, 50000,)
+LEGACY_MAX_NODES = 5000
+ISOLATE_RATIO = 0.3
+EDGES_PER_NODE = 1.5
+
+
+def synthetic_graph(nodes: int) -> nx.DiGraph:
+    """a relationship heavy DAG, with edges only pointing from lower to higher nodes."""
+    generator = random.Random(nodes)
+    relations = [Relation('BENCHMARK_DATABASE', f'SCHEMA_{i % 25}', f'RELATION_{i}', mz.TABLE, list())
+                 for i in range(nodes)]
+    graph = nx.DiGraph()
+    graph.add_nodes_from(relations)
+    related = [i for i in range(nodes) if generator.random() > ISOLATE_RATIO]
+    for _ in range(int(len(related) * EDGES_PER_NODE / 2)):
+        upstream, downstream = sorted(generator.sample(related, 2))
+        graph.add_edge(relations[upstream], relations[downstream])
+    return graph
+
+
+def legacy_split(dag: nx.DiGraph) -> list:
+    ugraph = dag.to_undirected()
+    all_paths = set([frozenset(nx.shortest_path(ugraph, node).keys()) for node in ugraph])
+    return list(tuple(node) for node in all_paths)
+
+
+def main():
+    print(f"{'nodes':>8}{'edges':>8}{'graphs':>8}{'seconds':>10}{'legacy split':>14}")
+    for nodes in NODES:
+        shgraph = SnowShuGraph()
+        shgraph.graph = synthetic_graph(nodes)
+        start = time.time()
+        graphs = shgraph.get_graphs()
+        elapsed = time.time() - start
+        legacy = ' '
+        if nodes <= LEGACY_MAX_NODES:
+            start = time.time()
+            legacy_split(shgraph.graph)
+            legacy = f'{time.time() - start:.2f}'
+        print(f"{nodes:>8}{shgraph.graph.number_of_edges():>8}{len(graphs):>8}{elapsed:>10.2f}{legacy:>14}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Compares the row-materialized (pd.read_sql_query) and Arrow batch fetch paths
+of the SnowflakeAdapter on narrow and wide generated relations.
+
+Requires LIVE credentials, run from the repo root with
+    python -m tests.benchmarks.bench_snowflake_fetch
+"""
+import os
+import time
+from snowshu.configs import PACKAGE_ROOT
+from snowshu.core.configuration_parser import ConfigurationParser
+
+ROWS = (10000, 100000, 1000000,)
+SHAPES = dict(narrow=2, wide=60)
+RUNS = 3
+
+
+def generated_relation_sql(rows: int, columns: int) -> str:
+    select = ',\n'.join([f"UNIFORM(1, 1000000, RANDOM()) AS col_{i}" if i % 2 else
+                         f"RANDSTR(20, RANDOM()) AS col_{i}" for i in range(columns)])
+    return f"SELECT {select} FROM TABLE(GENERATOR(ROWCOUNT => {rows}))"
+
+
+def time_fetch(fetch, sql: str) -> float:
+    timings = list()
+    for _ in range(RUNS):
+        start = time.time()
+        fetch(sql)
+        timings.append(time.time() - start)
+    return min(timings)
+
+
+def main():
+    config = ConfigurationParser().from_file_or_path(
+        os.path.join(PACKAGE_ROOT, 'snowshu', 'templates', 'replica.yml'))
+    adapter = config.source_profile.adapter
+    print(f"{'shape':<8}{'rows':>10}{'read_sql (s)':>16}{'arrow (s)':>12}{'speedup':>10}")
+    for shape, columns in SHAPES.items():
+        for rows in ROWS:
+            sql = generated_relation_sql(rows, columns)
+            row_path = time_fetch(adapter._safe_query, sql)
+            arrow_path = time_fetch(adapter._arrow_query, sql)
+            print(f"{shape:<8}{rows:>10}{row_path:>16.2f}{arrow_path:>12.2f}{row_path/arrow_path:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
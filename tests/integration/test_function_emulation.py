@@ -0,0 +1,27 @@
+import os
+from snowshu.adapters.target_adapters import PostgresAdapter
+from snowshu.core.docker import SnowShuDocker
+
+
+def test_emulations_accept_mixed_numeric_types(docker_flush):
+    adapter = PostgresAdapter()
+    adapter.replica_meta = dict(name='function-emulation', short_description='', long_description='')
+    adapter.initialize_replica('SnowflakeAdapter')
+    try:
+        conn = adapter.get_connection()
+        for function in adapter.emulation_functions():
+            with open(os.path.join(adapter._functions_path(), f'{function}.sql'), 'r') as f:
+                conn.execute(f.read())
+        conn.execute("""CREATE TABLE mixed AS
+SELECT NULL::numeric AS numeric_col, 2 AS int_col, 2::bigint AS bigint_col, 1.5::double precision AS double_col, true AS flag""")
+
+        row = conn.execute("""SELECT NVL(numeric_col, 0),
+       IFNULL(double_col, int_col),
+       IFF(flag, numeric_col, 0),
+       EQUAL_NULL(int_col, bigint_col),
+       pg_typeof(NVL(int_col, 0))::text
+FROM mixed""").fetchone()
+        assert tuple(row) == (0, 1.5, None, True, 'integer',)
+    finally:
+        adapter.dispose_connections()
+        SnowShuDocker().remove_container(adapter.container.name)
@@ -0,0 +1,112 @@
+import os
+import mock
+import pytest
+from functools import partial
+from snowshu.adapters.source_adapters import BaseSourceAdapter
+from snowshu.core.catalog import Catalog
+from snowshu.core.catalog_cache import CatalogCache
+from snowshu.core.models import Relation, Attribute
+from snowshu.core.models import data_types as dt
+from snowshu.core.models import materializations as mz
+
+
+def stub_relation(database):
+    relation = Relation(database, 'source_system', 'orders', mz.TABLE,
+                        [Attribute('id', dt.BIGINT), Attribute('created_at', dt.TIMESTAMP_NTZ)])
+    relation.row_count, relation.bytes = 10, 2048
+    return relation
+
+
+@pytest.fixture
+def cached_catalog(tmpdir):
+    adapter = mock.MagicMock()
+    adapter.name = 'snowflake'
+    adapter.get_relations_from_database.side_effect = lambda db, patterns=None: [stub_relation(db)]
+    adapter.get_relations_from_databases.side_effect = partial(BaseSourceAdapter.get_relations_from_databases, adapter)
+    with mock.patch('snowshu.core.catalog.CatalogCache',
+                    partial(CatalogCache, directory=tmpdir.strpath)):
+        yield adapter
+
+
+def test_cache_round_trips_relations(tmpdir):
+    adapter = mock.MagicMock()
+    adapter.name = 'snowflake'
+    cache = CatalogCache(adapter, directory=tmpdir.strpath)
+    cache.set_database('db_one', '2020-01-01', [stub_relation('db_one')])
+    cache.save()
+
+    loaded = CatalogCache(adapter, directory=tmpdir.strpath)
+    assert loaded.load()
+    relation = loaded.relations()[0]
+    assert relation.dot_notation == 'db_one.source_system.orders'
+    assert relation.materialization == mz.TABLE
+    assert relation.attributes[1].data_type == dt.TIMESTAMP_NTZ
+    assert relation.row_count == 10
+
+
+def test_truncated_cache_is_not_usable(tmpdir):
+    adapter = mock.MagicMock()
+    adapter.name = 'snowflake'
+    cache = CatalogCache(adapter, directory=tmpdir.strpath)
+    cache.set_database('db_one', '2020-01-01', [stub_relation('db_one')] * 50)
+    cache.save()
+    assert [path.basename for path in tmpdir.listdir()] == [os.path.basename(cache.path)]
+
+    with open(cache.path, 'rb') as f:
+        saved = f.read()
+    for truncated in (saved[:len(saved) // 2], saved[:-4] + b'\x00' * 4,):
+        with open(cache.path, 'wb') as f:
+            f.write(truncated)
+        assert not CatalogCache(adapter, directory=tmpdir.strpath).load()
+
+
+def test_failed_save_keeps_previous_cache(tmpdir):
+    adapter = mock.MagicMock()
+    adapter.name = 'snowflake'
+    cache = CatalogCache(adapter, directory=tmpdir.strpath)
+    cache.set_database('db_one', '2020-01-01', [stub_relation('db_one')])
+    cache.save()
+
+    with mock.patch('snowshu.core.catalog_cache.json.dump', side_effect=KeyboardInterrupt), \
+            pytest.raises(KeyboardInterrupt):
+        cache.save()
+    assert [path.basename for path in tmpdir.listdir()] == [os.path.basename(cache.path)]
+    assert CatalogCache(adapter, directory=tmpdir.strpath).load()
+
+
+def test_fresh_cache_skips_source(cached_catalog):
+    cached_catalog.get_all_databases_last_altered.return_value = dict(db_one='1', db_two='1')
+    assert len(Catalog.load_full_catalog(cached_catalog)) == 2
+    cached_catalog.reset_mock()
+
+    assert len(Catalog.load_full_catalog(cached_catalog)) == 2
+    cached_catalog.get_all_databases_last_altered.assert_not_called()
+    cached_catalog.get_relations_from_database.assert_not_called()
+
+
+def test_stale_cache_refreshes_changed_databases(cached_catalog):
+    cached_catalog.get_all_databases_last_altered.return_value = dict(db_one='1', db_two='1')
+    Catalog.load_full_catalog(cached_catalog)
+    cached_catalog.get_relations_from_database.reset_mock()
+
+    cached_catalog.get_all_databases_last_altered.return_value = dict(db_one='1', db_two='2')
+    catalog = Catalog.load_full_catalog(cached_catalog, cache_ttl=1e-9)
+    assert {rel.database for rel in catalog} == {'db_one', 'db_two'}
+    assert [call[0][0] for call in cached_catalog.get_relations_from_database.call_args_list] == ['db_two']
+
+
+def test_refresh_catalog_rereads_everything(cached_catalog):
+    cached_catalog.get_all_databases_last_altered.return_value = dict(db_one='1', db_two='1')
+    Catalog.load_full_catalog(cached_catalog)
+    cached_catalog.get_relations_from_database.reset_mock()
+
+    Catalog.load_full_catalog(cached_catalog, refresh=True)
+    assert cached_catalog.get_relations_from_database.call_count == 2
+
+
+def test_zero_ttl_disables_cache(cached_catalog, tmpdir):
+    cached_catalog.get_all_databases_last_altered.return_value = dict(db_one='1')
+    Catalog.load_full_catalog(cached_catalog, cache_ttl=0)
+    Catalog.load_full_catalog(cached_catalog, cache_ttl=0)
+    assert cached_catalog.get_relations_from_database.call_count == 2
+    assert tmpdir.listdir() == []
@@ -8,6 +8,7 @@ from io import StringIO
 import yaml
 from snowshu.core.configuration_parser import ConfigurationParser
 import os
+import re
 from snowshu.samplings.samplings import DefaultSampling
 
 
@@ -79,3 +80,55 @@ def test_loads_good_creds(stub_creds,stub_configs):
     assert adapter_profile.adapter.credentials.password == SOURCES_PASSWORD
 
 
+
+
+def test_sizes_source_pool_from_threads(stub_configs):
+    stub_configs = stub_configs()
+    stub_configs['threads'] = 7
+    parsed = ConfigurationParser().from_file_or_path(StringIO(yaml.dump(stub_configs)))
+    assert parsed.source_profile.adapter.pool_size == 7
+
+
+def test_sets_catalog_strategy(stub_configs):
+    stub_configs = stub_configs()
+    parsed = ConfigurationParser().from_file_or_path(StringIO(yaml.dump(stub_configs)))
+    assert parsed.source_profile.adapter.catalog_strategy == 'information_schema'
+
+    stub_configs['source']['catalog_strategy'] = 'account_usage'
+    parsed = ConfigurationParser().from_file_or_path(StringIO(yaml.dump(stub_configs)))
+    assert parsed.source_profile.adapter.catalog_strategy == 'account_usage'
+
+    stub_configs['source']['catalog_strategy'] = 'psychic'
+    with pytest.raises(ValueError):
+        ConfigurationParser().from_file_or_path(StringIO(yaml.dump(stub_configs)))
+
+
+def test_sets_target_build_profile(stub_configs):
+    stub_configs = stub_configs()
+    parsed = ConfigurationParser().from_file_or_path(StringIO(yaml.dump(stub_configs)))
+    assert parsed.target_profile.adapter.fast_load
+    assert not parsed.target_profile.adapter.build_on_tmpfs
+
+    assert not parsed.target_profile.adapter.single_database
+
+    stub_configs['target'].update(fast_load=False, build_on_tmpfs=True, single_database=True)
+    parsed = ConfigurationParser().from_file_or_path(StringIO(yaml.dump(stub_configs)))
+    assert not parsed.target_profile.adapter.fast_load
+    assert parsed.target_profile.adapter.build_on_tmpfs
+    assert parsed.target_profile.adapter.single_database
+
+
+def test_compiles_patterns_once(stub_configs):
+    stub_configs = stub_configs()
+    parsed = ConfigurationParser().from_file_or_path(StringIO(yaml.dump(stub_configs)))
+
+    general = [(database.database_pattern, schema.schema_pattern, relation.relation_pattern,)
+               for database in parsed.general_relations.databases
+               for schema in database.schemas
+               for relation in schema.relations]
+    assert [(pattern.database.pattern, pattern.schema.pattern, pattern.relation.pattern,)
+            for pattern in parsed.general_patterns] == general
+    for rel in parsed.specified_relations:
+        assert isinstance(rel.compiled.relation, re.Pattern)
+        assert (rel.compiled.database.pattern, rel.compiled.schema.pattern, rel.compiled.relation.pattern,) == \
+            (rel.database_pattern, rel.schema_pattern, rel.relation_pattern,)
@@ -0,0 +1,43 @@
+import networkx as nx
+from snowshu.core import cost_model
+from snowshu.core.models import materializations as mz
+from snowshu.core.models.relation import Relation
+from snowshu.samplings.samplings import DefaultSampling
+from snowshu.configs import COST_SECONDS_PER_RELATION
+
+
+def _relation(name, row_count=None, bytes=None, unsampled=False, materialization=mz.TABLE):
+    relation = Relation('db', 'schema', name, materialization, list())
+    relation.sampling = DefaultSampling()
+    relation.row_count, relation.bytes, relation.unsampled = row_count, bytes, unsampled
+    return relation
+
+
+def test_estimated_rows():
+    assert cost_model.estimated_rows(_relation('empty')) == 0
+    assert cost_model.estimated_rows(_relation('view', 10, materialization=mz.VIEW)) == 0
+    assert cost_model.estimated_rows(_relation('small', 10)) == 10
+    assert cost_model.estimated_rows(_relation('big', 10 ** 8)) == DefaultSampling().estimate_size(10 ** 8)
+    assert cost_model.estimated_rows(_relation('unsampled', 10 ** 8, unsampled=True)) == 10 ** 8
+
+
+def test_relation_cost_grows_with_bytes():
+    small = cost_model.estimate_relation_cost(_relation('small', 10 ** 6, 10 ** 6, unsampled=True))
+    large = cost_model.estimate_relation_cost(_relation('large', 10 ** 6, 10 ** 9, unsampled=True))
+    assert COST_SECONDS_PER_RELATION < small < large
+    assert cost_model.estimate_relation_cost(_relation('large', 10 ** 6, 10 ** 9, unsampled=True),
+                                             analyze=True) == COST_SECONDS_PER_RELATION
+
+
+def test_critical_path_costs():
+    root, short, long_parent, long_child = [_relation(name, 10 ** 6, 10 ** 9, unsampled=True)
+                                            for name in ('root', 'short', 'long_parent', 'long_child')]
+    short.bytes = 10 ** 6
+    graph = nx.DiGraph()
+    graph.add_edges_from([(root, short,), (root, long_parent,), (long_parent, long_child,)])
+
+    costs = cost_model.critical_path_costs(graph)
+    assert costs[long_child] == long_child.estimated_cost
+    assert costs[long_parent] == long_parent.estimated_cost + long_child.estimated_cost
+    assert costs[root] == root.estimated_cost + costs[long_parent]
+    assert costs[short] < costs[long_parent]
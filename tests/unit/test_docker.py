@@ -33,5 +33,50 @@ def test_remounts_data_in_replica():
     container = mock.MagicMock()
     container.exec_run.return_value = (0, '',)
     shdocker = SnowShuDocker()
-    shdocker._remount_replica_data(container, PostgresAdapter())
-    assert [arg for arg in container.exec_run.call_args_list][0][0][0] == "/bin/bash -c 'mkdir /snowshu_replica_data'"
+    adapter = PostgresAdapter()
+    shdocker._remount_replica_data(container, adapter)
+    container.exec_run.assert_not_called()
+
+    adapter.build_on_tmpfs = True
+    shdocker._remount_replica_data(container, adapter)
+    assert [arg for arg in container.exec_run.call_args_list][0][0][0] == "/bin/bash -c 'mkdir -p /snowshu_replica_data'"
+
+
+def test_stops_container_before_commit():
+    container = mock.MagicMock()
+    shdocker = SnowShuDocker()
+    shdocker.client = mock.MagicMock()
+    shdocker.convert_container_to_replica('replica', container, PostgresAdapter())
+    calls = [call[0] for call in container.method_calls]
+    assert calls.index('stop') < calls.index('commit')
+    container.exec_run.assert_not_called()
+
+
+def test_reuses_running_target_with_matching_settings():
+    shdocker = SnowShuDocker()
+    shdocker.client = mock.MagicMock()
+    labels = dict(snowshu_replica='true', target_adapter='PostgresAdapter', source_adapter='default',
+                  snowshu_target_config=shdocker._target_config('postgres:12', 'postgres -p 9999', ['A=b'], None))
+    existing = mock.MagicMock(labels=labels, status='running')
+    shdocker.client.containers.get.return_value = existing
+    with mock.patch.object(shdocker, 'get_stopped_container') as get_stopped_container:
+        container = shdocker.startup('postgres:12', 'postgres -p 9999', 9999, 'PostgresAdapter',
+                                     'default', ['A=b'], reuse=True)
+        assert container is existing
+        get_stopped_container.assert_not_called()
+
+        shdocker.startup('postgres:12', 'postgres -p 9999 -c fsync=off', 9999, 'PostgresAdapter',
+                         'default', ['A=b'], reuse=True)
+        get_stopped_container.assert_called_once()
+
+
+def test_commits_base_image_without_replica_label():
+    container = mock.MagicMock()
+    shdocker = SnowShuDocker()
+    shdocker.client = mock.MagicMock()
+    shdocker.commit_base_image('snowshu_base_postgres:12', container, ['ENV PGDATA /snowshu_replica_data'])
+    container.stop.assert_called_once()
+    container.commit.assert_called_once_with(repository='snowshu_base_postgres',
+                                             tag='12',
+                                             changes=['ENV PGDATA /snowshu_replica_data',
+                                                      'LABEL snowshu_replica=false'])
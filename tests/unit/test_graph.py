@@ -146,6 +146,16 @@ def test_split_dag_to_parallel():
     assert set([frozenset(val) for val in split]) == set([frozenset([1,2,4,3]),frozenset([5,6])])
 
 
+def test_split_dag_to_parallel_matches_all_paths_split():
+    shgraph=SnowShuGraph()
+    dag=nx.gnp_random_graph(300, 0.005, seed=7, directed=True)
+    ugraph=dag.to_undirected()
+    all_paths=set([frozenset(nx.shortest_path(ugraph, node).keys()) for node in ugraph])
+
+    assert set([frozenset(val) for val in shgraph._split_dag_for_parallel(dag)]) == all_paths
+    assert set([frozenset(val) for val in shgraph._split_dag_for_parallel(ugraph)]) == all_paths
+
+
 def test_sets_only_existing_adapters():
     shgraph=SnowShuGraph()
     
@@ -170,3 +180,15 @@ def test_sets_only_existing_adapters():
     
     assert isinstance(shgraph._set_overriding_params_for_node(test_relation,config).sampling,
                       BruteForceSampling)
+
+
+def test_discovery_patterns_include_relationship_targets(stub_configs):
+    config = ConfigurationParser().from_file_or_path(StringIO(yaml.dump(stub_configs())))
+    patterns = SnowShuGraph().discovery_patterns(config)
+
+    assert dict(database='snowshu_development',
+                schema='source_system',
+                name='products') in patterns
+    assert dict(database='snowshu_development',
+                schema='.*',
+                name='^(?!.+_VIEW).+$') in patterns
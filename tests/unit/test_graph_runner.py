@@ -1,13 +1,17 @@
 import pytest
 import mock
 import copy
+import threading
+import networkx as nx
 import pandas as pd
 from snowshu.samplings.samplings import DefaultSampling
 from snowshu.core.graph_set_runner import GraphSetRunner, GraphExecutable
-from time import time
+from snowshu.core.models import materializations as mz
+from snowshu.core.models.relation import Relation
+from time import time, sleep
 
 
-def test_traverse_and_execute_analyze(stub_graph_set):
+def test_execute_relations_analyze(stub_graph_set):
     source_adapter,target_adapter=[mock.MagicMock() for _ in range(2)]
     source_adapter.predicate_constraint_statement.return_value=str()
     source_adapter.upstream_constraint_statement.return_value=str()
@@ -29,7 +33,7 @@ def test_traverse_and_execute_analyze(stub_graph_set):
     dag_executable = GraphExecutable(dag, source_adapter, target_adapter, True)
 
     # longer dag
-    runner._traverse_and_execute(dag_executable, time())
+    runner._execute_relations([dag_executable], 1, time())
     for rel in dag.nodes:
         assert not isinstance(getattr(rel, 'data', None), pd.DataFrame)
         assert rel.source_extracted is True
@@ -47,9 +51,360 @@ def test_traverse_and_execute_analyze(stub_graph_set):
     iso_executable = GraphExecutable(iso, source_adapter, target_adapter, True)
     assert not isinstance(
         getattr(vals.iso_relation, 'data', None), pd.DataFrame)
-    runner._traverse_and_execute(iso_executable, time())
+    runner._execute_relations([iso_executable], 1, time())
     iso_relation = [node for node in iso.nodes][0]
     assert iso_relation.source_extracted is True
     assert iso_relation.target_loaded is False
     assert iso_relation.sample_size == 100
     assert iso_relation.population_size == 1000
+
+
+def test_execute_relations_uses_catalog_row_count(stub_graph_set):
+    source_adapter,target_adapter=[mock.MagicMock() for _ in range(2)]
+    source_adapter.sample_statement_from_relation.return_value=str()
+    source_adapter.check_count_and_query.return_value=pd.DataFrame([dict(population_size=1000,sample_size=100)])
+    runner=GraphSetRunner()
+    runner.barf=False
+    graph_set,vals=stub_graph_set
+    iso=copy.deepcopy(graph_set[0])
+    relation=[node for node in iso.nodes][0]
+    relation.sampling=DefaultSampling()
+    relation.unsampled=False
+    relation.include_outliers=False
+    relation.row_count=5000
+
+    runner._execute_relations([GraphExecutable(iso, source_adapter, target_adapter, True)], 1, time())
+    source_adapter.scalar_query.assert_not_called()
+    assert relation.sampling.size == DefaultSampling().sample_size_method.size(5000)
+
+
+def test_concurrent_relations_keep_their_own_sample_size():
+    source_adapter=mock.MagicMock()
+    source_adapter.check_count_and_query.return_value=pd.DataFrame([dict(population_size=1, sample_size=1)])
+    sampling=DefaultSampling(min_sample_size=1)
+    small,large=_mock_relation('small'),_mock_relation('large')
+    small.row_count,large.row_count=100,10 ** 6
+    sample_rows=dict()
+
+    def compile_queries(relation, *_):
+        sleep(.1)
+        sample_rows[relation]=relation.sampling.sample_method.rows
+        relation.compiled_query=str()
+        return relation
+
+    runner=GraphSetRunner()
+    runner.barf=False
+    for relation in (small, large):
+        relation.sampling=sampling
+    with mock.patch('snowshu.core.graph_set_runner.RuntimeSourceCompiler.compile_queries_for_relation',
+                    side_effect=compile_queries):
+        runner._execute_relations([GraphExecutable(_graph(nodes=[small, large]), source_adapter, None, True)], 2, time())
+    assert sample_rows == {relation: sampling.estimate_size(relation.row_count) for relation in (small, large)}
+
+
+def test_count_populations_in_one_query(stub_relation_set):
+    source_adapter=mock.MagicMock()
+    relations=[stub_relation_set.iso_relation, stub_relation_set.view_relation, stub_relation_set.upstream_relation]
+    stub_relation_set.upstream_relation.row_count=20
+    source_adapter.check_count_and_query.return_value=pd.DataFrame(dict(relation=[relations[0].dot_notation, relations[1].dot_notation],
+                                                                        population_size=[10, 30]))
+    GraphSetRunner()._count_populations(relations, source_adapter)
+
+    source_adapter.batched_population_count_statement.assert_called_once_with(relations[:2])
+    assert source_adapter.check_count_and_query.call_count == 1
+    assert [rel.population_size for rel in relations[:2]] == [10, 30]
+
+
+def test_count_populations_failure_falls_back_to_single_counts(stub_relation_set):
+    source_adapter=mock.MagicMock()
+    source_adapter.check_count_and_query.side_effect=Exception('boom')
+    relation=stub_relation_set.iso_relation
+    GraphSetRunner()._count_populations([relation], source_adapter)
+    assert relation.population_size is None
+
+
+def test_execute_relations_uses_catalog_view_ddl(stub_graph_set):
+    source_adapter,target_adapter=[mock.MagicMock() for _ in range(2)]
+    runner=GraphSetRunner()
+    runner.barf=False
+    graph_set,vals=stub_graph_set
+    view_graph=copy.deepcopy(graph_set[1])
+    view=[node for node in view_graph.nodes][0]
+    view.sampling=DefaultSampling()
+    view.row_count=None
+    view.population_size=0
+    view.view_ddl='SELECT 1'
+
+    runner._execute_relations([GraphExecutable(view_graph, source_adapter, target_adapter, False)], 1, time())
+    source_adapter.scalar_query.assert_not_called()
+    target_adapter.create_and_load_relation.assert_called_once_with(view)
+    assert view.view_ddl == 'SELECT 1'
+
+
+def _mock_relation(name, view_ddl=None, is_view=False):
+    relation=Relation('db', 'schema', name, mz.VIEW if is_view else mz.TABLE, list())
+    relation.view_ddl=view_ddl
+    return relation
+
+
+def test_view_dependencies_are_referenced_relations():
+    orders,customers=_mock_relation('orders'),_mock_relation('customers')
+    view=_mock_relation('order_view', view_ddl='SELECT * FROM db.schema."ORDERS"', is_view=True)
+    view_of_view=_mock_relation('recent_orders', view_ddl='SELECT * FROM order_view', is_view=True)
+    unknown_view=_mock_relation('unknown_view', is_view=True)
+    relations=[orders, customers, view, view_of_view, unknown_view]
+    runner=GraphSetRunner()
+    assert runner._view_dependencies(view, relations) == {orders}
+    assert runner._view_dependencies(view_of_view, relations) == {view}
+    assert runner._view_dependencies(unknown_view, relations) == {orders, customers}
+
+
+def test_view_dependencies_resolve_qualified_names():
+    table=Relation('raw', 'public', 'orders', mz.TABLE, list())
+    staging=Relation('analytics', 'staging', 'orders', mz.VIEW, list())
+    staging.view_ddl='SELECT * FROM raw.public.orders'
+    marts=Relation('analytics', 'marts', 'orders', mz.VIEW, list())
+    marts.view_ddl='SELECT * FROM "STAGING"."ORDERS" orders WHERE orders.id > 0'
+    summary=Relation('analytics', 'marts', 'summary', mz.VIEW, list())
+    summary.view_ddl='SELECT count(*) FROM orders'
+    relations=[table, staging, marts, summary]
+    runner=GraphSetRunner()
+    assert runner._view_dependencies(staging, relations) == {table}
+    assert runner._view_dependencies(marts, relations) == {staging}
+    assert runner._view_dependencies(summary, relations) == {marts}
+
+    loaded=list()
+    with mock.patch.object(runner, '_extract_relation'), \
+            mock.patch.object(runner, '_load_relation', side_effect=lambda e, relation, s: loaded.append(relation)):
+        runner._execute_relations([GraphExecutable(_graph(nodes=relations), None, None, False)], 2, time())
+    assert loaded.index(table) < loaded.index(staging) < loaded.index(marts) < loaded.index(summary)
+
+
+def test_views_referencing_each_other_do_not_wait_on_each_other():
+    first,second=_mock_relation('first', 'SELECT * FROM second', True),_mock_relation('second', 'SELECT * FROM first', True)
+    runner=GraphSetRunner()
+    assert runner._view_dependencies(first, [first, second]) == set()
+    assert runner._view_dependencies(second, [first, second]) == set()
+
+
+def _graph(*edges, nodes=tuple()):
+    graph=nx.DiGraph()
+    graph.add_edges_from(edges)
+    graph.add_nodes_from(nodes)
+    return graph
+
+
+def test_execute_relations_shares_pool_across_graphs():
+    """a relation with extracted predecessors runs while other graphs are still busy."""
+    parent,child,slow=[_mock_relation(name) for name in ('parent', 'child', 'slow')]
+    child_done=threading.Event()
+    order=list()
+
+    def extract(executable, relation, start_time):
+        if relation is slow:
+            assert child_done.wait(5)
+        order.append(relation)
+        if relation is child:
+            child_done.set()
+
+    runner=GraphSetRunner()
+    with mock.patch.object(runner, '_extract_relation', side_effect=extract):
+        runner._execute_relations([GraphExecutable(_graph(nodes=[slow]), None, None, True),
+                                   GraphExecutable(_graph((parent, child,)), None, None, True)], 2, time())
+    assert order == [parent, child, slow]
+
+
+def test_children_wait_on_parent_extraction_not_load():
+    parent,child=_mock_relation('parent'),_mock_relation('child')
+    child_extracted=threading.Event()
+    loaded=list()
+
+    def load(executable, relation, start_time):
+        if relation is parent:
+            assert child_extracted.wait(5)
+        loaded.append(relation)
+
+    def extract(executable, relation, start_time):
+        if relation is child:
+            child_extracted.set()
+
+    runner=GraphSetRunner()
+    with mock.patch.object(runner, '_extract_relation', side_effect=extract), \
+            mock.patch.object(runner, '_load_relation', side_effect=load):
+        runner._execute_relations([GraphExecutable(_graph((parent, child,)), None, None, False)], 2, time())
+    assert set(loaded) == {parent, child}
+
+
+def test_views_load_after_referenced_tables():
+    orders,customers=_mock_relation('orders'),_mock_relation('customers')
+    view=_mock_relation('order_view', view_ddl='SELECT * FROM orders', is_view=True)
+    view_of_view=_mock_relation('recent_orders', view_ddl='SELECT * FROM order_view', is_view=True)
+    loaded=list()
+
+    def load(executable, relation, start_time):
+        if relation is view:
+            assert orders in loaded
+        if relation is view_of_view:
+            assert view in loaded
+        loaded.append(relation)
+
+    runner=GraphSetRunner()
+    with mock.patch.object(runner, '_extract_relation'), \
+            mock.patch.object(runner, '_load_relation', side_effect=load):
+        runner._execute_relations([GraphExecutable(_graph(nodes=[relation]), None, None, False)
+                                   for relation in (view_of_view, view, orders, customers)], 3, time())
+    assert set(loaded) == {orders, customers, view, view_of_view}
+
+
+def test_views_load_after_graph_predecessors():
+    orders=_mock_relation('orders')
+    view=_mock_relation('order_view', view_ddl='SELECT 1', is_view=True)
+    loaded=list()
+
+    def load(executable, relation, start_time):
+        if relation is view:
+            assert orders in loaded
+        else:
+            sleep(0.05)
+        loaded.append(relation)
+
+    runner=GraphSetRunner()
+    with mock.patch.object(runner, '_extract_relation'), \
+            mock.patch.object(runner, '_load_relation', side_effect=load):
+        runner._execute_relations([GraphExecutable(_graph((orders, view,)), None, None, False)], 2, time())
+    assert loaded == [orders, view]
+
+
+def test_execute_relations_skips_dependents_of_failures():
+    parent,child,grandchild,other=[_mock_relation(name) for name in ('parent', 'child', 'grandchild', 'other')]
+    view=_mock_relation('parent_view', view_ddl='SELECT * FROM parent', is_view=True)
+    extracted,loaded=list(),list()
+
+    def extract(executable, relation, start_time):
+        extracted.append(relation)
+        if relation is parent:
+            raise SystemError('boom')
+
+    runner=GraphSetRunner()
+    with mock.patch.object(runner, '_extract_relation', side_effect=extract), \
+            mock.patch.object(runner, '_load_relation', side_effect=lambda e, relation, s: loaded.append(relation)):
+        runner._execute_relations([GraphExecutable(_graph((parent, child,), (child, grandchild,)), None, None, False),
+                                   GraphExecutable(_graph(nodes=[other]), None, None, False),
+                                   GraphExecutable(_graph(nodes=[view]), None, None, False)], 2, time())
+    assert set(extracted) == {parent, other, view}
+    assert loaded == [other]
+
+
+def test_load_queue_is_bounded():
+    relations=[_mock_relation(f'relation_{i}') for i in range(20)]
+    release_loads=threading.Event()
+    extracted=list()
+
+    def extract(executable, relation, start_time):
+        extracted.append(relation)
+
+    runner=GraphSetRunner()
+    with mock.patch('snowshu.core.graph_set_runner.LOAD_QUEUE_SIZE', 2), \
+            mock.patch.object(runner, '_extract_relation', side_effect=extract), \
+            mock.patch.object(runner, '_load_relation', side_effect=lambda *_: release_loads.wait(5)):
+        worker=threading.Thread(target=runner._execute_relations,
+                                args=([GraphExecutable(_graph(nodes=relations), None, None, False)], 1, time(),))
+        worker.start()
+        worker.join(.5)
+        # one loading, two queued and one extractor blocked waiting for room
+        assert len(extracted) < len(relations)
+        release_loads.set()
+        worker.join(5)
+    assert len(extracted) == len(relations)
+
+
+def test_backpressure_keeps_extraction_in_critical_path_order():
+    """a worker blocked on a full load queue keeps its slot, so children readied meanwhile go first."""
+    parent,child=_mock_relation('parent'),_mock_relation('child')
+    isolates=[_mock_relation(f'isolate_{i}') for i in range(6)]
+    priority={parent: 10, child: 9, **{isolate: 1 for isolate in isolates}}
+    for relation, cost in priority.items():
+        relation.estimated_cost=cost
+    parent_go,loads_go=threading.Event(),threading.Event()
+    order=list()
+
+    def extract(executable, relation, start_time):
+        order.append(relation)
+        if relation is parent:
+            assert parent_go.wait(5)
+            sleep(.1)
+        elif relation is isolates[3]:
+            # two loading and one queued, so this extraction blocks on the full queue
+            parent_go.set()
+        elif relation is child:
+            loads_go.set()
+
+    runner=GraphSetRunner()
+    with mock.patch('snowshu.core.graph_set_runner.LOAD_QUEUE_SIZE', 1), \
+            mock.patch('snowshu.core.graph_set_runner.critical_path_costs',
+                       side_effect=lambda graph, analyze: {relation: priority[relation] for relation in graph.nodes}), \
+            mock.patch.object(runner, '_extract_relation', side_effect=extract), \
+            mock.patch.object(runner, '_load_relation', side_effect=lambda *_: loads_go.wait(5)):
+        runner._execute_relations([GraphExecutable(_graph((parent, child,)), None, None, True),
+                                   GraphExecutable(_graph(nodes=isolates), None, None, False)], 2, time())
+    assert order.index(child) < order.index(isolates[4])
+    assert set(order) == set(priority)
+
+
+def test_execute_relations_releases_data_after_successors(stub_relation_set):
+    parent,child=stub_relation_set.upstream_relation,stub_relation_set.downstream_relation
+    parent_data_at_child=list()
+
+    def extract(executable, relation, start_time):
+        if relation is parent:
+            relation._data=pd.DataFrame([dict(id=1)])
+        else:
+            parent_data_at_child.append(isinstance(getattr(parent, 'data', None), pd.DataFrame))
+
+    runner=GraphSetRunner()
+    with mock.patch.object(runner, '_extract_relation', side_effect=extract), \
+            mock.patch.object(runner, '_load_relation'):
+        runner._execute_relations([GraphExecutable(_graph((parent, child,)), None, None, False)], 1, time())
+    assert parent_data_at_child == [True]
+    assert not isinstance(getattr(parent, 'data', None), pd.DataFrame)
+
+
+def test_execute_relations_extracts_longest_path_first():
+    isolate,parent,child=[_mock_relation(name) for name in ('isolate', 'parent', 'child')]
+    for relation in (isolate, parent, child):
+        relation.row_count, relation.bytes, relation.unsampled = 10 ** 6, 10 ** 8, True
+    isolate.bytes=10 ** 3
+    order=list()
+
+    runner=GraphSetRunner()
+    with mock.patch.object(runner, '_extract_relation', side_effect=lambda e, relation, s: order.append(relation)):
+        runner._execute_relations([GraphExecutable(_graph(nodes=[isolate]), None, None, False),
+                                   GraphExecutable(_graph((parent, child,)), None, None, False)], 1, time())
+    assert order[:2] == [parent, child]
+    assert all(relation.actual_cost is not None for relation in (isolate, parent, child))
+
+
+def test_load_failure_keeps_data_for_extracting_children(stub_relation_set):
+    parent,child=stub_relation_set.upstream_relation,stub_relation_set.downstream_relation
+    load_failed=threading.Event()
+    parent_data_at_child=list()
+
+    def extract(executable, relation, start_time):
+        if relation is parent:
+            relation._data=pd.DataFrame([dict(id=1)])
+        else:
+            assert load_failed.wait(5)
+            sleep(.2)
+            parent_data_at_child.append(isinstance(getattr(parent, 'data', None), pd.DataFrame))
+
+    def load(executable, relation, start_time):
+        if relation is parent:
+            load_failed.set()
+            raise SystemError('boom')
+
+    runner=GraphSetRunner()
+    with mock.patch.object(runner, '_extract_relation', side_effect=extract), \
+            mock.patch.object(runner, '_load_relation', side_effect=load):
+        runner._execute_relations([GraphExecutable(_graph((parent, child,)), None, None, False)], 2, time())
+    assert parent_data_at_child == [True]
+    assert not isinstance(getattr(parent, 'data', None), pd.DataFrame)
@@ -72,6 +72,25 @@ def test_sample_args_valid(run, replica):
         assert logger.getEffectiveLevel() == DEBUG
 
 
+@patch('snowshu.core.main.ReplicaFactory.load_config')
+@patch('snowshu.core.main.ReplicaFactory.create')
+def test_create_reuse_target(create, load, temporary_replica):
+    runner = CliRunner()
+    runner.invoke(main.cli, ('create',))
+    assert create.call_args_list[0][0][3] is False
+    runner.invoke(main.cli, ('create', '--reuse-target',))
+    assert create.call_args_list[1][0][3] is True
+
+
+@patch('snowshu.core.main.fetch_adapter')
+def test_build_base(fetch_adapter):
+    runner = CliRunner()
+    fetch_adapter.return_value.return_value.build_base_image.return_value = 'snowshu_base_postgres:12'
+    result = runner.invoke(main.cli, ('build-base',))
+    fetch_adapter.assert_called_once_with('postgres', 'target')
+    assert 'snowshu_base_postgres:12' in result.output
+
+
 @patch('snowshu.core.main.ReplicaFactory.target_adapter.create_relation')
 @patch('snowshu.core.main.ReplicaFactory')
 def test_analyze_does_all_but_run(replica, create_relation):
@@ -0,0 +1,343 @@
+import pytest
+import mock
+import os
+import re
+import struct
+import pandas as pd
+from datetime import date, datetime
+from snowshu.adapters.source_adapters import SnowflakeAdapter
+from snowshu.adapters.target_adapters.postgres_adapter import PostgresAdapter
+from snowshu.core.models import Relation, Attribute
+from snowshu.core.models import data_types as dt
+from snowshu.core.models import materializations as mz
+
+
+def stub_relation():
+    relation = Relation('snowshu_development', 'source_system', 'orders', mz.TABLE,
+                        [Attribute('id', dt.BIGINT),
+                         Attribute('name', dt.VARCHAR),
+                         Attribute('created_at', dt.TIMESTAMP_NTZ)])
+    relation.data = pd.DataFrame(dict(id=[1.0, None], name=['a,"b"', None],
+                                      created_at=[datetime(2000, 1, 1, 0, 0, 1), None]))
+    return relation
+
+
+def test_csv_copy_buffer_formats_nulls_and_integers():
+    relation = stub_relation()
+    buffer = PostgresAdapter()._csv_copy_buffer(relation.data, [attr.data_type for attr in relation.attributes])
+    assert buffer.read().splitlines() == ['1,"a,""b""",2000-01-01 00:00:01',
+                                          '\\N,\\N,\\N']
+
+
+def test_binary_copy_buffer_encodes_rows():
+    frame = pd.DataFrame(dict(id=[7, None], day=[date(2000, 1, 2), None]))
+    buffer = PostgresAdapter()._binary_copy_buffer(frame, [dt.BIGINT, dt.DATE]).read()
+    header = b'PGCOPY\n\xff\r\n\x00' + struct.pack('!ii', 0, 0)
+    assert buffer == header + \
+        struct.pack('!hiqii', 2, 8, 7, 4, 1) + \
+        struct.pack('!hii', 2, -1, -1) + \
+        struct.pack('!h', -1)
+
+
+def test_copy_buffers_never_round_integer_columns():
+    frame = pd.DataFrame(dict(amount=[1.0, 12.25, None]))
+    adapter = PostgresAdapter()
+    with pytest.raises(ValueError):
+        adapter._csv_copy_buffer(frame, [dt.BIGINT])
+    with pytest.raises(ValueError):
+        adapter._binary_copy_buffer(frame, [dt.BIGINT])
+
+
+def test_load_data_into_relation_uses_copy():
+    adapter = PostgresAdapter()
+    relation = stub_relation()
+    engine = mock.MagicMock()
+    with mock.patch.object(adapter, 'get_connection', return_value=engine), \
+            mock.patch.object(pd.DataFrame, 'to_sql') as to_sql:
+        adapter.load_data_into_relation(relation)
+
+    to_sql.assert_not_called()
+    assert engine.execute.call_args[0][0] == adapter.create_table_statement(relation)
+    cursor = engine.raw_connection.return_value.cursor.return_value.__enter__.return_value
+    statement = cursor.copy_expert.call_args[0][0]
+    assert statement.startswith('COPY "source_system"."orders" ("id","name","created_at") FROM STDIN WITH (FORMAT csv')
+    engine.raw_connection.return_value.commit.assert_called_once()
+    assert relation.load_method == 'copy csv'
+
+
+def test_load_data_into_relation_falls_back_to_insert():
+    adapter = PostgresAdapter()
+    adapter.COPY_FORMAT = 'binary'
+    relation = stub_relation()
+    engine = mock.MagicMock()
+    cursor = engine.raw_connection.return_value.cursor.return_value.__enter__.return_value
+    cursor.copy_expert.side_effect = Exception('no copy here')
+    with mock.patch.object(adapter, 'get_connection', return_value=engine), \
+            mock.patch.object(pd.DataFrame, 'to_sql') as to_sql:
+        adapter.load_data_into_relation(relation)
+
+    assert 'FORMAT binary' in cursor.copy_expert.call_args[0][0]
+    assert to_sql.call_args[1]['method'] == 'multi'
+    assert to_sql.call_args[1]['if_exists'] == 'append'
+    assert relation.load_method == 'insert'
+
+
+def test_create_table_statement_uses_attribute_types():
+    adapter = PostgresAdapter()
+    adapter.fast_load = False
+    assert adapter.create_table_statement(stub_relation()) == """CREATE TABLE "source_system"."orders" (
+"id" BIGINT,
+"name" VARCHAR,
+"created_at" TIMESTAMP WITHOUT TIME ZONE
+)"""
+
+
+def test_create_table_statement_keeps_decimals_and_long_chars():
+    adapter = PostgresAdapter()
+    adapter.fast_load = False
+    relation = Relation('snowshu_development', 'source_system', 'payments', mz.TABLE,
+                        [Attribute('amount', dt.NUMERIC), Attribute('code', dt.CHAR)])
+    assert adapter.create_table_statement(relation) == """CREATE TABLE "source_system"."payments" (
+"amount" NUMERIC,
+"code" VARCHAR
+)"""
+
+
+def test_fast_load_build_profile():
+    adapter = PostgresAdapter()
+    assert adapter.create_table_statement(stub_relation()).startswith('CREATE UNLOGGED TABLE')
+    assert adapter.DOCKER_START_COMMAND == 'postgres -p 9999 -c fsync=off -c synchronous_commit=off -c full_page_writes=off'
+    assert 'CMD ["postgres", "-p", "9999"]' in adapter.docker_commit_changes()
+    assert adapter._build_tmpfs() is None
+    assert 'PGDATA=/snowshu_replica_data' in adapter._build_snowshu_envars(adapter.DOCKER_SNOWSHU_ENVARS)
+    assert adapter.image_finalize_bash_commands() == list()
+    adapter.build_on_tmpfs = True
+    assert adapter._build_tmpfs() == {'/var/lib/postgresql/data': 'rw'}
+    assert 'PGDATA=/var/lib/postgresql/data' in adapter._build_snowshu_envars(adapter.DOCKER_SNOWSHU_ENVARS)
+    assert 'cp -a /var/lib/postgresql/data/. /snowshu_replica_data' in adapter.image_finalize_bash_commands()
+    assert 'ENV PGDATA /snowshu_replica_data' in adapter.docker_commit_changes()
+
+    adapter.fast_load = False
+    assert adapter.DOCKER_START_COMMAND == 'postgres -p 9999'
+
+
+def test_finalize_sets_tables_logged_before_commit():
+    adapter = PostgresAdapter()
+    adapter.replica_meta = dict(name='replica')
+    adapter.container = mock.MagicMock()
+    engine = mock.MagicMock()
+    engine.execute.return_value.fetchall.return_value = [('snowshu',), ('snowshu_development',)]
+    with mock.patch.object(adapter, 'get_connection', return_value=engine), \
+            mock.patch('snowshu.adapters.target_adapters.base_target_adapter.SnowShuDocker') as shdocker:
+        adapter.finalize_replica()
+
+    statements = [call[0][0] for call in engine.execute.call_args_list]
+    assert sum('SET LOGGED' in statement for statement in statements) == 2
+    assert 'CHECKPOINT' not in statements
+    shdocker.return_value.convert_container_to_replica.assert_called_once()
+
+
+def test_tmpfs_build_is_copied_as_an_online_backup():
+    adapter = PostgresAdapter()
+    adapter.build_on_tmpfs = True
+    commands = adapter.image_finalize_bash_commands()
+    start_backup = next(i for i, command in enumerate(commands) if 'pg_start_backup' in command)
+    copy = commands.index('cp -a /var/lib/postgresql/data/. /snowshu_replica_data')
+    stop_backup = next(i for i, command in enumerate(commands) if 'pg_stop_backup' in command)
+    copy_wal = commands.index('cp -a /var/lib/postgresql/data/pg_wal/. /snowshu_replica_data/pg_wal')
+    assert start_backup < copy < stop_backup < copy_wal
+    # commands are run inside single quotes
+    assert not any("'" in command for command in commands)
+
+
+def test_create_database_and_schema_only_once():
+    adapter = PostgresAdapter()
+    engine = mock.MagicMock()
+    with mock.patch.object(adapter, 'get_connection', return_value=engine):
+        for _ in range(3):
+            adapter.create_database_if_not_exists('snowshu_development')
+            adapter.create_schema_if_not_exists('snowshu_development', 'source_system')
+        adapter.create_schema_if_not_exists('snowshu_development', 'other_system')
+
+    statements = [call[0][0] for call in engine.execute.call_args_list]
+    assert statements == ['CREATE DATABASE snowshu_development',
+                          'CREATE SCHEMA IF NOT EXISTS source_system',
+                          'CREATE SCHEMA IF NOT EXISTS other_system']
+
+
+@mock.patch('snowshu.adapters.base_sql_adapter.event')
+@mock.patch('snowshu.adapters.base_sql_adapter.sqlalchemy.create_engine')
+def test_target_connections_are_pooled_per_database(create_engine, event):
+    adapter = PostgresAdapter()
+    adapter.pool_size = 4
+    create_engine.side_effect = lambda *args, **kwargs: mock.MagicMock()
+    first = adapter.get_connection(database_override='snowshu_development')
+    second = adapter.get_connection(database_override='snowshu_development')
+    other = adapter.get_connection(database_override='snowshu')
+    assert first is second
+    assert other is not first
+    assert create_engine.call_count == 2
+    assert create_engine.call_args[1]['pool_size'] == 4
+
+    adapter.dispose_connections()
+    first.dispose.assert_called_once()
+    other.dispose.assert_called_once()
+
+
+def test_single_database_layout_maps_schemas():
+    adapter = PostgresAdapter()
+    adapter.single_database = True
+    relation = stub_relation()
+    engine = mock.MagicMock()
+    with mock.patch.object(adapter, 'get_connection', return_value=engine) as get_connection:
+        assert adapter.create_database_if_not_exists('snowshu_development') == 'snowshu'
+        adapter.create_schema_if_not_exists('snowshu_development', 'source_system')
+        adapter.create_schema_if_not_exists('snowshu', 'snowshu')
+        adapter.load_data_into_relation(relation)
+
+    statements = [call[0][0] for call in engine.execute.call_args_list]
+    assert 'CREATE SCHEMA IF NOT EXISTS snowshu_development__source_system' in statements
+    assert 'CREATE SCHEMA IF NOT EXISTS snowshu' in statements
+    assert {call[1].get('database_override', 'snowshu') for call in get_connection.call_args_list} == {'snowshu'}
+    assert adapter.quoted_table(relation) == '"snowshu_development__source_system"."orders"'
+
+
+def test_single_database_layout_rewrites_view_ddl():
+    adapter = PostgresAdapter()
+    adapter._created.update({('snowshu_development', 'source_system',),
+                             ('snowshu_development', 'snowshu_development',),
+                             ('external_data', 'social_users_import',)})
+    view = Relation('snowshu_development', 'source_system', 'order_users', mz.VIEW, [])
+    ddl = ('SELECT * FROM "SNOWSHU_DEVELOPMENT"."SOURCE_SYSTEM".ORDERS o '
+           'JOIN EXTERNAL_DATA.SOCIAL_USERS_IMPORT.USERS u ON o.user_id = u.id '
+           'JOIN source_system.order_items i ON i.order_id = o.id '
+           'JOIN snowshu_development.customers c ON c.id = o.customer_id')
+    assert adapter.rewrite_cross_database_names(ddl, view) == ddl
+
+    adapter.single_database = True
+    assert adapter.rewrite_cross_database_names(ddl, view) == (
+        'SELECT * FROM snowshu_development__source_system.ORDERS o '
+        'JOIN external_data__social_users_import.USERS u ON o.user_id = u.id '
+        'JOIN snowshu_development__source_system.order_items i ON i.order_id = o.id '
+        'JOIN snowshu_development__snowshu_development.customers c ON c.id = o.customer_id')
+
+
+def test_single_database_layout_keeps_aliases_named_like_schemas():
+    adapter = PostgresAdapter()
+    adapter.single_database = True
+    adapter._created.update({('snowshu_development', 'source_system',),
+                             ('snowshu_development', 'events',)})
+    view = Relation('snowshu_development', 'source_system', 'order_events', mz.VIEW, [])
+    ddl = ('SELECT events.id, o.id FROM source_system.orders o '
+           'JOIN source_system.clicks events ON events.order_id = o.id '
+           'JOIN "EVENTS".opens ON o.id = opens.order_id')
+    assert adapter.rewrite_cross_database_names(ddl, view) == (
+        'SELECT events.id, o.id FROM snowshu_development__source_system.orders o '
+        'JOIN snowshu_development__source_system.clicks events ON events.order_id = o.id '
+        'JOIN snowshu_development__events.opens ON o.id = opens.order_id')
+
+
+def test_single_database_layout_skips_foreign_data_wrappers():
+    adapter = PostgresAdapter()
+    adapter.single_database = True
+    engine = mock.MagicMock()
+    relations = [stub_relation(),
+                 Relation('external_data', 'social_users_import', 'users', mz.TABLE, [])]
+    with mock.patch.object(adapter, 'get_connection', return_value=engine):
+        adapter.enable_cross_database(relations)
+
+    statements = [call[0][0] for call in engine.execute.call_args_list]
+    assert statements == ['ALTER DATABASE snowshu SET search_path TO "$user", public, '
+                          '"external_data__social_users_import", "snowshu_development__source_system"']
+
+
+@mock.patch('snowshu.adapters.target_adapters.base_target_adapter.sleep')
+def test_waits_for_target_with_backoff(sleep):
+    adapter = PostgresAdapter()
+    with mock.patch.object(adapter, 'target_database_is_ready', side_effect=[False] * 6 + [True]):
+        adapter._wait_until_ready()
+    assert [call[0][0] for call in sleep.call_args_list] == [.1, .2, .4, .8, 1.6, 2]
+
+    with mock.patch.object(adapter, 'target_database_is_ready', return_value=False), \
+            mock.patch('snowshu.adapters.target_adapters.base_target_adapter.time.time', side_effect=[0, 1, 6]):
+        with pytest.raises(TimeoutError):
+            adapter._wait_until_ready(timeout=5)
+
+
+def test_reset_replica_keeps_credentials_database():
+    adapter = PostgresAdapter()
+    server, credentials_database = mock.MagicMock(), mock.MagicMock()
+    server.execute.return_value.fetchall.return_value = [('snowshu_development',)]
+    credentials_database.execute.return_value.fetchall.side_effect = [[('snowshu_development',)],
+                                                                      [('snowshu',), ('snowshu_development__source_system',)]]
+    with mock.patch.object(adapter, 'get_connection',
+                           side_effect=lambda database_override=None: server if database_override == 'postgres'
+                           else credentials_database):
+        adapter.reset_replica()
+
+    server_statements = [call[0][0] for call in server.execute.call_args_list]
+    assert "NOT IN ('postgres', 'snowshu')" in server_statements[0]
+    assert [statement for statement in server_statements if statement.startswith('DROP')] == \
+        ['DROP DATABASE IF EXISTS "snowshu_development"']
+    statements = [call[0][0] for call in credentials_database.execute.call_args_list]
+    assert [statement for statement in statements if not statement.startswith('SELECT')] == \
+        ['DROP SERVER IF EXISTS "snowshu_development" CASCADE',
+         'DROP SCHEMA IF EXISTS "snowshu" CASCADE',
+         'DROP SCHEMA IF EXISTS "snowshu_development__source_system" CASCADE',
+         'ALTER DATABASE snowshu RESET search_path']
+
+
+def test_prepare_base_image_installs_into_template1():
+    adapter = PostgresAdapter()
+    engine = mock.MagicMock()
+    with mock.patch.object(adapter, 'get_connection', return_value=engine) as get_connection:
+        adapter.prepare_base_image()
+
+    statements = [call[0][0] for call in engine.execute.call_args_list]
+    assert "ALTER SYSTEM SET wal_level = 'minimal'" in statements
+    assert statements.count('CREATE EXTENSION IF NOT EXISTS postgres_fdw') == 2
+    assert sum('FUNCTION RLIKE' in statement for statement in statements) == 2
+    assert 'template1' in {call[1].get('database_override') for call in get_connection.call_args_list}
+
+
+def test_starts_from_base_image_when_built():
+    adapter = PostgresAdapter()
+    shdocker = mock.MagicMock()
+    shdocker.image_exists.return_value = False
+    assert adapter._target_image(shdocker) == 'postgres:12'
+    assert not adapter.from_base_image
+
+    shdocker.image_exists.return_value = True
+    assert adapter._target_image(shdocker) == 'snowshu_base_postgres:12'
+    assert adapter.from_base_image
+    assert {'ANY_VALUE', 'RLIKE'} <= set(adapter.emulation_functions())
+    with mock.patch.object(adapter, 'get_connection') as get_connection:
+        adapter.create_function_if_available('RLIKE', [stub_relation()])
+    get_connection.assert_not_called()
+
+    adapter.build_on_tmpfs = True
+    assert adapter._target_image(shdocker) == 'postgres:12'
+
+
+def test_emulation_functions_are_parallel_safe_and_supported():
+    adapter = PostgresAdapter()
+    for function in adapter.emulation_functions():
+        with open(os.path.join(adapter._functions_path(), f'{function}.sql'), 'r') as f:
+            sql = f.read()
+        assert 'PARALLEL SAFE' in sql or 'parallel = safe' in sql, function
+        assert 'VOLATILE' not in sql.upper(), function
+    assert set(adapter.emulation_functions()) == SnowflakeAdapter.SUPPORTED_FUNCTIONS
+
+
+def test_polymorphic_emulations_have_numeric_overloads():
+    """anyelement needs identical argument types, so mixed numeric calls resolve through these."""
+    adapter = PostgresAdapter()
+    for function in ('NVL', 'IFNULL', 'IFF', 'EQUAL_NULL',):
+        with open(os.path.join(adapter._functions_path(), f'{function}.sql'), 'r') as f:
+            sql = f.read()
+        for data_type in ('anyelement', 'integer', 'bigint', 'numeric', 'double precision', 'text',):
+            assert re.search(rf'FUNCTION {function}\((condition boolean, )?expr1 {data_type}, expr2 {data_type}\)', sql), \
+                (function, data_type,)
+
+    with open(os.path.join(adapter._functions_path(), 'TO_VARCHAR.sql'), 'r') as f:
+        assert 'LANGUAGE SQL STABLE' in f.read()
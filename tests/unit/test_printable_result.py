@@ -1,5 +1,7 @@
 import pytest
+import networkx as nx
 import snowshu.core.printable_result as pr
+from snowshu.samplings.samplings import DefaultSampling
 
 
 @pytest.mark.skip
@@ -16,3 +18,31 @@ def test_graph_to_list(stub_graph_set):
         assert isinstance(row, pr.ReportRow)
         assert row.percent == 10
         assert row.percent_is_acceptable
+
+
+def test_printable_result_shows_load_rate(stub_relation_set):
+    relation = stub_relation_set.iso_relation
+    relation.sampling = DefaultSampling()
+    relation.sampling.size = 10
+    relation.population_size, relation.sample_size = 10, 10
+    relation.load_method, relation.load_rows_per_second = 'copy csv', 12345.6
+    graph = nx.Graph()
+    graph.add_node(relation)
+
+    report = pr.graph_to_result_list([graph])
+    assert '12,345 (copy csv)' in pr.printable_result(report, False)
+    assert 'load rows/sec' not in pr.printable_result(report, True)
+
+
+def test_printable_result_compares_estimated_and_actual_cost(stub_relation_set):
+    relation = stub_relation_set.iso_relation
+    relation.sampling = DefaultSampling()
+    relation.sampling.size = 10
+    relation.population_size, relation.sample_size = 10, 10
+    relation.estimated_cost, relation.actual_cost = 2.25, 3.5
+    graph = nx.Graph()
+    graph.add_node(relation)
+
+    printable = pr.printable_result(pr.graph_to_result_list([graph]), False)
+    assert 'estimated seconds' in printable
+    assert 'Estimated 2.2s of relation work, actual 3.5s.' in printable
@@ -79,3 +79,31 @@ def test_lookup_relations():
         test_relation, test_relation2]
     assert relation.lookup_single_relation(
         pattern3, [test_relation, test_relation2]) == None
+
+
+def test_relation_index_matches_patterns_in_one_walk():
+    from snowshu.core.configuration_parser import ConfigurationParser
+    relations = [relation.Relation(database=database, schema=schema, name=name, materialization=TABLE, attributes=[])
+                 for database in ('DB_ONE', 'DB_TWO',)
+                 for schema in ('SCHEMA_A', 'SCHEMA_B',)
+                 for name in ('ORDERS', 'ORDER_ITEMS', 'USERS',)]
+    index = relation.RelationIndex(relations)
+    parser = ConfigurationParser()
+    patterns = [parser._compile_pattern('DB_ONE', 'SCHEMA_A', 'ORDERS'),
+                parser._compile_pattern('DB_.*', 'SCHEMA_B', 'ORDER.*'),
+                parser._compile_pattern('(?i)db_two', '.*', 'USERS'),
+                parser._compile_pattern('DB_THREE', '.*', '.*')]
+
+    matches = index.match(patterns)
+    as_keys = [set((rel.database, rel.schema, rel.name,) for rel in matched) for matched in matches]
+    assert as_keys[0] == {('DB_ONE', 'SCHEMA_A', 'ORDERS',)}
+    assert as_keys[1] == {(database, 'SCHEMA_B', name,) for database in ('DB_ONE', 'DB_TWO',)
+                          for name in ('ORDERS', 'ORDER_ITEMS',)}
+    assert as_keys[2] == {('DB_TWO', schema, 'USERS',) for schema in ('SCHEMA_A', 'SCHEMA_B',)}
+    assert as_keys[3] == set()
+    for pattern, matched in zip(patterns, matches):
+        assert set(matched) == set(rel for rel in relations if relation.single_full_pattern_match(
+            rel, dict(database=pattern.database.pattern, schema=pattern.schema.pattern, name=pattern.relation.pattern)))
+
+    assert index.get('DB_TWO', 'SCHEMA_B', 'USERS') is relations[-1]
+    assert index.get('DB_TWO', 'SCHEMA_C', 'USERS') is None
@@ -1,5 +1,6 @@
 import pytest
 import mock
+import threading
 from tests.common import rand_string
 from snowshu.core.replica.replica_factory import ReplicaFactory
 
@@ -12,3 +13,86 @@ def tests_replica_rename(_,build_graph,get_graphs,stub_configs):
     test_name=rand_string(10)
     replica.create(test_name,False)
     assert build_graph.call_args[0][0].name == test_name
+
+
+@mock.patch('snowshu.core.replica.replica_factory.GraphSetRunner')
+@mock.patch('snowshu.core.replica.replica_factory.printable_result')
+@mock.patch('snowshu.core.replica.replica_factory.graph_to_result_list')
+@mock.patch('snowshu.core.replica.replica_factory.Catalog')
+@mock.patch('snowshu.core.replica.replica_factory.SnowShuGraph.build_graph')
+@mock.patch('snowshu.core.replica.replica_factory.SnowShuGraph.get_graphs',return_value=[mock.MagicMock()])
+def tests_target_bootstraps_during_catalog_load(get_graphs,build_graph,catalog,graph_to_result_list,printable_result,runner,stub_configs):
+    replica=ReplicaFactory()
+    replica.load_config(stub_configs())
+    replica.config.target_profile=mock.MagicMock()
+    replica.config.source_profile.adapter.SUPPORTED_FUNCTIONS=tuple()
+    catalog_loading=threading.Event()
+    # the bootstrap only completes if the catalog load starts while it is running
+    replica.config.target_profile.adapter.initialize_replica.side_effect=lambda *args: \
+        catalog_loading.wait(5) or pytest.fail('target bootstrap did not overlap catalog load')
+    catalog.load_full_catalog.side_effect=lambda *args: catalog_loading.set() or tuple()
+    replica.create(None,False)
+    replica.config.target_profile.adapter.initialize_replica.assert_called_once()
+    runner.return_value.execute_graph_set.assert_called_once()
+
+
+@mock.patch('snowshu.core.replica.replica_factory.Catalog')
+@mock.patch('snowshu.core.replica.replica_factory.SnowShuGraph.build_graph')
+@mock.patch('snowshu.core.replica.replica_factory.SnowShuGraph.get_graphs',return_value=[mock.MagicMock()])
+def tests_target_bootstrap_failure_is_raised(get_graphs,build_graph,catalog,stub_configs):
+    replica=ReplicaFactory()
+    replica.load_config(stub_configs())
+    replica.config.target_profile=mock.MagicMock()
+    replica.config.target_profile.adapter.initialize_replica.side_effect=TimeoutError('not ready')
+    with pytest.raises(TimeoutError):
+        replica.create(None,False)
+
+
+@mock.patch('snowshu.core.replica.replica_factory.Catalog')
+@mock.patch('snowshu.core.replica.replica_factory.SnowShuGraph.build_graph')
+@mock.patch('snowshu.core.replica.replica_factory.SnowShuGraph.get_graphs',return_value=[])
+def tests_unused_target_bootstrap_is_removed(get_graphs,build_graph,catalog,stub_configs):
+    replica=ReplicaFactory()
+    replica.load_config(stub_configs())
+    replica.config.target_profile=mock.MagicMock()
+    adapter=replica.config.target_profile.adapter
+    bootstrap_started,finish_bootstrap,removed=threading.Event(),threading.Event(),threading.Event()
+    adapter.initialize_replica.side_effect=lambda *args: bootstrap_started.set() or finish_bootstrap.wait(5)
+    adapter.remove_container.side_effect=lambda: removed.set()
+    catalog.load_full_catalog.side_effect=lambda *args: bootstrap_started.wait(5) and tuple()
+
+    assert replica.create(None,False).startswith('No relations found')
+    adapter.remove_container.assert_not_called()
+    finish_bootstrap.set()
+    assert removed.wait(5)
+
+
+@mock.patch('snowshu.core.replica.replica_factory.Catalog')
+@mock.patch('snowshu.core.replica.replica_factory.SnowShuGraph.build_graph')
+def tests_graph_errors_do_not_wait_for_target_bootstrap(build_graph,catalog,stub_configs):
+    replica=ReplicaFactory()
+    replica.load_config(stub_configs())
+    replica.config.target_profile=mock.MagicMock()
+    adapter=replica.config.target_profile.adapter
+    bootstrap_started,finish_bootstrap,removed=threading.Event(),threading.Event(),threading.Event()
+    adapter.initialize_replica.side_effect=lambda *args: bootstrap_started.set() or finish_bootstrap.wait(5)
+    adapter.remove_container.side_effect=lambda: removed.set()
+    catalog.load_full_catalog.side_effect=lambda *args: bootstrap_started.wait(5) and tuple()
+    build_graph.side_effect=ValueError('bad config')
+
+    with pytest.raises(ValueError):
+        replica.create(None,False)
+    assert not finish_bootstrap.is_set()
+    finish_bootstrap.set()
+    assert removed.wait(5)
+
+
+@mock.patch('snowshu.core.replica.replica_factory.Catalog')
+@mock.patch('snowshu.core.replica.replica_factory.SnowShuGraph.build_graph')
+@mock.patch('snowshu.core.replica.replica_factory.SnowShuGraph.get_graphs',return_value=[])
+def tests_reused_target_is_not_reset_without_relations(get_graphs,build_graph,catalog,stub_configs):
+    replica=ReplicaFactory()
+    replica.load_config(stub_configs())
+    replica.config.target_profile=mock.MagicMock()
+    replica.create(None,False,reuse_target=True)
+    replica.config.target_profile.adapter.initialize_replica.assert_not_called()
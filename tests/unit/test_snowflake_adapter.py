@@ -1,9 +1,15 @@
 import mock
+import pytest
+import pandas as pd
+from snowflake.connector.errors import NotSupportedError
+from sqlalchemy.exc import ProgrammingError
+from snowshu.exceptions import TooManyRecords
 from snowshu.adapters.source_adapters.snowflake_adapter import SnowflakeAdapter
 from tests.common import rand_string, query_equalize
 from snowshu.core.models.relation import Relation
 from snowshu.core.models.credentials import Credentials
 from snowshu.core.models.materializations import TABLE
+from snowshu.core.models import data_types as dt
 from snowshu.samplings.sample_methods import BernoulliSampleMethod
 
 
@@ -133,3 +139,173 @@ SELECT
 FROM 
     {relmock.scoped_cte('SNOWSHU_DIRECTIONAL_SAMPLE')}
 """)
+
+
+def test_arrow_query_fetches_arrow_result():
+    pytest.importorskip('pyarrow')
+    sf = SnowflakeAdapter()
+    cursor = mock.MagicMock()
+    cursor.description = [('ID',), ('NAME',)]
+    cursor.fetch_pandas_all.return_value = pd.DataFrame(dict(ID=[1, 2, 3], NAME=['a', 'b', 'c']))
+    engine = mock.MagicMock()
+    engine.raw_connection.return_value.cursor.return_value = cursor
+    with mock.patch.object(sf, 'get_connection', return_value=engine):
+        frame = sf._arrow_query('SELECT id, name FROM some_table')
+    assert frame.columns.tolist() == ['id', 'name']
+    assert frame['id'].tolist() == [1, 2, 3]
+    cursor.execute.assert_called_once()
+
+
+def test_arrow_query_without_pyarrow_fetches_rows():
+    sf = SnowflakeAdapter()
+    with mock.patch('snowshu.adapters.source_adapters.snowflake_adapter.importlib.util.find_spec', return_value=None), \
+            mock.patch.object(sf, 'get_connection') as get_connection, \
+            mock.patch.object(sf, '_safe_query') as safe_query:
+        sf._arrow_query('SELECT id FROM some_table')
+    safe_query.assert_called_once_with('SELECT id FROM some_table')
+    get_connection.assert_not_called()
+
+
+def test_arrow_query_falls_back_to_rows_of_the_same_cursor():
+    pytest.importorskip('pyarrow')
+    sf = SnowflakeAdapter()
+    cursor = mock.MagicMock()
+    cursor.description = [('ID',)]
+    cursor.fetch_pandas_all.side_effect = NotSupportedError()
+    cursor.fetchall.return_value = [(1,), (2,)]
+    engine = mock.MagicMock()
+    engine.raw_connection.return_value.cursor.return_value = cursor
+    with mock.patch.object(sf, 'get_connection', return_value=engine), \
+            mock.patch.object(sf, '_safe_query') as safe_query:
+        frame = sf._arrow_query('SELECT id FROM some_table')
+    safe_query.assert_not_called()
+    cursor.execute.assert_called_once()
+    assert frame['id'].tolist() == [1, 2]
+
+    cursor.fetch_pandas_all.side_effect = None
+    cursor.fetch_pandas_all.return_value = None
+    with mock.patch.object(sf, 'get_connection', return_value=engine):
+        assert sf._arrow_query('SELECT id FROM some_table').columns.tolist() == ['id']
+
+
+@mock.patch('snowshu.adapters.base_sql_adapter.event')
+@mock.patch('snowshu.adapters.base_sql_adapter.sqlalchemy.create_engine')
+def test_get_connection_reuses_pooled_engine(create_engine, _):
+    sf = SnowflakeAdapter()
+    sf.credentials = Credentials(user=rand_string(10), password=rand_string(10),
+                                 account=rand_string(10), database=rand_string(10))
+    sf.pool_size = 6
+    assert sf.get_connection() is sf.get_connection()
+    create_engine.assert_called_once()
+    assert create_engine.call_args[1]['pool_size'] == 6
+    assert create_engine.call_args[1]['pool_pre_ping']
+    sf.dispose_connections()
+    create_engine.return_value.dispose.assert_called_once()
+
+
+def test_check_count_and_query_executes_once():
+    sf = SnowflakeAdapter()
+    frame = pd.DataFrame([dict(id=1), dict(id=2)])
+    with mock.patch.object(sf, '_arrow_query', return_value=frame) as arrow_query:
+        assert sf.check_count_and_query('SELECT id FROM some_table', 2) is frame
+    arrow_query.assert_called_once()
+    assert query_equalize(arrow_query.call_args[0][0]).endswith('LIMIT 3')
+
+    with mock.patch.object(sf, '_arrow_query', return_value=frame):
+        with pytest.raises(TooManyRecords):
+            sf.check_count_and_query('SELECT id FROM some_table', 1)
+
+
+def test_get_relations_from_database_captures_metadata():
+    sf = SnowflakeAdapter()
+    catalog = pd.DataFrame([
+        dict(schema='SOURCE_SYSTEM', relation='ORDERS', materialization='BASE TABLE',
+             row_count=10, bytes=2048, attribute='ID', ordinal=1, data_type='NUMBER', numeric_scale=0),
+        dict(schema='SOURCE_SYSTEM', relation='ORDERS', materialization='BASE TABLE',
+             row_count=10, bytes=2048, attribute='NAME', ordinal=2, data_type='VARCHAR', numeric_scale=None),
+        dict(schema='SOURCE_SYSTEM', relation='ORDERS', materialization='BASE TABLE',
+             row_count=10, bytes=2048, attribute='AMOUNT', ordinal=3, data_type='NUMBER', numeric_scale=2),
+        dict(schema='SOURCE_SYSTEM', relation='ORDERS_VIEW', materialization='VIEW',
+             row_count=None, bytes=None, attribute='ID', ordinal=1, data_type='NUMBER', numeric_scale=0),
+        dict(schema='SOURCE_SYSTEM', relation='ORDERS_VIEW', materialization='VIEW',
+             row_count=None, bytes=None, attribute='NAME', ordinal=2, data_type='VARCHAR', numeric_scale=None)])
+    views = pd.DataFrame([dict(database_name='SNOWSHU_DEVELOPMENT', schema='SOURCE_SYSTEM', relation='ORDERS_VIEW',
+                               view_definition='create view ORDERS_VIEW as\nselect * from ORDERS')])
+    with mock.patch.object(sf, '_safe_query', side_effect=[catalog, views]):
+        relations = {rel.name: rel for rel in sf.get_relations_from_database('SNOWSHU_DEVELOPMENT')}
+
+    assert [attr.name for attr in relations['orders'].attributes] == ['id', 'name', 'amount']
+    assert [attr.data_type for attr in relations['orders'].attributes] == [dt.BIGINT, dt.VARCHAR, dt.NUMERIC]
+    assert relations['orders'].row_count == 10
+    assert relations['orders'].bytes == 2048
+    assert relations['orders_view'].row_count is None
+    assert len(relations['orders_view'].attributes) == 2
+    assert relations['orders_view'].is_view
+    assert relations['orders_view'].view_ddl == '\nselect * from ORDERS'
+    assert relations['orders'].view_ddl is None
+
+
+def test_patterns_predicate_pushes_down_translatable_regex():
+    sf = SnowflakeAdapter()
+    predicate = sf._patterns_predicate([dict(database='DB', schema="SOURCE_SYSTEM", name=r"ORDER\w+'S"),
+                                        dict(database='DB', schema='.*', name='^(?!.+_VIEW).+$')])
+    assert predicate == ("(RLIKE(m.table_schema, 'SOURCE_SYSTEM', 'i') AND RLIKE(m.table_name, 'ORDER\\\\w+\\'S', 'i'))"
+                         " OR (RLIKE(m.table_schema, '.*', 'i'))")
+
+    assert sf._patterns_predicate([dict(database='DB', schema='(?=x)', name=r'(a)\1')]) is None
+
+
+def test_get_all_databases_filters_by_patterns():
+    sf = SnowflakeAdapter()
+    sf._safe_query = mock.MagicMock(return_value=pd.DataFrame(dict(database_name=['SNOWSHU_DEVELOPMENT', 'OTHER_DB'],
+                                                                   last_altered=['1', '2'])))
+    assert sf.get_all_databases_last_altered([dict(database='snowshu_.*', schema='.*', name='.*')]) == \
+        dict(SNOWSHU_DEVELOPMENT='1')
+    assert len(sf.get_all_databases_last_altered()) == 2
+
+
+def test_account_usage_catalog_reads_all_databases_in_one_query():
+    sf = SnowflakeAdapter()
+    sf.catalog_strategy = 'account_usage'
+    sf._safe_query = mock.MagicMock(return_value=pd.DataFrame(dict(database_name=['DB_ONE', 'DB_ONE', 'DB_TWO'],
+                                                                   schema=['SCHEMA'] * 3,
+                                                                   relation=['TABLE_ONE', 'TABLE_ONE', 'TABLE_TWO'],
+                                                                   materialization=['BASE TABLE'] * 3,
+                                                                   row_count=[10, 10, 20],
+                                                                   bytes=[100, 100, 200],
+                                                                   attribute=['ID', 'NAME', 'ID'],
+                                                                   ordinal=[1, 2, 1],
+                                                                   data_type=['NUMBER', 'VARCHAR', 'NUMBER'],
+                                                                   numeric_scale=[0, None, 0])))
+    relations = sf.get_relations_from_databases(dict(DB_ONE=None, DB_TWO=None, DB_THREE=None))
+
+    sf._safe_query.assert_called_once()
+    assert 'SNOWFLAKE.ACCOUNT_USAGE.COLUMNS' in sf._safe_query.call_args[0][0]
+    assert [len(relations[db]) for db in ('DB_ONE', 'DB_TWO', 'DB_THREE',)] == [1, 1, 0]
+    assert len(relations['DB_ONE'][0].attributes) == 2
+
+
+def test_account_usage_catalog_falls_back_without_privileges():
+    sf = SnowflakeAdapter()
+    sf.catalog_strategy = 'account_usage'
+    sf._safe_query = mock.MagicMock(side_effect=ProgrammingError('SELECT', {}, Exception('not authorized')))
+    sf.get_relations_from_database = mock.MagicMock(return_value=[])
+
+    assert sf.get_relations_from_databases(dict(DB_ONE=None, DB_TWO=None)) == dict(DB_ONE=[], DB_TWO=[])
+    assert sf.catalog_strategy == 'information_schema'
+    assert sf.get_relations_from_database.call_count == 2
+
+
+def test_batched_population_count_statement():
+    sf = SnowflakeAdapter()
+    relations = [Relation(rand_string(10), rand_string(10), rand_string(10), TABLE, []) for _ in range(2)]
+    statement = sf.batched_population_count_statement(relations)
+    assert query_equalize(statement) == query_equalize(
+        '\nUNION ALL\n'.join([f"SELECT '{rel.dot_notation}' AS relation, COUNT(*) AS population_size FROM {rel.quoted_dot_notation}"
+                              for rel in relations]))
+
+
+def test_view_creation_statement_calls_get_ddl_once():
+    sf = SnowflakeAdapter()
+    relation = Relation(rand_string(10), rand_string(10), rand_string(10), TABLE, [])
+    assert sf.view_creation_statement(relation).count('GET_DDL') == 1